@@ -0,0 +1,64 @@
+# benchmarks/bench_dtypes.py
+# So sánh bộ nhớ của từng nguồn khi đọc kiểu mặc định (mọi chuỗi là object) và theo READ_SCHEMA của job
+# (category / Arrow string / usecols), từng cột một.
+# Chạy:
+#   python benchmarks/bench_dtypes.py --rows 1e6
+#   python benchmarks/bench_dtypes.py --source-dir source_data
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "etl_scripts"))
+import pandas as pd
+from synth import GENERATORS, SOURCE_FILES, ensure_sources
+from orchestrator import JOBS
+from source_schema import memory_mb, memory_report
+
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "fdw_bench")
+ENCODINGS = {"reviews": "latin1"}
+
+
+def _timed_read(path, **kwargs):
+    start = time.perf_counter()
+    df = pd.read_csv(path, **kwargs)
+    return df, time.perf_counter() - start
+
+
+def compare_source(job, path):
+    module = importlib.import_module(next(j["module"] for j in JOBS if j["name"] == job))
+    encoding = ENCODINGS.get(job)
+    before, before_s = _timed_read(path, encoding=encoding)
+    after, after_s = _timed_read(path, encoding=encoding, **module.READ_OPTIONS)
+    print()
+    memory_report(f"{job} ({len(before):,} rows, read {before_s:.2f}s -> {after_s:.2f}s)", before, after)
+    return memory_mb(before), memory_mb(after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory footprint of the sources: object dtypes vs READ_SCHEMA")
+    parser.add_argument("--rows", type=float, default=1e5, help="số dòng dữ liệu giả lập mỗi nguồn")
+    parser.add_argument("--source-dir", default=None, help="đọc CSV thật trong thư mục này thay vì sinh dữ liệu")
+    parser.add_argument("--jobs", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.source_dir:
+        paths = {job: os.path.join(args.source_dir, SOURCE_FILES[job]) for job in args.jobs}
+    else:
+        rows = int(args.rows)
+        out_dir = os.path.join(os.path.abspath(args.workdir), f"rows_{rows}_seed_{args.seed}_days_90", "source_data")
+        paths = ensure_sources(args.jobs, rows, out_dir, args.seed)
+
+    totals = {job: compare_source(job, path) for job, path in paths.items()}
+    print(f"\n📊 {'job':<12}{'object MB':>12}{'schema MB':>12}{'ratio':>8}")
+    for job, (before, after) in totals.items():
+        print(f"   {job:<12}{before:>12.1f}{after:>12.1f}{before / after if after else 0:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
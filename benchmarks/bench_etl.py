@@ -0,0 +1,281 @@
+# benchmarks/bench_etl.py
+# Đo từng job ETL trên dữ liệu giả lập (synth.py) ở nhiều kích thước, so với baseline đã lưu.
+#   --mode transform: extract + transform trong process, key map giả lập trong RAM (không cần PostgreSQL)
+#   --mode db: chạy main() đầy đủ của job vào một database benchmark riêng (schema dw bị xoá mỗi kích thước)
+# Chạy:
+#   python benchmarks/bench_etl.py --rows 1e4 1e5 --mode transform --save-baseline
+#   python benchmarks/bench_etl.py --rows 1e5 --mode db --database food_delivery_bench --chunk-rows 100000
+#   (thêm --pipeline-depth 2: transform chunk sau chạy chồng lên lúc nạp chunk trước, so với bản tuần tự)
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "etl_scripts"))
+import pandas as pd
+import psycopg2
+from synth import GENERATORS, ensure_sources
+from db_connection import ENV_PREFIX, load_config, _connect_kwargs
+from instrumentation import StageTimer, record, cpu_seconds, peak_rss_mb
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "fdw_bench")
+JOBS = list(GENERATORS)
+
+
+# =====================================================
+# MODE TRANSFORM: extract + transform, không chạm DB
+# =====================================================
+def _memory_keys(self, keys):
+    # thay KeyMap._resolve: mọi key tới đây đều chưa có trong cache -> cấp số tiếp theo trong RAM
+    found = {k: self.assigned + i + 1 for i, k in enumerate(keys)}
+    self.assigned += len(keys)
+    return found
+
+
+def _read(job, path, chunk_rows):
+    # cùng READ_OPTIONS (dtype / usecols) như job thật
+    kwargs = dict(_job_module(job).READ_OPTIONS)
+    if job == "reviews":
+        kwargs["encoding"] = "latin1"
+    # như job thật: chỉ orders/events đọc theo chunk
+    if chunk_rows and job in ("orders", "events"):
+        return pd.read_csv(path, chunksize=chunk_rows, **kwargs)
+    return [pd.read_csv(path, **kwargs)]
+
+
+def _job_module(job):
+    from orchestrator import JOBS
+    return importlib.import_module(next(j["module"] for j in JOBS if j["name"] == job))
+
+
+def _transform(job, chunk, sentiment_workers):
+    # cùng các bước transform như main() của từng job -> (frames cho _validate, số dòng fact)
+    if job == "orders":
+        import etl_transaction as etl
+        dim_restaurant = etl.transform_restaurants(chunk)
+        dim_customer_orders = etl.transform_customers(chunk)
+        fact_orders = etl.transform_fact_orders(chunk)
+        return (dim_restaurant, dim_customer_orders, fact_orders), len(fact_orders)
+    if job == "events":
+        import etl_event_script as etl
+        dim_user = etl.create_dim_user(chunk)
+        fact_events = etl.transform_fact_events(chunk)
+        return (dim_user, fact_events), len(fact_events)
+    if job == "reviews":
+        import etl_reviews as etl
+        fact_reviews = etl.transform_reviews(chunk, sentiment_workers=sentiment_workers)
+        dim_reviewer = fact_reviews[['reviewer_id', 'user_id']].drop_duplicates(subset=['reviewer_id'])
+        return (dim_reviewer, fact_reviews), len(fact_reviews)
+    import customer_etl as etl
+    dim_customer = etl.transform_customers(chunk)
+    return (dim_customer,), len(dim_customer)
+
+
+def _validate(job, frames, validator):
+    # cùng luật validate như job thật (món của đơn tách từ các đơn đã sạch)
+    if job == "orders":
+        import etl_transaction as etl
+        _, fact_orders = etl.validate_orders(validator, *frames)
+        etl.transform_order_items(fact_orders)
+    elif job == "events":
+        import etl_event_script as etl
+        etl.validate_events(validator, *frames)
+    elif job == "reviews":
+        import etl_reviews as etl
+        dim_reviewer, fact_reviews = frames
+        validator.check('fact_reviews', fact_reviews, etl.FACT_REVIEWS_RULES, dims={'dim_reviewer': dim_reviewer})
+    else:
+        import customer_etl as etl
+        validator.check('dim_customer', frames[0], etl.CUSTOMER_RULES)
+
+
+def _run_transform(job, path, chunk_rows, sentiment_workers):
+    from key_map import KeyMap
+    from validation import Validator
+    KeyMap._resolve = _memory_keys
+    # dòng lỗi chỉ được đếm, không ghi quarantine (không có DB)
+    validator = Validator(job, persist=False)
+
+    timer = StageTimer(job)
+    start, cpu_start = time.perf_counter(), cpu_seconds()
+    with timer.stage("extract"):
+        record(bytes_read=os.path.getsize(path))
+        reader = _read(job, path, chunk_rows)
+    for chunk in timer.iterate("extract", reader, rows=len):
+        with timer.stage("transform"):
+            record(rows_in=len(chunk))
+            frames, rows = _transform(job, chunk, sentiment_workers)
+            record(rows_out=rows)
+        with timer.stage("validate"):
+            _validate(job, frames, validator)
+    return {"status": "ok", "seconds": time.perf_counter() - start, "stages": timer.summary(),
+            "cpu_seconds": cpu_seconds() - cpu_start, "peak_rss_mb": peak_rss_mb()}
+
+
+# =====================================================
+# MODE DB: main() đầy đủ qua orchestrator
+# =====================================================
+def reset_database(name):
+    config = load_config()
+    admin = psycopg2.connect(**{**_connect_kwargs(config), "database": "postgres"})
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+        if cur.fetchone() is None:
+            cur.execute(f'CREATE DATABASE "{name}"')
+    admin.close()
+
+    conn = psycopg2.connect(**{**_connect_kwargs(config), "database": name})
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS dw_mart CASCADE; DROP SCHEMA IF EXISTS dw CASCADE; CREATE SCHEMA dw;")
+    conn.close()
+
+
+def _run_db(job, options):
+    from orchestrator import run_jobs
+    # mỗi lần một ProcessPoolExecutor mới -> job chạy trong process riêng, đỉnh RSS không lẫn job khác
+    result = run_jobs(selected=[job], max_workers=1, options=options)[job]
+    if result["status"] != "ok":
+        raise RuntimeError(f"{job} failed: {result['error']}")
+    return result
+
+
+# =====================================================
+# BÁO CÁO + BASELINE
+# =====================================================
+def metrics(rows, result):
+    # một dict phẳng cho mỗi stage + 'total' (cả job, thông lượng tính trên số dòng nguồn)
+    out = {"total": {"wall": result["seconds"], "cpu": result["cpu_seconds"], "peak_rss_mb": result["peak_rss_mb"],
+                     "rows_per_s": rows / result["seconds"] if result["seconds"] else None, "calls": 1}}
+    for stage, stats in result["stages"].items():
+        processed = stats["rows_in"] or stats["rows_out"]
+        out[stage] = {"wall": stats["wall"], "cpu": stats["cpu"], "peak_rss_mb": stats["peak_rss_mb"],
+                      "rows_per_s": processed / stats["wall"] if processed and stats["wall"] else None,
+                      "calls": stats["calls"]}
+    return out
+
+
+def print_results(results):
+    print(f"\n📊 {'key':<44}{'wall':>9}{'per pass':>10}{'cpu':>9}{'rows/s':>12}{'rss MB':>9}")
+    for key, m in results.items():
+        rate = f"{m['rows_per_s']:>12,.0f}" if m["rows_per_s"] else f"{'-':>12}"
+        rss = f"{m['peak_rss_mb']:>9.0f}" if m["peak_rss_mb"] is not None else f"{'-':>9}"
+        per_pass = m["wall"] / m["calls"] * 1000 if m["calls"] else 0.0
+        print(f"   {key:<44}{m['wall']:>8.2f}s{per_pass:>8.0f}ms{m['cpu']:>8.2f}s{rate}{rss}")
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    # chậm hơn / tốn RAM hơn baseline quá tolerance -> regression; stage quá nhanh bỏ qua (nhiễu)
+    regressions = []
+    print(f"\n⚖️  Compared with baseline (tolerance {tolerance:.0%}, ignoring stages under {min_seconds}s)")
+    for key, m in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        wall_ratio = m["wall"] / base["wall"] if base["wall"] else 1.0
+        rss_ratio = (m["peak_rss_mb"] / base["peak_rss_mb"]
+                     if m["peak_rss_mb"] and base.get("peak_rss_mb") else 1.0)
+        slow = wall_ratio > 1 + tolerance and max(m["wall"], base["wall"]) >= min_seconds
+        fat = rss_ratio > 1 + tolerance
+        flag = "❌" if slow or fat else "✅"
+        print(f"   {flag} {key:<44} wall {wall_ratio - 1:+7.1%}   rss {rss_ratio - 1:+7.1%}")
+        if slow or fat:
+            regressions.append(key)
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path, results):
+    # gộp vào baseline cũ: lưu kích thước/mode mới không xoá số đo khác
+    merged = {**load_baseline(path), **results}
+    meta = {
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": f"{platform.node()} {platform.machine()} ({os.cpu_count()} CPU)",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": merged}, f, indent=2, sort_keys=True)
+    print(f"\n💾 Baseline saved to {path} ({len(results)} keys updated)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL jobs on synthetic data")
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e4], help="số dòng mỗi nguồn, vd. 1e4 1e6")
+    parser.add_argument("--jobs", nargs="+", choices=JOBS, default=JOBS)
+    parser.add_argument("--mode", choices=["transform", "db"], default="transform")
+    parser.add_argument("--database", default=None, help="mode db: database benchmark (tạo nếu chưa có)")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="orders/events đọc theo chunk")
+    parser.add_argument("--sentiment-workers", type=int, default=None)
+    parser.add_argument("--pipeline-depth", type=int, default=None, help="mode db: orders/events chạy pipeline")
+    parser.add_argument("--transform-workers", type=int, default=None, help="mode db")
+    parser.add_argument("--staging", choices=["full", "preview", "off"], default="full", help="mode db")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="nơi giữ CSV giả lập (dùng lại giữa các lần)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.mode == "db":
+        # không bao giờ chạy vào database ETL thật: các job TRUNCATE bảng, benchmark xoá cả schema dw
+        if not args.database or args.database == load_config()["NAME"]:
+            parser.error("--mode db needs --database NAME, different from the ETL database")
+        os.environ[ENV_PREFIX + "NAME"] = args.database
+
+    results = {}
+    for rows in [int(r) for r in args.rows]:
+        # cùng bố cục với repo: cwd = <size>/etl, job đọc ../source_data/..., staging ở ../staging_data
+        size_dir = os.path.join(os.path.abspath(args.workdir), f"rows_{rows}_seed_{args.seed}_days_{args.days}")
+        paths = ensure_sources(args.jobs, rows, os.path.join(size_dir, "source_data"), args.seed, args.days)
+        os.makedirs(os.path.join(size_dir, "etl"), exist_ok=True)
+        os.chdir(os.path.join(size_dir, "etl"))
+        if args.mode == "db":
+            reset_database(args.database)
+
+        for job in args.jobs:
+            # cache sentiment nguội mỗi lần -> số đo reviews so được với baseline
+            shutil.rmtree(os.path.join(size_dir, "staging_data"), ignore_errors=True)
+            print(f"\n⏱️  {args.mode} {job} @ {rows:,} rows")
+            if args.mode == "db":
+                result = _run_db(job, {"chunk_rows": args.chunk_rows, "staging": args.staging,
+                                       "sentiment_workers": args.sentiment_workers,
+                                       "pipeline_depth": args.pipeline_depth,
+                                       "transform_workers": args.transform_workers})
+            else:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    result = pool.submit(_run_transform, job, paths[job], args.chunk_rows,
+                                         args.sentiment_workers).result()
+            for stage, m in metrics(rows, result).items():
+                results[f"{args.mode}/{rows}/{job}/{stage}"] = m
+
+    print_results(results)
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance, args.min_seconds)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
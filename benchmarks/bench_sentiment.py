@@ -0,0 +1,60 @@
+# benchmarks/bench_sentiment.py
+# So sánh Series.apply(get_sentiment) với sentiment.score_sentiments (dedupe + cache + process pool)
+# Chạy: python benchmarks/bench_sentiment.py --rows 200000
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "etl_scripts"))
+from sentiment import get_sentiment, score_sentiments
+
+WORDS = [
+    "great", "taste", "not", "as", "advertised", "delicious", "terrible", "good", "product",
+    "love", "it", "bad", "coffee", "best", "ever", "awful", "yummy", "stale", "fresh", "ok",
+]
+
+
+def make_summaries(rows, unique_ratio, seed=0):
+    # Summary của Reviews.csv lặp lại nhiều -> sinh pool câu nhỏ hơn số dòng
+    rng = np.random.default_rng(seed)
+    pool_size = max(1, int(rows * unique_ratio))
+    lengths = rng.integers(1, 6, pool_size)
+    pool = np.array([" ".join(rng.choice(WORDS, n)) for n in lengths], dtype=object)
+    return pd.Series(pool[rng.integers(0, pool_size, rows)], name="Summary")
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed:>9.2f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentiment scoring for fact_reviews")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--unique-ratio", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    texts = make_summaries(args.rows, args.unique_ratio)
+    print(f"{args.rows} summaries, {texts.nunique()} unique\n")
+
+    baseline, t_base = timed("apply(get_sentiment)", lambda: texts.apply(get_sentiment))
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "sentiment_cache.sqlite")
+        cold, t_cold = timed("score_sentiments (cold)", lambda: score_sentiments(texts, args.workers, cache))
+        warm, t_warm = timed("score_sentiments (warm)", lambda: score_sentiments(texts, args.workers, cache))
+
+    assert np.array_equal(baseline.to_numpy(dtype="float64"), cold.to_numpy()), "cold scores differ"
+    assert np.array_equal(baseline.to_numpy(dtype="float64"), warm.to_numpy()), "warm scores differ"
+    print(f"\nidentical scores ✔  speedup cold x{t_base / t_cold:.1f}, warm x{t_base / t_warm:.1f}")
+
+
+if __name__ == "__main__":
+    main()
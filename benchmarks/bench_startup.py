@@ -0,0 +1,85 @@
+# benchmarks/bench_startup.py
+# Đo thời gian khởi động của các entry point ETL: mỗi lệnh chạy trong process Python mới, lặp --repeat lần.
+# In median / min, các thư viện nặng đã bị import và (với --importtime) module import chậm nhất theo -X importtime.
+# Không cần PostgreSQL: chỉ import / dựng parser, không kết nối.
+# Chạy:
+#   python benchmarks/bench_startup.py --repeat 10
+#   python benchmarks/bench_startup.py --importtime 8
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ETL_DIR = os.path.join(BENCH_DIR, "..", "etl_scripts")
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "sqlalchemy", "psycopg2", "textblob", "nltk")
+
+# tên -> đoạn code chạy bằng python -c trong etl_scripts/
+TARGETS = {
+    "main_etl --help": "import main_etl\ntry:\n    main_etl.main(['--help'])\nexcept SystemExit:\n    pass",
+    "import main_etl": "import main_etl",
+    "import db_connection": "import db_connection",
+    "import customer_etl": "import customer_etl",
+    "import etl_transaction": "import etl_transaction",
+    "import etl_event_script": "import etl_event_script",
+    "import etl_reviews": "import etl_reviews",
+}
+
+# in ra module nặng nào đã nằm trong sys.modules khi đoạn code chạy xong
+REPORT = "\nimport sys\nprint('HEAVY=' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+
+
+def run_once(code, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code + REPORT.format(heavy=HEAVY_MODULES)]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ETL_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr}")
+    heavy = next(line[len("HEAVY="):] for line in proc.stdout.splitlines() if line.startswith("HEAVY="))
+    return elapsed, heavy, proc.stderr
+
+
+def slowest_imports(stderr, top):
+    # dòng "import time: self | cumulative | name": thụt lề 2 dấu cách mỗi cấp -> lấy import trực tiếp của
+    # module được đo (cấp 1), xếp theo cumulative
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import / startup latency of the ETL entry points")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS), metavar="TARGET")
+    parser.add_argument("--repeat", type=int, default=5, help="số lần chạy mỗi lệnh (process mới mỗi lần)")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="in N module import chậm nhất của mỗi lệnh (python -X importtime)")
+    args = parser.parse_args()
+
+    print(f"🐍 {sys.executable} ({sys.version.split()[0]}), {args.repeat} runs per target")
+    print(f"\n📊 {'target':<28}{'median':>9}{'min':>9}   heavy modules loaded")
+    for name in args.targets:
+        # lần đầu làm nóng cache đĩa / .pyc, không tính
+        run_once(TARGETS[name])
+        times, heavy = [], ""
+        for _ in range(args.repeat):
+            elapsed, heavy, _ = run_once(TARGETS[name])
+            times.append(elapsed)
+        print(f"   {name:<28}{statistics.median(times) * 1000:>7.0f}ms{min(times) * 1000:>7.0f}ms   {heavy or '-'}")
+        if args.importtime:
+            _, _, stderr = run_once(TARGETS[name], importtime=True)
+            for cumulative, module in slowest_imports(stderr, args.importtime):
+                print(f"      {module:<34}{cumulative / 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
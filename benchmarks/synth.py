@@ -0,0 +1,210 @@
+# benchmarks/synth.py
+# Sinh CSV giả lập đúng schema của 4 nguồn trong ../source_data, ở kích thước tuỳ ý (1e4 .. 1e8 dòng).
+# Ghi theo block -> RAM không phụ thuộc số dòng; cùng seed + số dòng -> cùng file.
+# Chạy riêng: python benchmarks/synth.py --rows 1e6 --out /tmp/fdw_bench/source_data
+import argparse
+import os
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 1_000_000
+START = pd.Timestamp("2024-07-01")
+
+# file mà từng job đọc (INPUT_FILE trong etl_scripts)
+SOURCE_FILES = {
+    "customers": "customers.csv",
+    "orders": "order_history_kaggle_data.csv",
+    "events": "ecommerce_clickstream_transactions.csv",
+    "reviews": "Reviews.csv",
+}
+
+AGREE_SCALE = ["Strongly agree", "Agree", "Neutral", "Disagree", "Strongly disagree"]
+SUMMARY_WORDS = [
+    "great", "taste", "not", "as", "advertised", "delicious", "terrible", "good", "product",
+    "love", "it", "bad", "coffee", "best", "ever", "awful", "yummy", "stale", "fresh", "ok",
+]
+
+
+def _pick(rng, values, n, null_ratio=0.0):
+    out = np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+    if null_ratio:
+        out[rng.random(n) < null_ratio] = None
+    return out
+
+
+def _times(rng, start_row, n, total_rows, days):
+    # thời điểm tăng dần, trải đều trên `days` ngày bất kể số dòng (dim_time theo phút không phình theo kích thước)
+    step = days * 86400 / max(total_rows, 1)
+    offsets = (start_row + np.arange(n) + rng.random(n)) * step
+    return START + pd.to_timedelta(offsets, unit="s")
+
+
+# =====================================================
+# TỪNG NGUỒN: make_<source>(rng, start_row, n, total_rows, days) -> DataFrame của một block
+# =====================================================
+def make_customers(rng, start_row, n, total_rows, days):
+    return pd.DataFrame({
+        "Age": rng.integers(18, 34, n),
+        "Gender": _pick(rng, ["Male", "Female"], n),
+        "Marital Status": _pick(rng, ["Married", "Single"], n),
+        "Occupation": _pick(rng, ["Employee", "Student"], n),
+        "Educational Qualifications": _pick(rng, ["Post Graduate", "Graduate"], n),
+        "Family size": rng.integers(1, 6, n),
+        "Frequently used Medium": _pick(rng, ["Walk-in", "Food delivery apps"], n),
+        "Frequently ordered Meal category ": _pick(rng, ["Breakfast", "Lunch", "Dinner"], n),
+        "Perference": _pick(rng, ["Non Veg foods (Lunch / Dinner)", "Veg only"], n),
+        "Restaurnat Rating": rng.integers(1, 6, n),
+        "Delivery Rating": rng.integers(1, 6, n),
+        "No. of orders placed": rng.integers(1, 10, n),
+        "Delivery Time": rng.integers(10, 60, n),
+        "Order Value": rng.integers(100, 1000, n),
+        "Ease and convenient": _pick(rng, AGREE_SCALE, n, 0.2),
+        "Self Cooking": _pick(rng, ["Yes", "No"], n),
+        "Health Concern": _pick(rng, AGREE_SCALE, n, 0.2),
+        "Late Delivery": _pick(rng, ["Yes", "No"], n),
+        "Poor Hygiene": _pick(rng, ["Yes", "No", "Maybe"], n),
+        "Bad past experience": _pick(rng, AGREE_SCALE, n, 0.15),
+        "More Offers and Discount": _pick(rng, AGREE_SCALE, n, 0.2),
+        "Maximum wait time": _pick(rng, ["30 minutes", "45 minutes"], n),
+        "Influence of rating": _pick(rng, ["Yes", "No"], n),
+    })
+
+
+def _items_in_order(rng, n):
+    # '1 x Dish 20, 3 x Dish 12': 1-4 món, mỗi món 1-3 phần
+    counts = rng.integers(1, 5, n)
+    items = None
+    for k in range(4):
+        part = (pd.Series(rng.integers(1, 4, n)).astype(str) + " x Dish "
+                + pd.Series(rng.integers(1, 30, n)).astype(str))
+        items = part if items is None else items.where(counts <= k, items + ", " + part)
+    return items.to_numpy()
+
+
+def make_orders(rng, start_row, n, total_rows, days):
+    restaurant = rng.integers(1, 61, n)
+    subtotal = rng.integers(80, 1500, n).astype(float)
+    promo = np.round(subtotal * rng.uniform(0, 0.3, n))
+    packaging = rng.integers(0, 40, n).astype(float)
+    status = _pick(rng, ["Delivered"] * 18 + ["Rejected", "Cancelled"], n)
+    return pd.DataFrame({
+        "Restaurant ID": restaurant,
+        "Restaurant name": [f"Rest {r}" for r in restaurant],
+        "Subzone": _pick(rng, ["DLF", "Sector 1", "Sector 2"], n),
+        "City": _pick(rng, ["Delhi", "Gurgaon"], n),
+        "Order ID": 10000 + start_row + np.arange(n),
+        "Order Placed At": _times(rng, start_row, n, total_rows, days).strftime("%I:%M %p, %B %d %Y"),
+        "Order Status": status,
+        "Delivery": _pick(rng, ["Zomato Delivery", "Self"], n),
+        "Distance": _pick(rng, ["<1km", "1km", "2km", "3km", "5km", "10km"], n),
+        "Items in order": _items_in_order(rng, n),
+        "Instructions": _pick(rng, ["less spicy"], n, 0.5),
+        "Discount construct": _pick(rng, ["40% off upto Rs.80"], n, 0.5),
+        "Bill subtotal": subtotal,
+        "Packaging charges": packaging,
+        "Restaurant discount (Promo)": promo,
+        "Restaurant discount (Flat offs, Freebies & others)": 0.0,
+        "Gold discount": 0.0,
+        "Brand pack discount": 0.0,
+        "Total": subtotal + packaging - promo,
+        "Rating": None,
+        "Review": None,
+        "Cancellation / Rejection reason": None,
+        "Restaurant compensation (Cancellation)": None,
+        "Restaurant penalty (Rejection)": None,
+        "KPT duration (minutes)": np.round(rng.uniform(5, 40, n), 2),
+        "Rider wait time (minutes)": np.round(rng.uniform(0, 15, n), 2),
+        "Order Ready Marked": _pick(rng, ["Correctly", "Missed"], n),
+        "Customer complaint tag": None,
+        # ~3 đơn mỗi khách như dữ liệu gốc
+        "Customer ID": [f"{c:08x}" for c in rng.integers(0, max(total_rows // 3, 1), n)],
+    })
+
+
+def make_events(rng, start_row, n, total_rows, days):
+    event = _pick(rng, ["page_view", "page_view", "add_to_cart", "login", "logout", "purchase"], n)
+    purchase = event == "purchase"
+    amount = np.where(purchase, np.round(rng.uniform(5, 500, n), 2), np.nan)
+    return pd.DataFrame({
+        "UserID": rng.integers(1, max(total_rows // 5, 2), n),
+        "SessionID": rng.integers(1, max(total_rows * 2 // 3, 2), n),
+        "Timestamp": _times(rng, start_row, n, total_rows, days).strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "EventType": event,
+        "ProductID": _pick(rng, ["prod_1", "prod_2"], n, 0.3),
+        "Amount": amount,
+        "Outcome": np.where(purchase, "purchase", None),
+    })
+
+
+@lru_cache(maxsize=4)
+def _summary_pool(size):
+    rng = np.random.default_rng(size)
+    return [" ".join(rng.choice(SUMMARY_WORDS, k)) for k in rng.integers(1, 6, size)]
+
+
+def make_reviews(rng, start_row, n, total_rows, days):
+    # Summary lặp lại nhiều như Reviews.csv gốc -> sentiment có dedupe/cache thật sự
+    pool = _summary_pool(max(8, total_rows // 50))
+    times = _times(rng, start_row, n, total_rows, days)
+    return pd.DataFrame({
+        "Id": start_row + np.arange(n) + 1,
+        "ProductId": "B00",
+        "UserId": [f"A{u}" for u in rng.integers(1, max(total_rows * 10 // 23, 2), n)],
+        "ProfileName": "x",
+        "HelpfulnessNumerator": 0,
+        "HelpfulnessDenominator": 0,
+        "Score": rng.integers(1, 6, n),
+        "Time": times.asi8 // 10**9,
+        "Summary": _pick(rng, pool, n),
+        "Text": "text",
+    })
+
+
+GENERATORS = {
+    "customers": make_customers,
+    "orders": make_orders,
+    "events": make_events,
+    "reviews": make_reviews,
+}
+
+
+def write_source(source, rows, out_dir, seed=0, days=90, block_rows=BLOCK_ROWS):
+    path = os.path.join(out_dir, SOURCE_FILES[source])
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = path + ".part"
+    for block, start_row in enumerate(range(0, rows, block_rows)):
+        n = min(block_rows, rows - start_row)
+        rng = np.random.default_rng([seed, list(GENERATORS).index(source), block])
+        frame = GENERATORS[source](rng, start_row, n, rows, days)
+        frame.to_csv(tmp_path, mode="w" if block == 0 else "a", header=block == 0, index=False)
+    # file chỉ xuất hiện khi đã ghi đủ -> lần chạy sau dùng lại được
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_sources(sources, rows, out_dir, seed=0, days=90):
+    paths = {}
+    for source in sources:
+        path = os.path.join(out_dir, SOURCE_FILES[source])
+        if not os.path.exists(path):
+            print(f"🧪 Generating {rows:,} {source} rows -> {path}")
+            write_source(source, rows, out_dir, seed, days)
+        paths[source] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic source CSVs for the ETL jobs")
+    parser.add_argument("--rows", type=float, default=1e4, help="số dòng mỗi nguồn (nhận dạng 1e6)")
+    parser.add_argument("--sources", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--out", required=True, help="thư mục ghi CSV (đặt tên như ../source_data)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=90, help="khoảng thời gian dữ liệu trải ra")
+    args = parser.parse_args()
+    for source in args.sources:
+        print(f"🧪 {source}: {write_source(source, int(args.rows), args.out, args.seed, args.days)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# etl_scripts/bulk_loader.py
+import io
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from db_connection import pooled_connection
+from instrumentation import record
+
+SCHEMA_NAME = "dw"
+
+# Số dòng mỗi block CSV đẩy vào COPY (giới hạn RAM của buffer)
+COPY_BLOCK_ROWS = 100_000
+
+# Marker NULL riêng để chuỗi rỗng '' vẫn được giữ là chuỗi rỗng
+NULL_MARKER = r"\N"
+
+
+# --- Chuẩn hoá kiểu trước khi encode ---
+def _prepare_frame(df):
+    out = None
+    for col in df.columns:
+        values = df[col]
+        if not pd.api.types.is_float_dtype(values.dtype):
+            continue
+        arr = values.to_numpy(dtype="float64", na_value=np.nan)
+        finite = arr[~np.isnan(arr)]
+        # float chỉ vì có NaN (vd. sessionid) -> Int64, tránh "12.0" vào cột INTEGER
+        if len(finite) and np.all(np.abs(finite) < 2**53) and np.array_equal(finite, np.floor(finite)):
+            if out is None:
+                out = df.copy(deep=False)
+            out[col] = values.astype("Int64")
+    return df if out is None else out
+
+
+def _iter_csv_blocks(df, block_rows):
+    for start in range(0, len(df), block_rows):
+        buf = io.StringIO()
+        df.iloc[start:start + block_rows].to_csv(buf, index=False, header=False, na_rep=NULL_MARKER)
+        yield buf
+
+
+def _column_list(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def _copy_frame(cur, frame, target, block_rows):
+    copy_sql = (
+        f"COPY {target} ({_column_list(frame.columns)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '{NULL_MARKER}')"
+    )
+    for buf in _iter_csv_blocks(frame, block_rows):
+        size = buf.tell()
+        buf.seek(0)
+        cur.copy_expert(copy_sql, buf)
+        record(bytes_written=size)
+    record(rows_out=len(frame))
+
+
+@contextmanager
+def _connection(conn):
+    # conn do người gọi truyền vào: người gọi tự commit.
+    # Không truyền: mượn một kết nối từ pool, commit khi xong (lỗi -> pool tự rollback).
+    if conn is not None:
+        yield conn
+        return
+    with pooled_connection() as own_conn:
+        yield own_conn
+        own_conn.commit()
+
+
+# --- COPY DataFrame -> PostgreSQL ---
+def copy_dataframe(df, table_name, schema=SCHEMA_NAME, conn=None, block_rows=COPY_BLOCK_ROWS):
+    frame = _prepare_frame(df)
+
+    start = time.time()
+    with _connection(conn) as conn, conn.cursor() as cur:
+        _copy_frame(cur, frame, f"{schema}.{table_name}", block_rows)
+
+    elapsed = time.time() - start
+    rate = len(frame) / elapsed if elapsed > 0 else float("inf")
+    print(f"⬆️  COPY {len(frame)} rows into {table_name} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return elapsed
+
+
+# --- COPY vào bảng tạm rồi INSERT ... ON CONFLICT (df phải unique theo key_cols) ---
+def upsert_dataframe(df, table_name, key_cols, schema=SCHEMA_NAME, conn=None,
+                     update_cols=None, update_where=None, block_rows=COPY_BLOCK_ROWS):
+    frame = _prepare_frame(df)
+    tmp_table = f"tmp_upsert_{table_name}"
+    columns = _column_list(frame.columns)
+
+    if update_cols:
+        conflict_action = "DO UPDATE SET " + ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in update_cols)
+        if update_where:
+            conflict_action += f" WHERE {update_where}"
+    else:
+        conflict_action = "DO NOTHING"
+
+    start = time.time()
+    with _connection(conn) as conn, conn.cursor() as cur:
+        # bảng tạm chỉ gồm các cột của df, không kèm NOT NULL/default của bảng đích
+        cur.execute(f"DROP TABLE IF EXISTS {tmp_table}")
+        cur.execute(
+            f"CREATE TEMP TABLE {tmp_table} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {schema}.{table_name} WITH NO DATA"
+        )
+        _copy_frame(cur, frame, tmp_table, block_rows)
+        cur.execute(
+            f"INSERT INTO {schema}.{table_name} AS t ({columns}) "
+            f"SELECT {columns} FROM {tmp_table} "
+            f"ON CONFLICT ({_column_list(key_cols)}) {conflict_action}"
+        )
+        affected = cur.rowcount
+
+    elapsed = time.time() - start
+    rate = len(frame) / elapsed if elapsed > 0 else float("inf")
+    print(f"🔁 Upserted {affected}/{len(frame)} rows into {table_name} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return affected
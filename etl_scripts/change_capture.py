@@ -0,0 +1,89 @@
+# etl_scripts/change_capture.py
+import numpy as np
+import pandas as pd
+from bulk_loader import copy_dataframe, upsert_dataframe
+
+SCHEMA_NAME = "dw"
+
+# hash 64-bit của các cột thuộc tính, lưu cùng dòng trong dim: lần nạp sau chỉ ghi dòng có hash khác
+HASH_COLUMN = "row_hash"
+
+
+# =====================================================
+# HASH + SO SÁNH
+# =====================================================
+def row_hashes(df, columns):
+    # chuỗi hoá trước khi hash: cùng giá trị -> cùng hash dù cột là category, object hay Arrow string
+    # (vd. đọc lại từ staging Parquet); NULL (None / NaN / <NA> tuỳ dtype) quy về một giá trị trước khi
+    # chuỗi hoá, nếu không astype(str) cho 'None', 'nan', '<NA>'. uint64 -> int64 để vừa BIGINT
+    values = df[columns].astype(object)
+    hashed = pd.util.hash_pandas_object(values.where(values.notna(), None).astype(str), index=False)
+    return pd.Series(hashed.to_numpy().view(np.int64), index=df.index, name=HASH_COLUMN)
+
+
+def stored_hashes(conn, table, key, schema=SCHEMA_NAME):
+    # key -> row_hash đang có trong bảng (NULL: dòng nạp trước khi có hash -> luôn coi là đã đổi)
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {key}, {HASH_COLUMN} FROM {schema}.{table}")
+        rows = cur.fetchall()
+    return pd.Series(pd.array([h for _, h in rows], dtype="Int64"),
+                     index=pd.Index([k for k, _ in rows], dtype=object))
+
+
+def split_changes(df, key, stored):
+    # df (unique theo key, đã có cột row_hash) so với stored -> (mask dòng mới, mask dòng đổi, key đã biến mất)
+    keys = df[key].astype(object)
+    known = keys.isin(stored.index).to_numpy()
+    same = pd.Series(stored.reindex(keys.to_numpy()).array == df[HASH_COLUMN].to_numpy())
+    changed = known & ~same.fillna(False).astype(bool).to_numpy()
+    deleted = stored.index.difference(pd.Index(keys.to_numpy(), dtype=object)).tolist()
+    return ~known, changed, deleted
+
+
+def _report(table, new, changed, deleted, total):
+    print(f"🧮 {table}: {new.sum()} new, {changed.sum()} changed, {deleted} removed, "
+          f"{total - new.sum() - changed.sum()} unchanged")
+
+
+# =====================================================
+# ÁP DỤNG THAY ĐỔI
+# =====================================================
+def apply_changes(conn, df, table, key, attributes, stored, delete_missing=True, schema=SCHEMA_NAME):
+    # SCD type 1: chỉ ghi dòng mới / đổi nội dung; delete_missing -> xoá dòng không còn trong df
+    df = df.assign(**{HASH_COLUMN: row_hashes(df, attributes)})
+    new, changed, deleted = split_changes(df, key, stored)
+    deleted = deleted if delete_missing else []
+    rows = df[new | changed]
+    if stored.empty:
+        copy_dataframe(rows, table, schema=schema, conn=conn)
+    elif len(rows):
+        upsert_dataframe(rows, table, [key], schema=schema, conn=conn,
+                         update_cols=[c for c in rows.columns if c != key])
+    if deleted:
+        with conn.cursor() as cur:
+            cur.execute(f"DELETE FROM {schema}.{table} WHERE {key} = ANY(%s)", (deleted,))
+    _report(table, new, changed, len(deleted), len(df))
+    return len(rows) + len(deleted)
+
+
+def apply_scd2(conn, df, table, history_table, key, attributes, stored, delete_missing=False, schema=SCHEMA_NAME):
+    # SCD type 2: `table` giữ bản hiện tại (một dòng mỗi key, cho FK / join), `history_table` giữ mọi phiên bản.
+    # Dòng đổi nội dung / bị xoá: đóng phiên bản đang mở (valid_to = now()); dòng mới / đổi: thêm phiên bản
+    # valid_from = now(). Cả transaction dùng một now() -> phiên bản mới bắt đầu đúng lúc phiên bản cũ kết thúc.
+    df = df.assign(**{HASH_COLUMN: row_hashes(df, attributes)})
+    new, changed, deleted = split_changes(df, key, stored)
+    deleted = deleted if delete_missing else []
+    rows = df[new | changed]
+    closed = df.loc[changed, key].tolist() + deleted
+    with conn.cursor() as cur:
+        if closed:
+            cur.execute(f"UPDATE {schema}.{history_table} SET valid_to = now() "
+                        f"WHERE {key} = ANY(%s) AND valid_to IS NULL", (closed,))
+        if deleted:
+            cur.execute(f"DELETE FROM {schema}.{table} WHERE {key} = ANY(%s)", (deleted,))
+    if len(rows):
+        upsert_dataframe(rows, table, [key], schema=schema, conn=conn,
+                         update_cols=[c for c in rows.columns if c != key])
+        copy_dataframe(rows, history_table, schema=schema, conn=conn)
+    _report(table, new, changed, len(deleted), len(df))
+    return len(rows) + len(deleted)
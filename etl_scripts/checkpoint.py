@@ -0,0 +1,74 @@
+# etl_scripts/checkpoint.py
+import hashlib
+from db_connection import pooled_connection
+
+CHECKPOINT_TABLE = "dw.etl_checkpoint"
+
+# batch đã commit của lần nạp lại toàn bộ đang dở: mỗi chunk commit kèm một dòng ở đây trong cùng transaction.
+# run_key = dấu vân tay của input + kích thước chunk -> chạy lại với đúng input đó bỏ qua các batch đã có,
+# input khác -> checkpoint cũ bị bỏ và nạp lại từ đầu. Lần chạy xong xoá checkpoint trong transaction cuối.
+CHECKPOINT_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+        source VARCHAR(100) NOT NULL,
+        run_key VARCHAR(64) NOT NULL,
+        batch_no INT NOT NULL,
+        rows_loaded BIGINT,
+        loaded_at TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (source, run_key, batch_no)
+    );
+"""
+
+
+def run_key(*parts):
+    # vd. run_key(file_hash, chunk_rows): cùng input + cùng cách cắt chunk -> cùng số thứ tự batch
+    return hashlib.sha256("\t".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _ensure_table(cur):
+    # orders và events chạy song song cùng tạo bảng -> khoá tới hết transaction
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (CHECKPOINT_TABLE,))
+    cur.execute(CHECKPOINT_DDL)
+
+
+class Checkpoint:
+    # một lần nạp lại toàn bộ của `source`: resume() đọc batch đã xong, mark() ghi batch trong transaction
+    # của batch; clear_checkpoints() xoá khi lần chạy xong (cùng transaction với watermark)
+    def __init__(self, source, key):
+        self.source = source
+        self.key = key
+        self.completed = set()
+
+    def resume(self):
+        # -> True nếu đang tiếp tục một lần chạy dở (không truncate lại, bỏ qua các batch đã commit)
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                _ensure_table(cur)
+                # checkpoint của input khác: dữ liệu dở đó sẽ bị truncate cùng lần nạp lại này
+                cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source = %s AND run_key <> %s",
+                            (self.source, self.key))
+                cur.execute(f"SELECT batch_no, rows_loaded FROM {CHECKPOINT_TABLE} "
+                            f"WHERE source = %s AND run_key = %s", (self.source, self.key))
+                rows = cur.fetchall()
+            conn.commit()
+        self.completed = {batch_no for batch_no, _ in rows}
+        if rows:
+            print(f"♻️  Resuming {self.source}: {len(rows)} batches "
+                  f"({sum(n or 0 for _, n in rows)} rows) already loaded, skipping them")
+        return bool(rows)
+
+    def done(self, batch_no):
+        return batch_no in self.completed
+
+    def mark(self, conn, batch_no, rows):
+        # gọi trước conn.commit() của batch: batch chỉ được đánh dấu khi dữ liệu của nó đã commit
+        with conn.cursor() as cur:
+            cur.execute(f"INSERT INTO {CHECKPOINT_TABLE} (source, run_key, batch_no, rows_loaded) "
+                        f"VALUES (%s, %s, %s, %s)", (self.source, self.key, batch_no, int(rows)))
+        self.completed.add(batch_no)
+
+
+def clear_checkpoints(conn, source):
+    # trong transaction cuối của mọi lần nạp (kể cả incremental / swap): checkpoint dở không còn khớp dữ liệu
+    with conn.cursor() as cur:
+        _ensure_table(cur)
+        cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source = %s", (source,))
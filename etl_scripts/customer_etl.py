@@ -1,27 +1,103 @@
+import os
 import pandas as pd
-from sqlalchemy import text
-from db_connection import get_engine
+from db_connection import pooled_connection
+from job_args import parse_job_args
+from instrumentation import StageTimer, record
+from watermark import get_watermark, set_watermark, file_sha256
+from staging import StagingWriter, DEFAULT_STAGING_MODE, read_manifest, read_staged_part
+from key_map import KeyMap, drop_string_keyed
+from source_schema import CATEGORY, NUMBER, STRING, read_options, per_category, memory_mb
+from change_capture import HASH_COLUMN, stored_hashes, apply_changes
+from validation import Validator
 
 SCHEMA_NAME = "dw"
 INPUT_FILE = "../source_data/customers.csv"
-
-engine = get_engine()
-
-def main():
-    print("🚀 Starting ETL: Customer Dimension")
-
-    # Extract
-    try:
-        df = pd.read_csv(INPUT_FILE)
-        print(f"[EXTRACT] Loaded {len(df)} rows from {INPUT_FILE}")
-    except FileNotFoundError:
-        print(f"❌ File not found: {INPUT_FILE}")
-        return
-    except Exception as e:
-        print(f"❌ Error reading CSV: {e}")
-        return
-
-    # Transform
+SOURCE_NAME = "customers"
+
+# Survey: mọi cột trả lời dạng chữ chỉ có vài lựa chọn -> category; số để read_csv tự suy ra.
+READ_SCHEMA = {
+    'Age': NUMBER, 'Gender': CATEGORY, 'Marital Status': CATEGORY, 'Occupation': CATEGORY,
+    'Educational Qualifications': CATEGORY, 'Family size': NUMBER, 'Frequently used Medium': CATEGORY,
+    'Frequently ordered Meal category ': CATEGORY, 'Perference': CATEGORY, 'Restaurnat Rating': NUMBER,
+    'Delivery Rating': NUMBER, 'No. of orders placed': NUMBER, 'Delivery Time': NUMBER, 'Order Value': NUMBER,
+    'Ease and convenient': CATEGORY, 'Self Cooking': CATEGORY, 'Health Concern': CATEGORY,
+    'Late Delivery': CATEGORY, 'Poor Hygiene': CATEGORY, 'Bad past experience': CATEGORY,
+    'More Offers and Discount': CATEGORY, 'Maximum wait time': CATEGORY, 'Influence of rating': CATEGORY,
+}
+READ_OPTIONS = read_options(READ_SCHEMA)
+
+# thang đồng ý -> số (trống / lạ -> 3, Neutral)
+SCALE_MAP = {
+    'Strongly agree': 5, 'Agree': 4, 'Neutral': 3,
+    'Disagree': 2, 'Strongly disagree': 1
+}
+TRUE_VALUES = ['yes', 'true', '1']
+
+# kiểm tra giữa transform và load (validation.py): dòng thiếu số bắt buộc / sai kiểu / ngoài thang
+# -> quarantine kèm lý do thay vì bị dropna bỏ đi lặng lẽ
+CUSTOMER_RULES = {
+    "types": {'age': "int", 'family_size': "int", 'restaurant_rating': "int", 'delivery_rating': "int",
+              'orders_placed': "int", 'delivery_time': "int", 'order_value': "int"},
+    "required": ['age', 'family_size', 'restaurant_rating', 'delivery_rating', 'orders_placed', 'order_value'],
+    "ranges": {'age': (0, 120), 'family_size': (0, None), 'restaurant_rating': (1, 5), 'delivery_rating': (1, 5),
+               'orders_placed': (0, None), 'delivery_time': (0, None), 'order_value': (0, None)},
+    "unique": ['customer_id'],
+}
+
+# natural key -> customer_id BIGINT ổn định qua các lần chạy (dw.etl_key_map)
+CUSTOMER_KEYS = KeyMap('customer')
+
+# survey không có mã khách -> nhận diện người trả lời bằng hồ sơ nhân khẩu học (cột sau khi đổi tên),
+# ép về kiểu cố định trước khi hash; các câu trả lời còn lại là thuộc tính, sửa được mà không thành khách mới
+CUSTOMER_KEY_COLUMNS = {
+    'age': NUMBER, 'gender': STRING, 'marital_status': STRING, 'occupation': STRING,
+    'education': STRING, 'family_size': NUMBER,
+}
+# change capture: hash các câu trả lời -> khách đã có mà trả lời khác đi được ghi đè (changed), không xoá + thêm
+CUSTOMER_ATTRIBUTES = [
+    'medium_used', 'meal_category', 'preference', 'restaurant_rating', 'delivery_rating', 'orders_placed',
+    'delivery_time', 'order_value', 'ease_convenience', 'self_cooking', 'health_concern', 'late_delivery',
+    'poor_hygiene', 'bad_experience', 'more_offers_discount', 'max_wait_time', 'influence_of_rating',
+]
+
+DIM_CUSTOMER_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.dim_customer (
+        customer_id BIGINT PRIMARY KEY,
+        age INT, gender VARCHAR(10), marital_status VARCHAR(20), occupation VARCHAR(50),
+        education VARCHAR(50), family_size INT, medium_used VARCHAR(50), meal_category VARCHAR(50),
+        preference VARCHAR(50), restaurant_rating INT, delivery_rating INT, orders_placed INT,
+        delivery_time INT, order_value INT, ease_convenience INT, self_cooking BOOLEAN,
+        health_concern INT, late_delivery BOOLEAN, poor_hygiene BOOLEAN, bad_experience INT,
+        more_offers_discount INT, max_wait_time VARCHAR(50), influence_of_rating VARCHAR(50),
+        {HASH_COLUMN} BIGINT
+    );
+    ALTER TABLE {SCHEMA_NAME}.dim_customer ADD COLUMN IF NOT EXISTS {HASH_COLUMN} BIGINT;
+"""
+
+
+def customer_natural_keys(df):
+    # natural key = hash các cột CUSTOMER_KEY_COLUMNS (+ số thứ tự nếu nhiều người cùng hồ sơ).
+    # Số -> Float64, chữ -> string đã strip: '36', 36, 36.0 hay category / object / Arrow cho cùng khoá
+    profile = pd.DataFrame(index=df.index)
+    for col, dtype in CUSTOMER_KEY_COLUMNS.items():
+        if dtype is NUMBER:
+            profile[col] = pd.to_numeric(df[col], errors='coerce').astype('Float64')
+        else:
+            profile[col] = df[col].astype(STRING).str.strip()
+    row_hash = pd.util.hash_pandas_object(profile.astype(str), index=False).astype(str)
+    return row_hash + '#' + row_hash.groupby(row_hash).cumcount().astype(str)
+
+
+def ensure_tables():
+    # bảng cũ dùng khoá chuỗi 'CUS_...' -> tạo lại với BIGINT (phải chạy trước khi đọc watermark)
+    with pooled_connection() as conn:
+        drop_string_keyed(conn, SOURCE_NAME, 'dim_customer', 'customer_id', ['dim_customer'])
+        with conn.cursor() as cur:
+            cur.execute(DIM_CUSTOMER_DDL)
+        conn.commit()
+
+
+def transform_customers(df):
     df.rename(columns={
         'Age': 'age',
         'Gender': 'gender',
@@ -48,54 +124,109 @@ def main():
         'Influence of rating': 'influence_of_rating'
     }, inplace=True)
 
-    # tạo surrogate id cho dim_customer
-    df['customer_id'] = ['CUS_' + str(i + 1) for i in range(len(df))]
-
-    # ép numeric an toàn (không crash), loại bỏ dòng hỏng bắt buộc
-    numeric_cols = [
-        'age','family_size','restaurant_rating','delivery_rating',
-        'orders_placed','order_value','delivery_time'
-    ]
-    for c in numeric_cols:
-        df[c] = pd.to_numeric(df[c], errors='coerce')
-
-    # map thang đo đồng ý → số (nếu trống thì để 3 – Neutral)
-    scale_map = {
-        'Strongly agree': 5, 'Agree': 4, 'Neutral': 3,
-        'Disagree': 2, 'Strongly disagree': 1
-    }
+    # surrogate id cho dim_customer (trước khi map thang đo / boolean, trên giá trị gốc của file)
+    df['customer_id'] = CUSTOMER_KEYS(customer_natural_keys(df))
+
+    # cột số: ép kiểu + loại dòng hỏng ở bước validate (CUSTOMER_RULES)
+
+    # map thang đo đồng ý → số (nếu trống thì để 3 – Neutral), tính trên category
     for col in ['ease_convenience','health_concern','bad_experience','more_offers_discount']:
-        df[col] = df[col].map(scale_map).fillna(3)
+        df[col] = per_category(df[col], lambda s: s.map(SCALE_MAP).fillna(3))
 
-    # boolean chuẩn
+    # boolean chuẩn (vector hoá, thay cho apply lambda từng dòng)
     for col in ['self_cooking','late_delivery','poor_hygiene']:
-        df[col] = df[col].apply(lambda x: str(x).strip().lower() in ['yes','true','1'])
+        df[col] = per_category(df[col], lambda s: s.astype(str).str.strip().str.lower().isin(TRUE_VALUES))
 
-    # bắt buộc các cột numeric tối thiểu phải có (loại dòng bẩn)
-    df.dropna(subset=['age','family_size','restaurant_rating','delivery_rating','orders_placed','order_value'], inplace=True)
+    return df
 
-    # ép về int thật sự cho các cột INT sau khi đã dropna
-    int_cols = ['age','family_size','restaurant_rating','delivery_rating','orders_placed','order_value']
-    for c in int_cols:
-        df[c] = df[c].astype(int)
 
+def load_customers(df, digest):
+    # nạp đầy đủ hay incremental đều so row_hash (của CUSTOMER_ATTRIBUTES) với bản đang có: chỉ ghi dòng
+    # mới / đổi câu trả lời, xoá dòng không còn trong file
+    try:
+        with pooled_connection() as conn:
+            stored = stored_hashes(conn, 'dim_customer', 'customer_id')
+            apply_changes(conn, df, 'dim_customer', 'customer_id', CUSTOMER_ATTRIBUTES, stored)
+            set_watermark(conn, SOURCE_NAME, None, digest, len(df))
+            conn.commit()
+        print(f"✅ Loaded {len(df)} rows into dim_customer")
+    except Exception as e:
+        print(f"❌ Load error: {e}")
+        raise
 
-    # Sau khi hoàn tất chuẩn hoá df
-    df.to_csv("../staging_data/dim_customer_preview.csv", index=False)
-    print("💾 Exported preview: staging_data/dim_customer_preview.csv")
 
+def main(incremental=False, staging=DEFAULT_STAGING_MODE, from_staging=False):
+    if from_staging:
+        return main_from_staging()
 
+    print("🚀 Starting ETL: Customer Dimension")
+    timer = StageTimer("customers")
+
+    # Survey không có cột thời gian -> watermark là hash của file
+    with timer.stage("extract"):
+        ensure_tables()
+        try:
+            digest = file_sha256(INPUT_FILE)
+        except FileNotFoundError:
+            print(f"❌ File not found: {INPUT_FILE}")
+            raise
+        if incremental:
+            _, last_hash = get_watermark(SOURCE_NAME)
+            if digest == last_hash:
+                print(f"⏭️  {INPUT_FILE} unchanged since last load, skipping")
+                return timer.summary()
+
+        # Extract
+        try:
+            df = pd.read_csv(INPUT_FILE, **READ_OPTIONS)
+            record(rows_out=len(df), bytes_read=os.path.getsize(INPUT_FILE))
+            print(f"[EXTRACT] Loaded {len(df)} rows ({memory_mb(df):.1f} MB) from {INPUT_FILE}")
+        except Exception as e:
+            print(f"❌ Error reading CSV: {e}")
+            raise
+
+    # Transform
+    with timer.stage("transform"):
+        record(rows_in=len(df))
+        df = transform_customers(df)
+        record(rows_out=len(df))
+
+    with timer.stage("validate"):
+        validator = Validator(SOURCE_NAME)
+        df = validator.check('dim_customer', df, CUSTOMER_RULES)
+        validator.finish()
+
+    # Sau khi hoàn tất chuẩn hoá df
+    with timer.stage("staging"):
+        stager = StagingWriter(SOURCE_NAME, staging)
+        stager.write("dim_customer", df)
+        stager.finish(file_hash=digest, incremental=incremental)
 
     # Load
-    try:
-        with engine.begin() as conn:
-            conn.execute(text(f"TRUNCATE TABLE {SCHEMA_NAME}.dim_customer CASCADE"))
-        df.to_sql('dim_customer', engine, schema=SCHEMA_NAME, if_exists='append', index=False)
-        print(f"✅ Loaded {len(df)} rows into dim_customer")
-    except Exception as e:
-        print(f"❌ Load error: {e}")
+    with timer.stage("load"):
+        record(rows_in=len(df))
+        load_customers(df, digest)
+
+    print("🎯 Customer ETL completed.\n")
+    return timer.summary()
+
+
+def main_from_staging():
+    print("🚀 Starting ETL: Customer Dimension (from staging)")
+    timer = StageTimer("customers")
+
+    with timer.stage("extract"):
+        manifest = read_manifest(SOURCE_NAME)
+        df = read_staged_part(SOURCE_NAME, "dim_customer", 0)
+        print(f"[EXTRACT] Loaded {len(df)} staged rows written at {manifest['written_at']}")
+
+    with timer.stage("load"):
+        record(rows_in=len(df))
+        ensure_tables()
+        load_customers(df, manifest["file_hash"])
 
     print("🎯 Customer ETL completed.\n")
+    return timer.summary()
 
 if __name__ == "__main__":
-    main()
+    main(**parse_job_args("ETL: customer survey -> dim_customer"))
@@ -1,28 +1,195 @@
 # etl_scripts/db_connection.py
-from sqlalchemy import create_engine, text
-import psycopg2
+import configparser
+import os
+import threading
+import time
+from contextlib import contextmanager
 
-# --- Cấu hình kết nối PostgreSQL (chỉ sửa 1 lần ở đây) ---
+# sqlalchemy / psycopg2 import ở lần tạo engine / pool đầu tiên: main_etl.py --help hay chọn job
+# không phải nạp driver trong process cha
+
+# --- Cấu hình kết nối PostgreSQL mặc định ---
+# Ghi đè bằng file INI (section [database], đường dẫn trong FDW_DB_CONFIG hoặc db_config.ini cạnh file này)
+# hoặc biến môi trường FDW_DB_<KEY>, vd. FDW_DB_HOST, FDW_DB_POOL_SIZE.
 DB_CONFIG = {
     "USER": "postgres",
     "PASSWORD": "12345678",
     "HOST": "localhost",
     "PORT": "5432",
-    "NAME": "food_delivery_dw"
+    "NAME": "food_delivery_dw",
+    "POOL_SIZE": "5",
+    "MAX_OVERFLOW": "5",
+    "POOL_TIMEOUT": "30",
+    "STATEMENT_TIMEOUT_MS": "0",
+    "APPLICATION_NAME": "fooddelivery_etl",
+}
+
+ENV_PREFIX = "FDW_DB_"
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.ini")
+
+# engine / pool dùng chung trong một process (tạo lại sau fork)
+_engine = None
+_pg_pool = None
+_owner_pid = None
+_lock = threading.Lock()
+# bộ đếm của process: nhiều thread (pipeline, đọc song song, ensure_calendar...) cùng mượn kết nối -> cập nhật có khoá
+_metrics_lock = threading.Lock()
+_metrics = {
+    "engine_checkouts": 0,
+    "pg_checkouts": 0,
+    "pg_wait_seconds": 0.0,
+    "pg_max_wait_seconds": 0.0,
+    "pg_in_use": 0,
+    "pg_peak_in_use": 0,
+    "pg_timeouts": 0,
 }
 
-# --- Tạo SQLAlchemy engine (cho pandas.to_sql, etc.) ---
+
+def load_config():
+    config = dict(DB_CONFIG)
+    path = os.environ.get(ENV_PREFIX + "CONFIG", DEFAULT_CONFIG_FILE)
+    if os.path.exists(path):
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if parser.has_section("database"):
+            config.update({k.upper(): v for k, v in parser.items("database")})
+    for key in config:
+        if ENV_PREFIX + key in os.environ:
+            config[key] = os.environ[ENV_PREFIX + key]
+    return config
+
+
+def _count(**deltas):
+    with _metrics_lock:
+        for name, delta in deltas.items():
+            _metrics[name] += delta
+
+
+def _session_options(config):
+    # statement_timeout + application_name cho mọi kết nối (SQLAlchemy lẫn psycopg2)
+    return f"-c statement_timeout={int(config['STATEMENT_TIMEOUT_MS'])}"
+
+
+def _reset_after_fork():
+    # process con (fork) không được dùng socket của process cha
+    global _engine, _pg_pool, _owner_pid
+    if _owner_pid != os.getpid():
+        if _engine is not None:
+            _engine.dispose(close=False)
+        _engine = None
+        _pg_pool = None
+        _owner_pid = os.getpid()
+
+
+# --- SQLAlchemy engine (cho pandas.read_sql, DDL, TRUNCATE) ---
 def get_engine():
-    conn_str = f"postgresql://{DB_CONFIG['USER']}:{DB_CONFIG['PASSWORD']}@" \
-               f"{DB_CONFIG['HOST']}:{DB_CONFIG['PORT']}/{DB_CONFIG['NAME']}"
-    return create_engine(conn_str)
+    global _engine
+    with _lock:
+        _reset_after_fork()
+        if _engine is None:
+            from sqlalchemy import create_engine, event
+            from sqlalchemy.engine import URL
+            config = load_config()
+            url = URL.create(
+                "postgresql+psycopg2",
+                username=config["USER"],
+                password=config["PASSWORD"] or None,
+                host=config["HOST"],
+                port=int(config["PORT"]),
+                database=config["NAME"],
+            )
+            _engine = create_engine(
+                url,
+                pool_size=int(config["POOL_SIZE"]),
+                max_overflow=int(config["MAX_OVERFLOW"]),
+                pool_timeout=float(config["POOL_TIMEOUT"]),
+                pool_pre_ping=True,
+                connect_args={
+                    "application_name": config["APPLICATION_NAME"],
+                    "options": _session_options(config),
+                },
+            )
 
-# --- Tạo kết nối psycopg2 (cho thao tác cursor thủ công) ---
-def get_connection():
-    return psycopg2.connect(
-        host=DB_CONFIG["HOST"],
-        database=DB_CONFIG["NAME"],
-        user=DB_CONFIG["USER"],
-        password=DB_CONFIG["PASSWORD"],
-        port=DB_CONFIG["PORT"]
+            @event.listens_for(_engine, "checkout")
+            def _count_checkout(*_):
+                _count(engine_checkouts=1)
+
+        return _engine
+
+
+# --- Pool psycopg2 (cho COPY / cursor thủ công) ---
+def _get_pg_pool():
+    global _pg_pool
+    with _lock:
+        _reset_after_fork()
+        if _pg_pool is None:
+            from psycopg2 import pool as pg_pool
+            config = load_config()
+            max_conn = int(config["POOL_SIZE"]) + int(config["MAX_OVERFLOW"])
+            _pg_pool = {
+                "pool": pg_pool.ThreadedConnectionPool(0, max_conn, **_connect_kwargs(config)),
+                # ThreadedConnectionPool báo lỗi ngay khi hết kết nối -> semaphore để chờ có timeout
+                "slots": threading.BoundedSemaphore(max_conn),
+                "timeout": float(config["POOL_TIMEOUT"]),
+            }
+        return _pg_pool
+
+
+def _connect_kwargs(config):
+    return dict(
+        host=config["HOST"],
+        database=config["NAME"],
+        user=config["USER"],
+        password=config["PASSWORD"],
+        port=config["PORT"],
+        application_name=config["APPLICATION_NAME"],
+        options=_session_options(config),
     )
+
+
+@contextmanager
+def pooled_connection():
+    import psycopg2
+    state = _get_pg_pool()
+    start = time.perf_counter()
+    if not state["slots"].acquire(timeout=state["timeout"]):
+        _count(pg_timeouts=1)
+        raise TimeoutError(f"No PostgreSQL connection available after {state['timeout']}s")
+    waited = time.perf_counter() - start
+    with _metrics_lock:
+        _metrics["pg_checkouts"] += 1
+        _metrics["pg_wait_seconds"] += waited
+        _metrics["pg_max_wait_seconds"] = max(_metrics["pg_max_wait_seconds"], waited)
+        _metrics["pg_in_use"] += 1
+        _metrics["pg_peak_in_use"] = max(_metrics["pg_peak_in_use"], _metrics["pg_in_use"])
+
+    conn = None
+    try:
+        conn = state["pool"].getconn()
+        yield conn
+    finally:
+        if conn is not None:
+            # giống conn.close(): transaction chưa commit bị huỷ trước khi trả kết nối về pool
+            discard = bool(conn.closed)
+            if not discard and conn.status != psycopg2.extensions.STATUS_READY:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            state["pool"].putconn(conn, close=discard)
+        _count(pg_in_use=-1)
+        state["slots"].release()
+
+
+# --- Kết nối psycopg2 riêng, không qua pool (người gọi tự close) ---
+def get_connection():
+    import psycopg2
+    return psycopg2.connect(**_connect_kwargs(load_config()))
+
+
+def pool_metrics():
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    if _engine is not None and _owner_pid == os.getpid():
+        metrics["engine_pool"] = _engine.pool.status()
+    return metrics
@@ -1,37 +1,106 @@
 import pandas as pd
 from sqlalchemy import text
-import time
-from db_connection import get_engine
+from db_connection import get_engine, pooled_connection
+from bulk_loader import copy_dataframe
+from job_args import parse_job_args
+from instrumentation import StageTimer, record
+from watermark import get_watermark, set_watermark, latest
+from staging import StagingWriter, DEFAULT_STAGING_MODE, read_manifest, iter_staged_parts
+from time_dim import TimestampParser, time_keys, ensure_calendar, ensure_dim_time
+from key_map import KeyMap, drop_string_keyed
+from partitions import PartitionSwap, ensure_partitioned, ensure_partitions, month_dates
+from marts import ensure_event_rollup, refresh_event_rollup, add_event_rollup
+from validation import Validator
+from checkpoint import Checkpoint, run_key, clear_checkpoints
+from pipeline import Pipeline, DEFAULT_PIPELINE_DEPTH, DEFAULT_TRANSFORM_WORKERS
+from source_schema import CATEGORY, STRING, NUMBER, read_options, per_category, memory_mb
+from source_files import (DEFAULT_CSV_ENGINE, DEFAULT_READ_WORKERS, resolve_inputs, fingerprint, combined_digest,
+                          describe, iter_source_chunks, read_source, pending_files, record_ingested)
 
 # --- Config ---
 INPUT_FILE = "../source_data/ecommerce_clickstream_transactions.csv"
 SCHEMA_NAME = "dw"
+SOURCE_NAME = "events"
 
-# --- Kết nối PostgreSQL duy nhất ---
-engine = get_engine()
+# Cột đọc từ CSV: UserID dạng string để khoá user không đổi kiểu giữa các chunk,
+# EventType / ProductID / Outcome chỉ vài giá trị -> category
+READ_SCHEMA = {
+    'UserID': STRING, 'SessionID': NUMBER, 'Timestamp': STRING, 'EventType': CATEGORY,
+    'ProductID': CATEGORY, 'Amount': NUMBER, 'Outcome': CATEGORY,
+}
+READ_OPTIONS = read_options(READ_SCHEMA)
+
+# Timestamp dạng '2024-07-01 00:13:02.000000', nhiều event trùng giây -> parse mỗi chuỗi một lần
+EVENT_TIME_PARSER = TimestampParser('ISO8601')
+
+# UserID -> user_sk BIGINT ổn định qua các lần chạy (dw.etl_key_map)
+USER_KEYS = KeyMap('user')
+
+# kiểm tra giữa transform và load (validation.py): số sai kiểu / âm, user_sk không có trong dim_user của batch
+FACT_EVENTS_RULES = {
+    "types": {'sessionid': "int", 'amount': "number"},
+    # Timestamp không parse được -> time_key NULL: quarantine như mọi dòng lỗi khác, ở cả hai chế độ nạp
+    "required": ['time_key'],
+    "ranges": {'amount': (0, None)},
+    "references": {'user_sk': 'dim_user'},
+}
+
+DIM_USER_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.dim_user (
+        user_sk BIGINT PRIMARY KEY,
+        user_id VARCHAR(50) NOT NULL
+    );
+"""
+
+# phân vùng RANGE theo tháng của time_key (timestamp gốc là text). Partition DEFAULT chỉ còn giữ các dòng
+# time_key NULL nạp từ trước khi bước validate loại chúng (FACT_EVENTS_RULES).
+# Event nạp theo thứ tự thời gian -> BRIN trên time_key (vài trang mỗi partition) thay cho btree;
+# dashboard đọc dw_mart.mart_events_daily, không quét fact.
+FACT_APP_EVENTS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.fact_app_events (
+        user_sk BIGINT REFERENCES {SCHEMA_NAME}.dim_user(user_sk),
+        sessionid INTEGER,
+        timestamp VARCHAR(50),
+        time_key BIGINT REFERENCES {SCHEMA_NAME}.dim_time(time_key),
+        event_name VARCHAR(100),
+        productid VARCHAR(100),
+        amount DECIMAL(10,2),
+        outcome VARCHAR(100)
+    ) PARTITION BY RANGE (time_key);
+    DROP INDEX IF EXISTS {SCHEMA_NAME}.ix_fact_app_events_time_key;
+    CREATE INDEX IF NOT EXISTS ix_fact_app_events_time_brin ON {SCHEMA_NAME}.fact_app_events USING brin (time_key);
+    CREATE INDEX IF NOT EXISTS ix_fact_app_events_user_sk ON {SCHEMA_NAME}.fact_app_events(user_sk);
+"""
 
 # =====================================================
 # 1. CREATE DIM_USER
 # =====================================================
 def create_dim_user(df):
-    unique_users = df[['UserID']].drop_duplicates().reset_index(drop=True)
-    unique_users['user_sk'] = 'CLK_U' + (unique_users.index + 1).astype(str)
-
-    dim_user = unique_users[['user_sk', 'UserID']].rename(columns={'UserID': 'user_id'})
+    user_ids = df['UserID'].dropna().drop_duplicates()
+    dim_user = pd.DataFrame({'user_sk': USER_KEYS(user_ids), 'user_id': user_ids}).reset_index(drop=True)
     print(f"✅ Created dim_user: {len(dim_user)} unique users")
     return dim_user
 
 
+def new_dim_users(dim_user, loaded_users):
+    # loaded_users: user_id đã có trong dim_user (chunk trước / lần chạy trước), cập nhật tại chỗ
+    new_users = dim_user[~dim_user['user_id'].isin(loaded_users)]
+    loaded_users.update(new_users['user_id'])
+    return new_users
+
+
 # =====================================================
 # 2. TRANSFORM FACT_APP_EVENTS
 # =====================================================
-def transform_fact_events(df, dim_user):
-    # Ép kiểu ID về string để merge an toàn
-    df['UserID'] = df['UserID'].astype(str)
-    dim_user['user_id'] = dim_user['user_id'].astype(str)
+def clean_text(values):
+    # strip; ô trống (và chuỗi 'nan') -> None
+    cleaned = values.astype(str).str.strip()
+    return cleaned.where(cleaned != 'nan', None)
+
 
-    df_clean = df.merge(dim_user, left_on='UserID', right_on='user_id', how='left')
-    df_clean = df_clean.drop(columns=['UserID', 'user_id'])  # 🔥 chỉ còn user_id, không còn userid
+def transform_fact_events(df):
+    # user_sk tra thẳng từ key map (đã cache), không cần merge với dim_user
+    df_clean = df.assign(user_sk=USER_KEYS(df['UserID'])).drop(columns=['UserID'])
 
     column_mapping = {
         'SessionID': 'sessionid',
@@ -44,129 +113,420 @@ def transform_fact_events(df, dim_user):
 
     df_clean = df_clean.rename(columns=column_mapping)
 
-    # Chuẩn hoá dữ liệu
-    numeric_cols = ['sessionid', 'amount']
-    for col in numeric_cols:
-        if col in df_clean.columns:
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
-
+    # Chuẩn hoá dữ liệu (cột số ép kiểu ở bước validate, FACT_EVENTS_RULES)
     text_cols = ['event_name', 'productid', 'outcome']
     for col in text_cols:
         if col in df_clean.columns:
-            df_clean[col] = df_clean[col].astype(str).str.strip()
-            df_clean[col] = df_clean[col].replace('nan', None)
+            df_clean[col] = per_category(df_clean[col], clean_text)
 
-    column_order = ['user_sk', 'sessionid', 'timestamp', 'event_name', 'productid', 'amount', 'outcome']
+    # khoá ngoại sang dim_time, timestamp gốc vẫn giữ dạng text
+    df_clean['time_key'] = time_keys(EVENT_TIME_PARSER(df_clean['timestamp']))
+
+    column_order = ['user_sk', 'sessionid', 'timestamp', 'time_key', 'event_name', 'productid', 'amount', 'outcome']
     df_clean = df_clean[column_order]
 
     print(f"✅ Transformed fact_app_events: {len(df_clean)} rows")
     return df_clean
 
 
+def validate_events(validator, dim_user, fact_events):
+    return validator.check('fact_app_events', fact_events, FACT_EVENTS_RULES, dims={'dim_user': dim_user})
+
+
+def prepare_chunk(timer, validator, chunk, since=None):
+    # transform + validate một chunk -> (số dòng sau lọc watermark, dim_user, fact_events).
+    # user mới so với các chunk trước (new_dim_users) tính ở phía writer -> chạy được trong thread transform
+    with timer.stage("transform"):
+        record(rows_in=len(chunk))
+        if since is not None:
+            # timestamp hỏng (NaT) không so được với watermark -> giữ lại để bước validate đưa vào quarantine,
+            # giống khi nạp lại toàn bộ (không lặng lẽ bỏ đi)
+            ts = EVENT_TIME_PARSER(chunk['Timestamp'])
+            chunk = chunk[ts.isna() | (ts > since)].copy()
+
+        dim_user = create_dim_user(chunk)
+        fact_events = transform_fact_events(chunk)
+        record(rows_out=len(fact_events))
+
+    with timer.stage("validate"):
+        fact_events = validate_events(validator, dim_user, fact_events)
+    return len(chunk), dim_user, fact_events
+
+
 # =====================================================
 # 3. LOAD TO POSTGRESQL
 # =====================================================
-def load_dimension(df, table_name):
-    try:
-        with engine.begin() as conn:
-            conn.execute(text(f"TRUNCATE TABLE {SCHEMA_NAME}.{table_name} CASCADE"))
-        print(f"🧹 Truncated {table_name}")
-    except Exception as e:
-        print(f"⚠️  Warning: Could not truncate {table_name}: {e}")
-
-    start = time.time()
-    df.to_sql(
-        name=table_name,
-        con=engine,
-        schema=SCHEMA_NAME,
-        if_exists='append',
-        index=False,
-        chunksize=1000,
-        method='multi'
-    )
-    elapsed = time.time() - start
-    print(f"⬆️  Loaded {len(df)} rows into {table_name} in {elapsed:.2f}s")
-
-
-def load_fact(df, table_name):
-    start = time.time()
-    df.to_sql(
-        name=table_name,
-        con=engine,
-        schema=SCHEMA_NAME,
-        if_exists='append',
-        index=False,
-        chunksize=5000,
-        method='multi'
-    )
-    elapsed = time.time() - start
-    return elapsed
+def truncate_table(conn, table_name):
+    # trong transaction của lần nạp (hoặc của batch đầu tiên): lỗi trước khi commit -> bảng còn dữ liệu cũ.
+    # dim_user CASCADE -> cả fact_app_events
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE TABLE {SCHEMA_NAME}.{table_name} CASCADE")
+    print(f"🧹 Truncated {table_name}")
+
+
+def prepare_fact(df, table_name, partitions=True):
+    # dim_time + partition tháng mới: transaction ngắn riêng, chạy trước mọi thao tác ghi của batch
+    ensure_calendar(EVENT_TIME_PARSER(df['timestamp']))
+    if partitions:
+        ensure_partitions(table_name, df['time_key'])
+
+
+def load_fact(df, table_name, conn):
+    return copy_dataframe(df, table_name, schema=SCHEMA_NAME, conn=conn)
+
+
+def ensure_tables():
+    # bảng cũ dùng khoá chuỗi 'CLK_U...' -> tạo lại với BIGINT (phải chạy trước khi đọc watermark)
+    # dim_time (lịch theo phút) phải có trước vì fact_app_events có FK time_key;
+    # fact_app_events dạng bảng thường từ trước -> chuyển sang phân vùng theo tháng
+    with pooled_connection() as conn:
+        drop_string_keyed(conn, SOURCE_NAME, 'dim_user', 'user_sk', ['fact_app_events', 'dim_user'])
+        ensure_dim_time(conn)
+        with conn.cursor() as cur:
+            cur.execute(DIM_USER_DDL)
+        ensure_partitioned(conn, 'fact_app_events', FACT_APP_EVENTS_DDL)
+        ensure_event_rollup(conn)
+        conn.commit()
+
+
+def load_user_ids(engine):
+    # user_id đã có trong dim_user, dùng khi nạp incremental
+    dim_user = pd.read_sql(text(f"SELECT user_id FROM {SCHEMA_NAME}.dim_user"), engine)
+    return set(dim_user['user_id'].astype(str))
+
+
+def max_event_time(fact_events):
+    ts = EVENT_TIME_PARSER(fact_events['timestamp'])
+    return ts.max() if ts.notna().any() else None
 
 
 # =====================================================
 # 4. MAIN ETL
 # =====================================================
-def main():
+def main(chunk_rows=None, incremental=False, staging=DEFAULT_STAGING_MODE, from_staging=False, swap_partitions=False,
+         input_path=None, read_workers=DEFAULT_READ_WORKERS, csv_engine=DEFAULT_CSV_ENGINE,
+         pipeline_depth=DEFAULT_PIPELINE_DEPTH, transform_workers=DEFAULT_TRANSFORM_WORKERS):
+    if incremental and swap_partitions:
+        raise ValueError("--swap-partitions replaces whole months and cannot be combined with --incremental")
+    if from_staging:
+        return main_from_staging()
+    if chunk_rows or incremental or swap_partitions or pipeline_depth:
+        return main_streaming(chunk_rows, incremental=incremental, staging=staging, swap_partitions=swap_partitions,
+                              input_path=input_path, read_workers=read_workers, csv_engine=csv_engine,
+                              pipeline_depth=pipeline_depth, transform_workers=transform_workers)
+
     print("🚀 Starting ETL: Event Data\n")
+    timer = StageTimer("events")
 
     # Extract
-    try:
-        df = pd.read_csv(INPUT_FILE)
-        print(f"[EXTRACT] Loaded {len(df)} rows from {INPUT_FILE}")
-    except FileNotFoundError:
-        print(f"❌ File not found: {INPUT_FILE}")
-        return
-    except Exception as e:
-        print(f"❌ Error reading CSV: {e}")
-        return
+    with timer.stage("extract"):
+        try:
+            paths = resolve_inputs(input_path or INPUT_FILE)
+            df = read_source(paths, READ_OPTIONS, engine=csv_engine, workers=read_workers)
+            record(rows_out=len(df))
+            print(f"[EXTRACT] Loaded {len(df)} rows ({memory_mb(df):.1f} MB) from {describe(paths)}")
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            raise
+        except Exception as e:
+            print(f"❌ Error reading CSV: {e}")
+            raise
 
     # Transform
-    try:
-        dim_user = create_dim_user(df)
-        fact_events = transform_fact_events(df, dim_user)
-    except Exception as e:
-        print(f"❌ Transform error: {e}")
-        return
-    
-    dim_user.to_csv("../staging_data/dim_user_preview.csv", index=False)
-    fact_events.to_csv("../staging_data/fact_app_events_preview.csv", index=False)
-    print("💾 Exported preview CSVs to staging_data/")
+    with timer.stage("transform"):
+        try:
+            dim_user = create_dim_user(df)
+            fact_events = transform_fact_events(df)
+            record(rows_in=len(df), rows_out=len(fact_events))
+        except Exception as e:
+            print(f"❌ Transform error: {e}")
+            raise
+
+    # dòng lỗi -> quarantine, dừng luôn nếu quá nhiều (trước khi chạm tới database)
+    with timer.stage("validate"):
+        validator = Validator(SOURCE_NAME)
+        fact_events = validate_events(validator, dim_user, fact_events)
+        validator.finish()
+
+    with timer.stage("staging"):
+        files = fingerprint(paths, read_workers)
+        digest = combined_digest(files)
+        high_water = max_event_time(fact_events)
+        stager = StagingWriter(SOURCE_NAME, staging)
+        stager.write("dim_user", dim_user)
+        stager.write("fact_app_events", fact_events, partition_by="timestamp")
+        stager.finish(file_hash=digest, incremental=False, high_water=high_water, rows=len(fact_events), files=files)
 
     # Load
-    try:
-        print("\n[LOAD] Writing to PostgreSQL...")
-        load_dimension(dim_user, "dim_user")
-        elapsed = load_fact(fact_events, "fact_app_events")
-
-        with engine.connect() as conn:
-            dim_count = conn.execute(text(f"SELECT COUNT(*) FROM {SCHEMA_NAME}.dim_user")).scalar()
-            fact_count = conn.execute(text(f"SELECT COUNT(*) FROM {SCHEMA_NAME}.fact_app_events")).scalar()
-
-        print(f"\n✅ Load completed: {fact_count} fact rows, {dim_count} dim rows in {elapsed:.2f}s")
-    except Exception as e:
-        print(f"❌ Load error: {e}")
-        print("""
+    with timer.stage("load"):
+        try:
+            print("\n[LOAD] Writing to PostgreSQL...")
+            record(rows_in=len(fact_events))
+            engine = get_engine()
+            ensure_tables()
+
+            prepare_fact(fact_events, "fact_app_events")
+            # truncate + dim + fact + rollup + watermark: một transaction
+            with pooled_connection() as conn:
+                truncate_table(conn, "dim_user")
+                copy_dataframe(dim_user, "dim_user", schema=SCHEMA_NAME, conn=conn)
+                elapsed = load_fact(fact_events, "fact_app_events", conn=conn)
+                refresh_event_rollup(conn)
+                record_ingested(conn, SOURCE_NAME, files, replace=True)
+                set_watermark(conn, SOURCE_NAME, high_water, digest, len(fact_events))
+                clear_checkpoints(conn, SOURCE_NAME)
+                conn.commit()
+
+            with engine.connect() as conn:
+                dim_count = conn.execute(text(f"SELECT COUNT(*) FROM {SCHEMA_NAME}.dim_user")).scalar()
+                fact_count = conn.execute(text(f"SELECT COUNT(*) FROM {SCHEMA_NAME}.fact_app_events")).scalar()
+
+            print(f"\n✅ Load completed: {fact_count} fact rows, {dim_count} dim rows in {elapsed:.2f}s")
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            print("""
 Make sure these tables exist:
 
 CREATE TABLE public.dim_user (
-    user_sk VARCHAR(50) PRIMARY KEY,
+    user_sk BIGINT PRIMARY KEY,
     user_id VARCHAR(50) NOT NULL
 );
 
 CREATE TABLE public.fact_app_events (
-    user_sk VARCHAR(50) REFERENCES dim_user(user_sk),
+    user_sk BIGINT REFERENCES dim_user(user_sk),
     sessionid INTEGER,
     timestamp VARCHAR(50),
+    time_key BIGINT REFERENCES dim_time(time_key),
     event_name VARCHAR(100),
     productid VARCHAR(100),
     amount DECIMAL(10,2),
     outcome VARCHAR(100)
-);
+) PARTITION BY RANGE (time_key);
 """)
-        return
+            raise
+
+    print("\n🎯 ETL completed successfully!")
+    return timer.summary()
+
+
+# =====================================================
+# 5. MAIN ETL - STREAMING THEO CHUNK
+# =====================================================
+def main_streaming(chunk_rows=None, incremental=False, staging=DEFAULT_STAGING_MODE, swap_partitions=False,
+                   input_path=None, read_workers=DEFAULT_READ_WORKERS, csv_engine=DEFAULT_CSV_ENGINE,
+                   pipeline_depth=DEFAULT_PIPELINE_DEPTH, transform_workers=DEFAULT_TRANSFORM_WORKERS):
+    mode = "incremental" if incremental else "partition swap" if swap_partitions else "full reload"
+    size = f"{chunk_rows} rows/chunk" if chunk_rows else "whole file"
+    if pipeline_depth:
+        size += f", pipelined: depth {pipeline_depth}, {transform_workers} transform workers"
+    print(f"🚀 Starting ETL: Event Data ({mode}, {size})\n")
+    timer = StageTimer("events")
+
+    # Extract
+    with timer.stage("extract"):
+        try:
+            paths = resolve_inputs(input_path or INPUT_FILE)
+            ensure_tables()
+            files = fingerprint(paths, read_workers)
+            digest = combined_digest(files)
+            high_water = None
+            if incremental or swap_partitions:
+                high_water, last_hash = get_watermark(SOURCE_NAME)
+            if incremental:
+                if digest == last_hash:
+                    print(f"⏭️  {describe(paths)} unchanged since last load, skipping")
+                    return timer.summary()
+                # file đã nạp ở lần trước (cùng kích thước + sha256) không đọc lại
+                files = pending_files(SOURCE_NAME, files)
+                if not files:
+                    return timer.summary()
+                print(f"🔖 Watermark: Timestamp > {high_water}")
+
+            # nạp lại toàn bộ commit từng chunk -> chạy lại sau lỗi tiếp tục từ batch chưa commit
+            # (incremental / partition swap: lỗi giữa chừng không để lại dữ liệu dở, chạy lại từ đầu)
+            checkpoint = None
+            resuming = False
+            if not incremental and not swap_partitions:
+                checkpoint = Checkpoint(SOURCE_NAME, run_key(digest, chunk_rows))
+                resuming = checkpoint.resume()
+
+            # đọc lười: từng chunk (hoặc từng file) được đọc khi vòng lặp bên dưới cần tới
+            reader = iter_source_chunks([f["path"] for f in files], READ_OPTIONS, chunk_rows,
+                                        engine=csv_engine, workers=read_workers)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            raise
+
+    stager = StagingWriter(SOURCE_NAME, staging)
+    validator = Validator(SOURCE_NAME, run_key=checkpoint.key if checkpoint is not None else None)
+
+    # incremental / partition swap: giữ nguyên dim_user, chỉ thêm user chưa có (user_sk lấy từ key map).
+    # Nạp lại toàn bộ: dim_user của các batch đã nạp (khi tiếp tục) được dựng lại khi đi qua các batch đó
+    with timer.stage("load"):
+        if incremental or swap_partitions:
+            loaded_users = load_user_ids(get_engine())
+        else:
+            loaded_users = set()
+
+    # fact_app_events không có khoá chính -> chỉ lấy event sau watermark (timestamp tới micro giây)
+    since = pd.Timestamp(high_water) if incremental and high_water else None
+    max_seen = since
+    total_rows = 0
+    elapsed = 0.0
+    with pooled_connection() as conn:
+        swap = PartitionSwap(conn, 'fact_app_events') if swap_partitions else None
+        # full reload: truncate + rollup về rỗng, commit cùng chunk đầu; sau đó mỗi chunk cộng dồn
+        truncate = checkpoint is not None and not resuming
+        try:
+            # pipeline_depth > 0: đọc + transform chunk sau trong thread riêng trong lúc chunk này đang nạp;
+            # thread này (writer) giữ connection, staging và tập user đã nạp
+            chunks = Pipeline(timer.iterate("extract", reader, rows=len),
+                              lambda chunk: prepare_chunk(timer, validator, chunk, since),
+                              depth=pipeline_depth, workers=transform_workers)
+            with chunks:
+                for i, (rows, dim_user, fact_events) in enumerate(chunks):
+                    with timer.stage("transform"):
+                        new_users = new_dim_users(dim_user, loaded_users)
+
+                    with timer.stage("staging"):
+                        stager.write("dim_user", new_users)
+                        stager.write("fact_app_events", fact_events, partition_by="timestamp")
+
+                    # dim + fact + checkpoint của một chunk commit cùng một transaction
+                    # (incremental: commit một lần cuối cùng để watermark không vượt qua chunk chưa nạp;
+                    # user mới commit riêng từng chunk, chạy lại không nhân đôi vì user đã có bị bỏ qua);
+                    # batch đã commit ở lần chạy dở trước thì bỏ qua
+                    loaded = checkpoint is not None and checkpoint.done(i)
+                    if not loaded:
+                        with timer.stage("load"):
+                            record(rows_in=len(fact_events))
+                            prepare_fact(fact_events, "fact_app_events", partitions=swap is None)
+                            if truncate:
+                                truncate_table(conn, "dim_user")
+                                refresh_event_rollup(conn)
+                                truncate = False
+                            copy_dataframe(new_users, "dim_user", schema=SCHEMA_NAME,
+                                           conn=None if incremental else conn)
+                            if swap is not None:
+                                # thay trọn tháng: fact vào bảng staging của tháng, swap sau khi nạp hết các chunk
+                                swap.write(fact_events)
+                            else:
+                                elapsed += load_fact(fact_events, "fact_app_events", conn=conn)
+                                add_event_rollup(conn, fact_events)
+                            if checkpoint is not None:
+                                checkpoint.mark(conn, i, len(fact_events))
+                            if not incremental:
+                                conn.commit()
+
+                    chunk_max = max_event_time(fact_events)
+                    if chunk_max is not None:
+                        max_seen = chunk_max if max_seen is None else max(max_seen, chunk_max)
+                    total_rows += len(fact_events)
+                    print(f"📦 Chunk {i + 1}: {rows} rows, {len(new_users)} new users"
+                          f"{' (already loaded)' if loaded else ''}")
+
+            # nạp lại tháng cũ không được kéo watermark lùi lại
+            if swap is not None:
+                max_seen = latest(high_water, max_seen)
+
+            with timer.stage("staging"):
+                stager.finish(file_hash=digest, incremental=incremental, swap_partitions=swap_partitions,
+                              high_water=max_seen, rows=total_rows, files=files)
+            with timer.stage("validate"):
+                validator.finish()
+
+            with timer.stage("load"):
+                # không có batch nào -> vẫn làm rỗng bảng như bản nạp lại toàn bộ
+                if truncate:
+                    truncate_table(conn, "dim_user")
+                    refresh_event_rollup(conn)
+                if swap is not None:
+                    # tháng bị thay có thể mất / đổi event -> tính lại rollup của các ngày trong tháng
+                    refresh_event_rollup(conn, month_dates(swap.finish()))
+                record_ingested(conn, SOURCE_NAME, files, replace=not incremental and not swap_partitions)
+                set_watermark(conn, SOURCE_NAME, max_seen, digest, total_rows)
+                clear_checkpoints(conn, SOURCE_NAME)
+                conn.commit()
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
+
+    print(f"\n✅ Load completed: {total_rows} fact rows, {len(loaded_users)} dim rows in {elapsed:.2f}s")
+    print("\n🎯 ETL completed successfully!")
+    return timer.summary()
+
+
+# =====================================================
+# 6. MAIN ETL - NẠP LẠI TỪ STAGING PARQUET
+# =====================================================
+def main_from_staging():
+    print("🚀 Starting ETL: Event Data (from staging)\n")
+    timer = StageTimer("events")
+
+    with timer.stage("extract"):
+        manifest = read_manifest(SOURCE_NAME)
+        incremental = manifest["incremental"]
+        swap_partitions = manifest.get("swap_partitions", False)
+        print(f"[EXTRACT] Using staging written at {manifest['written_at']}")
+
+    with timer.stage("load"):
+        ensure_tables()
+
+    # cùng cách commit với main_streaming: mỗi part một transaction (kèm checkpoint), incremental commit một lần
+    checkpoint = None
+    resuming = False
+    if not incremental and not swap_partitions:
+        checkpoint = Checkpoint(SOURCE_NAME, run_key(manifest["file_hash"], manifest["written_at"], "staging"))
+        resuming = checkpoint.resume()
+
+    total_rows = 0
+    with pooled_connection() as conn:
+        swap = PartitionSwap(conn, 'fact_app_events') if swap_partitions else None
+        truncate = checkpoint is not None and not resuming
+        try:
+            for i, part in enumerate(timer.iterate("extract", iter_staged_parts(SOURCE_NAME, manifest))):
+                if checkpoint is not None and checkpoint.done(i):
+                    total_rows += len(part["fact_app_events"])
+                    continue
+                with timer.stage("load"):
+                    record(rows_in=len(part["fact_app_events"]))
+                    prepare_fact(part["fact_app_events"], "fact_app_events", partitions=swap is None)
+                    if truncate:
+                        truncate_table(conn, "dim_user")
+                        refresh_event_rollup(conn)
+                        truncate = False
+                    copy_dataframe(part["dim_user"], "dim_user", schema=SCHEMA_NAME,
+                                   conn=None if incremental else conn)
+                    if swap is not None:
+                        swap.write(part["fact_app_events"])
+                    else:
+                        load_fact(part["fact_app_events"], "fact_app_events", conn=conn)
+                        add_event_rollup(conn, part["fact_app_events"])
+                    if checkpoint is not None:
+                        checkpoint.mark(conn, i, len(part["fact_app_events"]))
+                    if not incremental:
+                        conn.commit()
+                total_rows += len(part["fact_app_events"])
+
+            with timer.stage("load"):
+                if truncate:
+                    truncate_table(conn, "dim_user")
+                    refresh_event_rollup(conn)
+                if swap is not None:
+                    refresh_event_rollup(conn, month_dates(swap.finish()))
+                record_ingested(conn, SOURCE_NAME, manifest.get("files", []),
+                                replace=not incremental and not swap_partitions)
+                set_watermark(conn, SOURCE_NAME, manifest["high_water"], manifest["file_hash"], manifest["rows"])
+                clear_checkpoints(conn, SOURCE_NAME)
+                conn.commit()
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
 
+    print(f"\n✅ Load completed: {total_rows} fact rows from staging")
     print("\n🎯 ETL completed successfully!")
+    return timer.summary()
 
 
 if __name__ == "__main__":
-    main()
+    main(**parse_job_args("ETL: clickstream events -> dim_user, fact_app_events", streaming=True))
@@ -1,81 +1,225 @@
-import pandas as pd
-from textblob import TextBlob
-from sqlalchemy import text
-from db_connection import get_engine
-
-INPUT_FILE = "../source_data/Reviews.csv"
-SCHEMA_NAME = "dw"
-
-engine = get_engine()
-
-def get_sentiment(text_input):
-    try:
-        return TextBlob(text_input).sentiment.polarity
-    except:
-        return 0
-
-def main():
-    print("🚀 Starting ETL: Reviews Fact")
-
-    # Extract
-    try:
-        df = pd.read_csv(INPUT_FILE, encoding='latin1')
-        print(f"[EXTRACT] Loaded {len(df)} rows from {INPUT_FILE}")
-    except FileNotFoundError:
-        print(f"❌ File not found: {INPUT_FILE}")
-        return
-    except Exception as e:
-        print(f"❌ Error reading CSV: {e}")
-        return
-
-    # Transform
-    df = df[['UserId', 'Score', 'Time', 'Summary']].drop_duplicates()
-    df.dropna(subset=['UserId', 'Score', 'Summary'], inplace=True)
-    df['reviewer_id'] = 'REV_' + df['UserId'].astype(str)   # 👈 Đổi user_id → reviewer_id
-    df['sentiment_score'] = df['Summary'].astype(str).apply(get_sentiment)
-    # Đổi tên cột sang lowercase cho khớp PostgreSQL
-    df = df.rename(columns={
-        'UserId': 'user_id',
-        'Score': 'score',
-        'Time': 'time',
-        'Summary': 'summary'
-    })
-
-    df = df[['reviewer_id', 'score', 'time', 'summary', 'sentiment_score']]
-
-
-    df.to_csv("../staging_data/fact_reviews_preview.csv", index=False)
-    print("💾 Exported preview: staging_data/fact_reviews_preview.csv")
-
-
-    # -> build dimension + DDL tối thiểu
-    dim_reviewer = df[['reviewer_id']].drop_duplicates()
-
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS dw.dim_reviewer (
-                reviewer_id VARCHAR(50) PRIMARY KEY
-                );
-                CREATE TABLE IF NOT EXISTS dw.fact_reviews (
-                reviewer_id VARCHAR(50) REFERENCES dw.dim_reviewer(reviewer_id),
-                score INT, time VARCHAR(50), summary TEXT, sentiment_score FLOAT
-                );
-            """))
-
-        # nạp dimension trước
-        with engine.begin() as conn:
-            conn.execute(text(f"TRUNCATE TABLE {SCHEMA_NAME}.fact_reviews CASCADE"))
-            conn.execute(text(f"TRUNCATE TABLE {SCHEMA_NAME}.dim_reviewer CASCADE"))
-        dim_reviewer.to_sql('dim_reviewer', engine, schema=SCHEMA_NAME, if_exists='append', index=False)
-
-        # nạp fact
-        df.to_sql('fact_reviews', engine, schema=SCHEMA_NAME, if_exists='append', index=False)
-        print(f"✅ Loaded {len(df)} rows into fact_reviews")
-    except Exception as e:
-        print(f"❌ Load error: {e}")
-
-    print("🎯 Reviews ETL completed.\n")
-
-if __name__ == "__main__":
-    main()
+import os
+import pandas as pd
+from db_connection import pooled_connection
+from bulk_loader import copy_dataframe, upsert_dataframe
+from job_args import build_parser
+from instrumentation import StageTimer, record, span
+from watermark import get_watermark, set_watermark, file_sha256
+from sentiment import score_sentiments
+from staging import StagingWriter, DEFAULT_STAGING_MODE, read_manifest, read_staged_part
+from key_map import KeyMap, drop_string_keyed
+from source_schema import STRING, NUMBER, read_options, memory_mb
+from marts import ensure_review_rollup, refresh_review_rollup
+from validation import Validator
+
+INPUT_FILE = "../source_data/Reviews.csv"
+SCHEMA_NAME = "dw"
+SOURCE_NAME = "reviews"
+
+# chỉ đọc 4 cột transform dùng (bỏ Text - phần lớn dung lượng file), ID / Summary dạng Arrow string
+READ_SCHEMA = {'UserId': STRING, 'Score': NUMBER, 'Time': NUMBER, 'Summary': STRING}
+READ_OPTIONS = read_options(READ_SCHEMA)
+
+# UserId -> reviewer_id BIGINT ổn định qua các lần chạy (dw.etl_key_map)
+REVIEWER_KEYS = KeyMap('reviewer')
+
+# kiểm tra giữa transform và load (validation.py). Dòng thiếu UserId / Score / Summary đã bị bỏ trước
+# khi chấm sentiment (bước nặng nhất) -> ở đây chỉ còn kiểu, thang điểm và FK sang dim_reviewer
+FACT_REVIEWS_RULES = {
+    "types": {'score': "int", 'time': "int"},
+    "ranges": {'score': (1, 5)},
+    "references": {'reviewer_id': 'dim_reviewer'},
+}
+
+REVIEW_TABLES_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.dim_reviewer (
+    reviewer_id BIGINT PRIMARY KEY,
+    user_id VARCHAR(50)
+    );
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.fact_reviews (
+    reviewer_id BIGINT REFERENCES {SCHEMA_NAME}.dim_reviewer(reviewer_id),
+    score INT, time VARCHAR(50), summary TEXT, sentiment_score FLOAT, review_date DATE
+    );
+"""
+
+# time giữ dạng chuỗi epoch như cũ; review_date (ngày UTC của time) do ETL tính -> rollup theo ngày dùng
+# index này (đủ cột, không đọc heap) thay vì cast từng dòng
+REVIEW_INDEX_DDL = f"""
+    CREATE INDEX IF NOT EXISTS ix_fact_reviews_date ON {SCHEMA_NAME}.fact_reviews(review_date)
+    INCLUDE (score, sentiment_score);
+"""
+
+def add_review_date(cur):
+    # bảng tạo trước khi có review_date: thêm cột và điền từ time một lần
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = 'fact_reviews' AND column_name = 'review_date'
+    """, (SCHEMA_NAME,))
+    if cur.fetchone():
+        return
+    cur.execute(f"ALTER TABLE {SCHEMA_NAME}.fact_reviews ADD COLUMN review_date DATE")
+    cur.execute(f"""
+        UPDATE {SCHEMA_NAME}.fact_reviews
+        SET review_date = (to_timestamp(time::double precision) AT TIME ZONE 'UTC')::date
+        WHERE time IS NOT NULL
+    """)
+    print(f"🔧 Added review_date to fact_reviews ({cur.rowcount} rows backfilled)")
+
+def ensure_tables():
+    # bảng cũ dùng khoá chuỗi 'REV_...' -> tạo lại với BIGINT (phải chạy trước khi đọc watermark)
+    with pooled_connection() as conn:
+        drop_string_keyed(conn, SOURCE_NAME, 'dim_reviewer', 'reviewer_id', ['fact_reviews', 'dim_reviewer'])
+        with conn.cursor() as cur:
+            cur.execute(REVIEW_TABLES_DDL)
+            add_review_date(cur)
+            cur.execute(REVIEW_INDEX_DDL)
+        ensure_review_rollup(conn)
+        conn.commit()
+
+def transform_reviews(df, high_water=None, sentiment_workers=None):
+    df = df[['UserId', 'Score', 'Time', 'Summary']].drop_duplicates()
+    # Time là epoch theo ngày -> lấy lại cả ngày của watermark, dòng cũ của ngày đó bị xoá trước khi nạp
+    if high_water is not None:
+        df = df[df['Time'] >= int(high_water)].copy()
+    df.dropna(subset=['UserId', 'Score', 'Summary'], inplace=True)
+    df['reviewer_id'] = REVIEWER_KEYS(df['UserId'])   # 👈 UserId → reviewer_id (BIGINT)
+    # TextBlob là phần nặng nhất của transform -> stage con riêng trong báo cáo
+    with span("sentiment"):
+        df['sentiment_score'] = score_sentiments(df['Summary'], workers=sentiment_workers)
+    # Đổi tên cột sang lowercase cho khớp PostgreSQL
+    df = df.rename(columns={
+        'UserId': 'user_id',
+        'Score': 'score',
+        'Time': 'time',
+        'Summary': 'summary'
+    })
+    df['review_date'] = review_dates(df['time'])
+
+    # user_id chỉ để dựng dim_reviewer, không nạp vào fact
+    return df[['reviewer_id', 'user_id', 'score', 'time', 'summary', 'sentiment_score', 'review_date']]
+
+def review_dates(times):
+    # epoch giây -> ngày (datetime64 lúc 00:00, COPY ghi dạng 'YYYY-MM-DD'); time NaN -> NaT
+    return pd.to_datetime(pd.to_numeric(times, errors='coerce'), unit='s').dt.normalize()
+
+def touched_dates(df, high_water):
+    # ngày có dòng vừa nạp + ngày của watermark (dòng cũ của ngày đó vừa bị xoá); None = review không có time
+    dates = {None if pd.isna(d) else d.date() for d in df['review_date'].unique()}
+    if high_water is not None:
+        dates.add(review_dates(pd.Series([high_water])).iloc[0].date())
+    return dates
+
+def load_reviews(df, dim_reviewer, digest, incremental=False, high_water=None):
+    try:
+        with pooled_connection() as conn:
+            # nạp lại toàn bộ: TRUNCATE trong cùng transaction với lần nạp -> lỗi trước khi commit thì bảng
+            # vẫn còn dữ liệu cũ, không bị bỏ trống
+            if not incremental:
+                with conn.cursor() as cur:
+                    cur.execute(f"TRUNCATE TABLE {SCHEMA_NAME}.fact_reviews CASCADE")
+                    cur.execute(f"TRUNCATE TABLE {SCHEMA_NAME}.dim_reviewer CASCADE")
+
+            # nạp dimension trước
+            if incremental:
+                upsert_dataframe(dim_reviewer, 'dim_reviewer', ['reviewer_id'], schema=SCHEMA_NAME, conn=conn)
+                if high_water is not None:
+                    with conn.cursor() as cur:
+                        cur.execute(f"DELETE FROM {SCHEMA_NAME}.fact_reviews WHERE time = %s", (str(high_water),))
+            else:
+                copy_dataframe(dim_reviewer, 'dim_reviewer', schema=SCHEMA_NAME, conn=conn)
+
+            # nạp fact, rollup theo ngày cập nhật cùng transaction
+            copy_dataframe(df, 'fact_reviews', schema=SCHEMA_NAME, conn=conn)
+            refresh_review_rollup(conn, touched_dates(df, high_water) if incremental else None)
+
+            max_time = df['time'].max() if len(df) else high_water
+            set_watermark(conn, SOURCE_NAME, max_time, digest, len(df))
+            conn.commit()
+        print(f"✅ Loaded {len(df)} rows into fact_reviews")
+    except Exception as e:
+        print(f"❌ Load error: {e}")
+        raise
+
+def main(incremental=False, sentiment_workers=None, staging=DEFAULT_STAGING_MODE, from_staging=False):
+    if from_staging:
+        return main_from_staging()
+
+    print("🚀 Starting ETL: Reviews Fact")
+    timer = StageTimer("reviews")
+
+    # Extract
+    with timer.stage("extract"):
+        try:
+            ensure_tables()
+            digest = file_sha256(INPUT_FILE)
+            high_water = None
+            if incremental:
+                high_water, last_hash = get_watermark(SOURCE_NAME)
+                if digest == last_hash:
+                    print(f"⏭️  {INPUT_FILE} unchanged since last load, skipping")
+                    return timer.summary()
+                print(f"🔖 Watermark: Time >= {high_water}")
+
+            df = pd.read_csv(INPUT_FILE, encoding='latin1', **READ_OPTIONS)
+            record(rows_out=len(df), bytes_read=os.path.getsize(INPUT_FILE))
+            print(f"[EXTRACT] Loaded {len(df)} rows ({memory_mb(df):.1f} MB) from {INPUT_FILE}")
+        except FileNotFoundError:
+            print(f"❌ File not found: {INPUT_FILE}")
+            raise
+        except Exception as e:
+            print(f"❌ Error reading CSV: {e}")
+            raise
+
+    # Transform
+    with timer.stage("transform"):
+        record(rows_in=len(df))
+        df = transform_reviews(df, high_water, sentiment_workers=sentiment_workers)
+        record(rows_out=len(df))
+
+        # -> build dimension (reviewer_id + UserId gốc)
+        dim_reviewer = df[['reviewer_id', 'user_id']].drop_duplicates(subset=['reviewer_id'])
+        df = df.drop(columns=['user_id'])
+
+    # dòng lỗi -> quarantine, dừng luôn nếu quá nhiều (trước khi chạm tới database)
+    with timer.stage("validate"):
+        validator = Validator(SOURCE_NAME)
+        df = validator.check('fact_reviews', df, FACT_REVIEWS_RULES, dims={'dim_reviewer': dim_reviewer})
+        validator.finish()
+
+    # reviews trải nhiều năm -> partition theo tháng cho đỡ vụn file
+    with timer.stage("staging"):
+        stager = StagingWriter(SOURCE_NAME, staging)
+        stager.write("dim_reviewer", dim_reviewer)
+        stager.write("fact_reviews", df, partition_by="time", freq="month")
+        stager.finish(file_hash=digest, incremental=incremental, high_water=high_water)
+
+    with timer.stage("load"):
+        record(rows_in=len(df))
+        load_reviews(df, dim_reviewer, digest, incremental, high_water)
+
+    print("🎯 Reviews ETL completed.\n")
+    return timer.summary()
+
+def main_from_staging():
+    print("🚀 Starting ETL: Reviews Fact (from staging)")
+    timer = StageTimer("reviews")
+
+    with timer.stage("extract"):
+        manifest = read_manifest(SOURCE_NAME)
+        dim_reviewer = read_staged_part(SOURCE_NAME, "dim_reviewer", 0)
+        df = read_staged_part(SOURCE_NAME, "fact_reviews", 0)
+        print(f"[EXTRACT] Loaded {len(df)} staged rows written at {manifest['written_at']}")
+
+    with timer.stage("load"):
+        record(rows_in=len(df))
+        ensure_tables()
+        load_reviews(df, dim_reviewer, manifest["file_hash"], manifest["incremental"], manifest["high_water"])
+
+    print("🎯 Reviews ETL completed.\n")
+    return timer.summary()
+
+if __name__ == "__main__":
+    parser = build_parser("ETL: Amazon reviews -> dim_reviewer, fact_reviews")
+    parser.add_argument("--sentiment-workers", type=int, default=None,
+                        help="số process chấm sentiment (mặc định: số CPU)")
+    main(**vars(parser.parse_args()))
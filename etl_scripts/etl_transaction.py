@@ -1,198 +1,732 @@
 import pandas as pd
-import os
 from sqlalchemy import text
-from db_connection import get_engine
+from db_connection import get_engine, pooled_connection
+from bulk_loader import copy_dataframe, upsert_dataframe
+from job_args import parse_job_args
+from instrumentation import StageTimer, record
+from watermark import get_watermark, set_watermark, latest
+from staging import StagingWriter, DEFAULT_STAGING_MODE, read_manifest, iter_staged_parts
+from time_dim import TimestampParser, time_keys, ensure_calendar, ensure_dim_time
+from marts import refresh_order_marts
+from key_map import KeyMap, drop_string_keyed
+from partitions import PartitionSwap, ensure_partitioned, ensure_partitions, month_dates
+from source_schema import CATEGORY, STRING, NUMBER, read_options, per_category, as_text, memory_mb
+from source_files import (DEFAULT_CSV_ENGINE, DEFAULT_READ_WORKERS, resolve_inputs, fingerprint, combined_digest,
+                          describe, iter_source_chunks, read_source, pending_files, record_ingested)
+from change_capture import stored_hashes, apply_scd2
+from validation import Validator
+from checkpoint import Checkpoint, run_key, clear_checkpoints
+from pipeline import Pipeline, DEFAULT_PIPELINE_DEPTH, DEFAULT_TRANSFORM_WORKERS
 
 # ==========================================================
 # CONFIG
 # ==========================================================
 SCHEMA_NAME = "dw"
 INPUT_FILE = "../source_data/order_history_kaggle_data.csv"
-STAGING_DIR = "../staging_data"
-engine = get_engine()
+SOURCE_NAME = "orders"
+
+# Cột đọc từ CSV: ID dạng string để khoá không đổi kiểu giữa các chunk (vd. '00012' -> 12),
+# cột ít giá trị dạng category; Rating / Review / Customer complaint tag không dùng -> không đọc
+READ_SCHEMA = {
+    'Restaurant ID': STRING, 'Restaurant name': CATEGORY, 'Subzone': CATEGORY, 'City': CATEGORY,
+    'Order ID': STRING, 'Order Placed At': STRING, 'Order Status': CATEGORY, 'Delivery': CATEGORY,
+    'Distance': CATEGORY, 'Items in order': STRING, 'Instructions': CATEGORY, 'Discount construct': CATEGORY,
+    'Bill subtotal': NUMBER, 'Packaging charges': NUMBER, 'Restaurant discount (Promo)': NUMBER,
+    'Restaurant discount (Flat offs, Freebies & others)': NUMBER, 'Gold discount': NUMBER,
+    'Brand pack discount': NUMBER, 'Total': NUMBER, 'Cancellation / Rejection reason': CATEGORY,
+    'Restaurant compensation (Cancellation)': NUMBER, 'Restaurant penalty (Rejection)': NUMBER,
+    'KPT duration (minutes)': NUMBER, 'Rider wait time (minutes)': NUMBER, 'Order Ready Marked': CATEGORY,
+    'Customer ID': STRING,
+}
+READ_OPTIONS = read_options(READ_SCHEMA)
+
+# cùng một phút xuất hiện ở rất nhiều đơn -> parse mỗi chuỗi một lần
+ORDER_TIME_PARSER = TimestampParser('%I:%M %p, %B %d %Y')
+
+# dim_restaurant: một dòng hiện tại mỗi nhà hàng (FK của fact_orders, join của mart);
+# dim_restaurant_history: mọi phiên bản (SCD2), phiên bản mới khi hash của các cột này đổi
+RESTAURANT_ATTRIBUTES = ['restaurant_name', 'subzone', 'city']
+
+# Customer ID gốc -> customer_id BIGINT ổn định qua các lần chạy (dw.etl_key_map)
+CUSTOMER_ORDER_KEYS = KeyMap('customer_orders')
+
+# fact_orders phân vùng RANGE theo tháng của order_placed_at, partition tạo khi ETL gặp tháng mới
+# -> khoá chính phải chứa cột phân vùng
+FACT_ORDERS_KEY = ['order_id', 'order_placed_at']
+
+FACT_ORDERS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.fact_orders (
+        order_id VARCHAR(50) NOT NULL,
+        restaurant_id VARCHAR(50) REFERENCES {SCHEMA_NAME}.dim_restaurant(restaurant_id),
+        customer_id BIGINT REFERENCES {SCHEMA_NAME}.dim_customer_orders(customer_id),
+        order_placed_at TIMESTAMP NOT NULL,
+        order_status VARCHAR(50), delivery_type VARCHAR(50),
+        distance TEXT, items_in_order TEXT, instructions TEXT, discount_construct TEXT,
+        bill_subtotal DECIMAL(10,2), packaging_charges DECIMAL(10,2),
+        restaurant_discount_promo DECIMAL(10,2), restaurant_discount_flat DECIMAL(10,2),
+        gold_discount DECIMAL(10,2), brand_pack_discount DECIMAL(10,2), total DECIMAL(10,2),
+        cancellation_reason TEXT, restaurant_compensation DECIMAL(10,2),
+        restaurant_penalty DECIMAL(10,2), kpt_duration DECIMAL(10,2),
+        rider_wait_time DECIMAL(10,2), order_ready_marked VARCHAR(50),
+        time_key BIGINT REFERENCES {SCHEMA_NAME}.dim_time(time_key),
+        distance_km NUMERIC, items_count INT,
+        PRIMARY KEY (order_id, order_placed_at)
+    ) PARTITION BY RANGE (order_placed_at);
+    CREATE INDEX IF NOT EXISTS ix_orders_time ON {SCHEMA_NAME}.fact_orders(order_placed_at);
+    CREATE INDEX IF NOT EXISTS ix_orders_restaurant ON {SCHEMA_NAME}.fact_orders(restaurant_id);
+    CREATE INDEX IF NOT EXISTS ix_orders_customer ON {SCHEMA_NAME}.fact_orders(customer_id);
+    CREATE INDEX IF NOT EXISTS ix_fact_orders_time_key ON {SCHEMA_NAME}.fact_orders(time_key);
+"""
+
+# cột tiền / phút của fact_orders: ép kiểu ở bước validate
+ORDER_NUMBER_COLUMNS = [
+    'bill_subtotal', 'packaging_charges', 'restaurant_discount_promo', 'restaurant_discount_flat',
+    'gold_discount', 'brand_pack_discount', 'total', 'restaurant_compensation',
+    'restaurant_penalty', 'kpt_duration', 'rider_wait_time'
+]
+
+# kiểm tra giữa transform và load (validation.py): khoá thiếu, số sai kiểu, order_id trùng, FK không có
+# trong dim của cùng batch -> quarantine kèm lý do, chỉ dòng sạch được gửi tới PostgreSQL
+DIM_RESTAURANT_RULES = {"required": ['restaurant_id'], "unique": ['restaurant_id']}
+FACT_ORDERS_RULES = {
+    "types": {c: "number" for c in ORDER_NUMBER_COLUMNS},
+    "required": ['order_id', 'restaurant_id', 'customer_id', 'order_placed_at'],
+    "ranges": {'bill_subtotal': (0, None), 'total': (0, None), 'kpt_duration': (0, None),
+               'rider_wait_time': (0, None)},
+    "unique": ['order_id'],
+    "references": {'restaurant_id': 'dim_restaurant', 'customer_id': 'dim_customer_orders'},
+}
+
+# '3km', '<1km' -> '3', '1' (bỏ mọi ký tự không phải số/dấu chấm như view cũ)
+DISTANCE_NUMBER = r'\d+(?:\.\d*)?|\.\d+'
+# '3 x Dish 8, 2 x Dish 23' -> (3, 'Dish 8'), (2, 'Dish 23'); tên món có thể chứa dấu phẩy
+ITEM_PATTERN = r'(?:^|, )(?P<quantity>\d+) x (?P<item_name>.*?)(?=, \d+ x |$)'
+
+# ==========================================================
+# TRANSFORM STEPS
+# ==========================================================
+
+def transform_restaurants(df):
+    dim_restaurant = df[['Restaurant ID', 'Restaurant name', 'Subzone', 'City']].copy()
+    dim_restaurant.columns = ['restaurant_id', 'restaurant_name', 'subzone', 'city']
+
+    # Xử lý trùng restaurant_id (strip trên từng category, không phải từng dòng)
+    for c in ['restaurant_name', 'subzone', 'city']:
+        dim_restaurant[c] = per_category(dim_restaurant[c], lambda s: s.astype(str).str.strip())
+
+    return dedupe_restaurants(dim_restaurant)
+
+
+def dedupe_restaurants(dim_restaurant):
+    # restaurant_id trùng: giữ dòng có tên nhỏ nhất
+    return (
+        dim_restaurant
+            .sort_values(['restaurant_id', 'restaurant_name'], na_position='last')
+            .drop_duplicates(subset=['restaurant_id'], keep='first')
+            .reset_index(drop=True)
+    )
+
+
+def merge_restaurants(run_restaurants, dim_restaurant):
+    # gộp dim_restaurant của từng chunk thành bản của cả lần chạy, giống sort + drop_duplicates khi đọc cả file
+    if run_restaurants is None:
+        return dim_restaurant
+    return dedupe_restaurants(pd.concat([run_restaurants, dim_restaurant], ignore_index=True))
+
+
+def transform_customers(df):
+    # thay Customer ID gốc bằng surrogate key ngay trong df -> fact_orders dùng luôn
+    source_ids = df['Customer ID']
+    df['Customer ID'] = CUSTOMER_ORDER_KEYS(source_ids)
+    dim_customer_orders = pd.DataFrame({'customer_id': df['Customer ID'], 'source_customer_id': source_ids})
+    return dim_customer_orders.dropna(subset=['customer_id']).drop_duplicates(subset=['customer_id'])
+
+
+def parse_order_times(df):
+    if not pd.api.types.is_datetime64_any_dtype(df['Order Placed At']):
+        df['Order Placed At'] = ORDER_TIME_PARSER(df['Order Placed At'])
+
+
+def parse_distance_km(distance):
+    # giữ dạng chuỗi số để NUMERIC nhận đúng giá trị/scale; chuỗi không phải số -> NULL
+    digits = distance.str.replace(r'[^0-9.]', '', regex=True)
+    return digits.where(digits.str.fullmatch(DISTANCE_NUMBER), None)
+
+
+def transform_fact_orders(df):
+    parse_order_times(df)
+    fact_orders = df.rename(columns={
+        'Order ID': 'order_id',
+        'Restaurant ID': 'restaurant_id',
+        'Customer ID': 'customer_id',
+        'Order Placed At': 'order_placed_at',
+        'Order Status': 'order_status',
+        'Delivery': 'delivery_type',
+        'Distance': 'distance',
+        'Items in order': 'items_in_order',
+        'Instructions': 'instructions',
+        'Discount construct': 'discount_construct',
+        'Bill subtotal': 'bill_subtotal',
+        'Packaging charges': 'packaging_charges',
+        'Restaurant discount (Promo)': 'restaurant_discount_promo',
+        'Restaurant discount (Flat offs, Freebies & others)': 'restaurant_discount_flat',
+        'Gold discount': 'gold_discount',
+        'Brand pack discount': 'brand_pack_discount',
+        'Total': 'total',
+        'Cancellation / Rejection reason': 'cancellation_reason',
+        'Restaurant compensation (Cancellation)': 'restaurant_compensation',
+        'Restaurant penalty (Rejection)': 'restaurant_penalty',
+        'KPT duration (minutes)': 'kpt_duration',
+        'Rider wait time (minutes)': 'rider_wait_time',
+        'Order Ready Marked': 'order_ready_marked'
+    })[[
+        'order_id', 'restaurant_id', 'customer_id', 'order_placed_at', 'order_status',
+        'delivery_type', 'distance', 'items_in_order', 'instructions', 'discount_construct',
+        'bill_subtotal', 'packaging_charges', 'restaurant_discount_promo',
+        'restaurant_discount_flat', 'gold_discount', 'brand_pack_discount', 'total',
+        'cancellation_reason', 'restaurant_compensation', 'restaurant_penalty',
+        'kpt_duration', 'rider_wait_time', 'order_ready_marked'
+    ]]
+
+    # Giữ distance và items_in_order là text
+    fact_orders['distance'] = as_text(fact_orders['distance'])
+    fact_orders['items_in_order'] = as_text(fact_orders['items_in_order'])
+
+    # parse một lần lúc ETL thay vì regexp trong view: distance_km (NUMERIC), items_count = số dòng món
+    fact_orders['distance_km'] = per_category(fact_orders['distance'], parse_distance_km)
+    fact_orders['items_count'] = fact_orders['items_in_order'].str.count(' x ')
+
+    # dòng thiếu khoá chính / ngoại bị loại ở bước validate (FACT_ORDERS_RULES)
+    fact_orders['time_key'] = time_keys(fact_orders['order_placed_at'])
+    return fact_orders
+
+
+def validate_orders(validator, dim_restaurant, dim_customer_orders, fact_orders):
+    # dim trước, fact kiểm FK với dim đã sạch của cùng batch -> (dim_restaurant, fact_orders) sạch
+    dim_restaurant = validator.check('dim_restaurant', dim_restaurant, DIM_RESTAURANT_RULES)
+    fact_orders = validator.check('fact_orders', fact_orders, FACT_ORDERS_RULES,
+                                  dims={'dim_restaurant': dim_restaurant, 'dim_customer_orders': dim_customer_orders})
+    return dim_restaurant, fact_orders
+
+
+def transform_order_items(fact_orders):
+    # bridge: mỗi món trong đơn một dòng (order_id, line_no, item_name, quantity)
+    orders = fact_orders.drop_duplicates(subset=['order_id'], keep='last')
+    items = orders['items_in_order'].str.extractall(ITEM_PATTERN).reset_index(level='match')
+    items = items.join(orders[['order_id']])
+    items['line_no'] = items['match'] + 1
+    items['quantity'] = items['quantity'].astype(int)
+    return items[['order_id', 'line_no', 'item_name', 'quantity']].reset_index(drop=True)
+
+
+# ==========================================================
+# LOAD HELPERS
+# ==========================================================
+
+def ensure_tables(engine):
+    # bảng cũ dùng khoá chuỗi 'ORD_...' -> tạo lại với BIGINT (phải chạy trước khi đọc watermark)
+    with pooled_connection() as conn:
+        drop_string_keyed(conn, SOURCE_NAME, 'dim_customer_orders', 'customer_id',
+                          ['fact_order_items', 'fact_orders', 'dim_customer_orders'])
+        conn.commit()
+
+    # đảm bảo bảng tồn tại
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS dw.dim_restaurant (
+                restaurant_id VARCHAR(50) PRIMARY KEY,
+                restaurant_name VARCHAR(200),
+                subzone VARCHAR(100),
+                city VARCHAR(100),
+                row_hash BIGINT
+            );
+            ALTER TABLE dw.dim_restaurant ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+            -- SCD2: valid_to NULL = phiên bản hiện tại (đúng bằng dòng trong dim_restaurant)
+            CREATE TABLE IF NOT EXISTS dw.dim_restaurant_history (
+                restaurant_id VARCHAR(100) NOT NULL,
+                restaurant_name VARCHAR(200),
+                subzone VARCHAR(100),
+                city VARCHAR(100),
+                row_hash BIGINT NOT NULL,
+                valid_from TIMESTAMP NOT NULL DEFAULT now(),
+                valid_to TIMESTAMP,
+                PRIMARY KEY (restaurant_id, valid_from)
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_restaurant_history_current
+                ON dw.dim_restaurant_history(restaurant_id) WHERE valid_to IS NULL;
+            CREATE TABLE IF NOT EXISTS dw.dim_customer_orders (
+                customer_id BIGINT PRIMARY KEY,
+                source_customer_id VARCHAR(100)
+            );
+            -- fact_orders phân vùng: không có khoá duy nhất trên riêng order_id để làm FK,
+            -- món của đơn được xoá theo order_id mỗi khi đơn được nạp lại
+            CREATE TABLE IF NOT EXISTS dw.fact_order_items (
+                order_id VARCHAR(50) NOT NULL,
+                line_no INT,
+                item_name TEXT,
+                quantity INT,
+                PRIMARY KEY (order_id, line_no)
+            );
+        """))
+    # dim_time (lịch theo phút) phải có trước vì fact_orders có FK time_key;
+    # fact_orders dạng bảng thường từ trước -> chuyển sang phân vùng theo tháng
+    with pooled_connection() as conn:
+        ensure_dim_time(conn)
+        converted = ensure_partitioned(conn, 'fact_orders', FACT_ORDERS_DDL)
+        conn.commit()
+    # materialized view của dw_mart bị xoá theo bảng cũ -> dựng lại ngay, không đợi lần nạp có dữ liệu mới
+    if converted:
+        refresh_order_marts()
+
+
+def load_chunk(conn, frames, incremental=False, swap=None, truncate=False):
+    fact_orders = frames['fact_orders']
+    # dim_time + partition tháng mới: transaction ngắn riêng, trước mọi thao tác ghi của batch trên conn
+    ensure_calendar(fact_orders['order_placed_at'])
+    if swap is None:
+        ensure_partitions('fact_orders', fact_orders['order_placed_at'])
+    # nạp lại toàn bộ: TRUNCATE commit cùng batch đầu tiên, sau khi partition của batch đã attach
+    if truncate:
+        truncate_tables(conn)
+
+    # chỉ thêm nhà hàng chưa có để FK của fact_orders thoả; nội dung + lịch sử ghi một lần cuối lần chạy
+    # (load_restaurants), khi đã biết bản của cả file.
+    # incremental (một transaction tới cuối lần chạy): dim upsert commit riêng từng chunk (chạy lại không nhân đôi),
+    # transaction nạp chỉ giữ khoá đọc FK trên dim -> partition tháng mới của chunk sau vẫn attach được
+    dim_conn = None if incremental else conn
+    upsert_dataframe(frames['dim_restaurant'], 'dim_restaurant', ['restaurant_id'], schema=SCHEMA_NAME, conn=dim_conn)
+    upsert_dataframe(frames['dim_customer_orders'], 'dim_customer_orders', ['customer_id'], schema=SCHEMA_NAME,
+                     conn=dim_conn)
+    if swap is not None:
+        # thay trọn tháng: fact vào bảng staging của tháng, swap sau khi nạp hết các chunk
+        swap.write(fact_orders)
+    else:
+        if incremental:
+            update_cols = [c for c in fact_orders.columns if c not in FACT_ORDERS_KEY]
+            upsert_dataframe(fact_orders.drop_duplicates(subset=['order_id'], keep='last'), 'fact_orders',
+                             FACT_ORDERS_KEY, schema=SCHEMA_NAME, conn=conn, update_cols=update_cols)
+        else:
+            copy_dataframe(fact_orders, 'fact_orders', schema=SCHEMA_NAME, conn=conn)
+    load_order_items(conn, frames['fact_order_items'], fact_orders, incremental or swap is not None)
+
+
+def load_restaurants(conn, dim_restaurant, stored, delete_missing=False):
+    # so với row_hash đọc trước lần chạy (stored): nhà hàng mới / đổi -> phiên bản mới, còn lại không ghi.
+    # delete_missing (nạp lại toàn bộ): nhà hàng không còn trong file bị xoá, phiên bản cuối được đóng lại
+    if dim_restaurant is not None:
+        apply_scd2(conn, dim_restaurant, 'dim_restaurant', 'dim_restaurant_history', 'restaurant_id',
+                   RESTAURANT_ATTRIBUTES, stored, delete_missing=delete_missing, schema=SCHEMA_NAME)
+
+
+def load_order_items(conn, order_items, fact_orders, incremental=False):
+    # đơn được upsert lại: thay toàn bộ danh sách món của đơn đó
+    if incremental:
+        with conn.cursor() as cur:
+            cur.execute(f"DELETE FROM {SCHEMA_NAME}.fact_order_items WHERE order_id = ANY(%s)",
+                        (fact_orders['order_id'].unique().tolist(),))
+    copy_dataframe(order_items, 'fact_order_items', schema=SCHEMA_NAME, conn=conn)
+
+
+def drop_swapped_out_items(cur, old_partition, stage):
+    # đơn có trong tháng cũ nhưng không còn trong bản nạp lại -> xoá món của đơn đó
+    if old_partition is not None:
+        cur.execute(f"""
+            DELETE FROM {SCHEMA_NAME}.fact_order_items i USING {old_partition} o
+            WHERE i.order_id = o.order_id
+              AND NOT EXISTS (SELECT 1 FROM {stage} s WHERE s.order_id = o.order_id)
+        """)
+
+
+def prepare_chunk(timer, validator, chunk, since=None):
+    # transform + validate một chunk -> (số dòng sau lọc watermark, frames của chunk).
+    # Không đụng trạng thái của cả lần chạy -> chạy được trong thread transform của Pipeline
+    with timer.stage("transform"):
+        record(rows_in=len(chunk))
+        parse_order_times(chunk)
+        if since is not None:
+            # NaT không so được với watermark -> để bước validate loại (order_placed_at: missing) như khi nạp lại toàn bộ
+            placed = chunk['Order Placed At']
+            chunk = chunk[placed.isna() | (placed >= since)].copy()
+
+        dim_restaurant = transform_restaurants(chunk)
+        dim_customer_orders = transform_customers(chunk)
+        fact_orders = transform_fact_orders(chunk)
+        record(rows_out=len(fact_orders))
+
+    with timer.stage("validate"):
+        dim_restaurant, fact_orders = validate_orders(validator, dim_restaurant, dim_customer_orders, fact_orders)
+
+    with timer.stage("transform"):
+        order_items = transform_order_items(fact_orders)
+    return len(chunk), {'dim_restaurant': dim_restaurant, 'dim_customer_orders': dim_customer_orders,
+                        'fact_orders': fact_orders, 'fact_order_items': order_items}
+
+
+def stage_frames(stager, dim_restaurant, dim_customer_orders, fact_orders, order_items):
+    stager.write('dim_restaurant', dim_restaurant)
+    stager.write('dim_customer_orders', dim_customer_orders)
+    stager.write('fact_orders', fact_orders, partition_by='order_placed_at')
+    stager.write('fact_order_items', order_items)
+
+
+def order_dates(fact_orders):
+    # các order_date có trong chunk -> phạm vi làm mới mart khi nạp incremental
+    return set(pd.DatetimeIndex(fact_orders['order_placed_at'].dropna().dt.normalize().unique()).date)
+
+
+def truncate_tables(conn):
+    # TRUNCATE sạch trước khi nạp, trong transaction của lần nạp (hoặc của batch đầu tiên):
+    # lỗi trước khi commit -> bảng vẫn còn dữ liệu cũ, không bị bỏ trống
+    with conn.cursor() as cur:
+        # dim_time là lịch dùng chung với fact_app_events -> không truncate;
+        # dim_restaurant giữ lại: so row_hash, chỉ ghi nhà hàng đổi (load_restaurants)
+        for table in ['fact_order_items','fact_orders','dim_customer_orders']:
+            cur.execute(f"TRUNCATE TABLE {SCHEMA_NAME}.{table} CASCADE")
+            print(f"🧹 Truncated {table}")
+
 
 # ==========================================================
 # ETL: ORDERS (TRANSACTION SOURCE)
 # ==========================================================
 
-def main():
+def main(chunk_rows=None, incremental=False, staging=DEFAULT_STAGING_MODE, from_staging=False, swap_partitions=False,
+         input_path=None, read_workers=DEFAULT_READ_WORKERS, csv_engine=DEFAULT_CSV_ENGINE,
+         pipeline_depth=DEFAULT_PIPELINE_DEPTH, transform_workers=DEFAULT_TRANSFORM_WORKERS):
+    if incremental and swap_partitions:
+        raise ValueError("--swap-partitions replaces whole months and cannot be combined with --incremental")
+    if from_staging:
+        return main_from_staging()
+    if chunk_rows or incremental or swap_partitions or pipeline_depth:
+        return main_streaming(chunk_rows, incremental=incremental, staging=staging, swap_partitions=swap_partitions,
+                              input_path=input_path, read_workers=read_workers, csv_engine=csv_engine,
+                              pipeline_depth=pipeline_depth, transform_workers=transform_workers)
+
     print("🚀 Starting ETL: Transaction Source (Orders)")
+    timer = StageTimer("orders")
 
     # 1️⃣ EXTRACT
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ File not found: {INPUT_FILE}")
-        return
+    with timer.stage("extract"):
+        try:
+            paths = resolve_inputs(input_path or INPUT_FILE)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            raise
 
-    try:
-        df = pd.read_csv(INPUT_FILE)
-        print(f"[EXTRACT] Loaded {len(df)} rows from {INPUT_FILE}")
-    except Exception as e:
-        print(f"❌ Error reading CSV: {e}")
-        return
+        try:
+            df = read_source(paths, READ_OPTIONS, engine=csv_engine, workers=read_workers)
+            record(rows_out=len(df))
+            print(f"[EXTRACT] Loaded {len(df)} rows ({memory_mb(df):.1f} MB) from {describe(paths)}")
+        except Exception as e:
+            print(f"❌ Error reading CSV: {e}")
+            raise
 
     # 2️⃣ TRANSFORM
-    try:
-        print("\n[TRANSFORM] Cleaning and normalizing data...")
-
-        # --- Dimension: Restaurant ---
-        dim_restaurant = df[['Restaurant ID', 'Restaurant name', 'Subzone', 'City']].copy()
-        dim_restaurant.columns = ['restaurant_id', 'restaurant_name', 'subzone', 'city']
-
-        # Xử lý trùng restaurant_id
-        for c in ['restaurant_name', 'subzone', 'city']:
-            dim_restaurant[c] = dim_restaurant[c].astype(str).str.strip()
-
-        dim_restaurant = (
-            dim_restaurant
-                .sort_values(['restaurant_id', 'restaurant_name'], na_position='last')
-                .drop_duplicates(subset=['restaurant_id'], keep='first')
-                .reset_index(drop=True)
-        )
-
-        # --- Dimension: Customer Orders ---
-        valid_mask = df["Customer ID"].notna()
-        df.loc[valid_mask, "Customer ID"] = "ORD_" + df.loc[valid_mask, "Customer ID"].astype(str)
-        dim_customer_orders = df[['Customer ID']].drop_duplicates()
-        dim_customer_orders.columns = ['customer_id']
-
-        # --- Dimension: Time ---
-        df['Order Placed At'] = pd.to_datetime(df['Order Placed At'], format='%I:%M %p, %B %d %Y', errors='coerce')
-        dim_time = df[['Order Placed At']].drop_duplicates().rename(columns={'Order Placed At': 'order_placed_at'})
-        dim_time['date'] = dim_time['order_placed_at'].dt.date
-        dim_time['time'] = dim_time['order_placed_at'].dt.time
-        dim_time['day'] = dim_time['order_placed_at'].dt.day
-        dim_time['month'] = dim_time['order_placed_at'].dt.month
-        dim_time['year'] = dim_time['order_placed_at'].dt.year
-        dim_time['weekday'] = dim_time['order_placed_at'].dt.day_name()
-        dim_time = dim_time.reset_index(drop=True)
-
-        # --- Fact: Orders ---
-        fact_orders = df.rename(columns={
-            'Order ID': 'order_id',
-            'Restaurant ID': 'restaurant_id',
-            'Customer ID': 'customer_id',
-            'Order Placed At': 'order_placed_at',
-            'Order Status': 'order_status',
-            'Delivery': 'delivery_type',
-            'Distance': 'distance',
-            'Items in order': 'items_in_order',
-            'Instructions': 'instructions',
-            'Discount construct': 'discount_construct',
-            'Bill subtotal': 'bill_subtotal',
-            'Packaging charges': 'packaging_charges',
-            'Restaurant discount (Promo)': 'restaurant_discount_promo',
-            'Restaurant discount (Flat offs, Freebies & others)': 'restaurant_discount_flat',
-            'Gold discount': 'gold_discount',
-            'Brand pack discount': 'brand_pack_discount',
-            'Total': 'total',
-            'Cancellation / Rejection reason': 'cancellation_reason',
-            'Restaurant compensation (Cancellation)': 'restaurant_compensation',
-            'Restaurant penalty (Rejection)': 'restaurant_penalty',
-            'KPT duration (minutes)': 'kpt_duration',
-            'Rider wait time (minutes)': 'rider_wait_time',
-            'Order Ready Marked': 'order_ready_marked'
-        })[[
-            'order_id', 'restaurant_id', 'customer_id', 'order_placed_at', 'order_status',
-            'delivery_type', 'distance', 'items_in_order', 'instructions', 'discount_construct',
-            'bill_subtotal', 'packaging_charges', 'restaurant_discount_promo',
-            'restaurant_discount_flat', 'gold_discount', 'brand_pack_discount', 'total',
-            'cancellation_reason', 'restaurant_compensation', 'restaurant_penalty',
-            'kpt_duration', 'rider_wait_time', 'order_ready_marked'
-        ]]
-
-        print(f"✅ Transformed: {len(fact_orders)} fact rows, {len(dim_restaurant)} restaurants, {len(dim_customer_orders)} customers")
-
-    except Exception as e:
-        print(f"❌ Transform error: {e}")
-        return
+    with timer.stage("transform"):
+        try:
+            print("\n[TRANSFORM] Cleaning and normalizing data...")
 
-    # 3️⃣ LOAD
-    # ép numeric an toàn cho các cột DECIMAL/INT trong fact_orders 
-    num_cols = [
-        'bill_subtotal','packaging_charges','restaurant_discount_promo','restaurant_discount_flat',
-        'gold_discount','brand_pack_discount','total','restaurant_compensation',
-        'restaurant_penalty','kpt_duration','rider_wait_time'
-    ]
-    for c in num_cols:
-        fact_orders[c] = pd.to_numeric(fact_orders[c], errors='coerce')
+            # --- Dimension: Restaurant ---
+            dim_restaurant = transform_restaurants(df)
 
-    # Giữ distance và items_in_order là text
-    fact_orders['distance'] = fact_orders['distance'].astype(str)
-    fact_orders['items_in_order'] = fact_orders['items_in_order'].astype(str)
+            # --- Dimension: Customer Orders ---
+            dim_customer_orders = transform_customers(df)
+
+            # --- Fact: Orders ---
+            fact_orders = transform_fact_orders(df)
+            record(rows_in=len(df), rows_out=len(fact_orders))
 
-    # loại dòng không có khóa chính/ngoại cần thiết
-    fact_orders.dropna(subset=['order_id','restaurant_id','customer_id','order_placed_at'], inplace=True)
+            print(f"✅ Transformed: {len(fact_orders)} fact rows, {len(dim_restaurant)} restaurants, {len(dim_customer_orders)} customers")
+
+        except Exception as e:
+            print(f"❌ Transform error: {e}")
+            raise
+
+    # dòng lỗi -> quarantine, dừng luôn nếu quá nhiều (trước khi chạm tới database)
+    with timer.stage("validate"):
+        validator = Validator(SOURCE_NAME)
+        dim_restaurant, fact_orders = validate_orders(validator, dim_restaurant, dim_customer_orders, fact_orders)
+        validator.finish()
+
+    # bridge món tách từ các đơn đã sạch
+    with timer.stage("transform"):
+        order_items = transform_order_items(fact_orders)
 
     # Export staging
-    os.makedirs(STAGING_DIR, exist_ok=True)
-    dim_restaurant.to_csv(f"{STAGING_DIR}/dim_restaurant_staging.csv", index=False)
-    dim_customer_orders.to_csv(f"{STAGING_DIR}/dim_customer_orders_staging.csv", index=False)
-    dim_time.to_csv(f"{STAGING_DIR}/dim_time_staging.csv", index=False)
-    fact_orders.to_csv(f"{STAGING_DIR}/fact_orders_staging.csv", index=False)
-    print(f"💾 Exported 4 staging files to {STAGING_DIR}/")
-    print("🟢 Review staging data before loading to DB.\n")
-
-    # --- LOAD ---
-    try:
-        print("\n[LOAD] Writing to PostgreSQL...")
-
-        # đảm bảo bảng tồn tại
-        with engine.begin() as conn:
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS dw.dim_restaurant (
-                    restaurant_id VARCHAR(50) PRIMARY KEY,
-                    restaurant_name VARCHAR(200),
-                    subzone VARCHAR(100),
-                    city VARCHAR(100)
-                );
-                CREATE TABLE IF NOT EXISTS dw.dim_customer_orders (
-                    customer_id VARCHAR(50) PRIMARY KEY
-                );
-                CREATE TABLE IF NOT EXISTS dw.dim_time (
-                    time_key SERIAL PRIMARY KEY,
-                    order_placed_at TIMESTAMP,
-                    date DATE, time TIME, day INT, month INT, year INT, weekday VARCHAR(20)
-                );
-                CREATE TABLE IF NOT EXISTS dw.fact_orders (
-                    order_id VARCHAR(50) PRIMARY KEY,
-                    restaurant_id VARCHAR(50) REFERENCES dw.dim_restaurant(restaurant_id),
-                    customer_id VARCHAR(50) REFERENCES dw.dim_customer_orders(customer_id),
-                    order_placed_at TIMESTAMP,
-                    order_status VARCHAR(50), delivery_type VARCHAR(50),
-                    distance TEXT, items_in_order TEXT, instructions TEXT, discount_construct TEXT,
-                    bill_subtotal DECIMAL(10,2), packaging_charges DECIMAL(10,2),
-                    restaurant_discount_promo DECIMAL(10,2), restaurant_discount_flat DECIMAL(10,2),
-                    gold_discount DECIMAL(10,2), brand_pack_discount DECIMAL(10,2), total DECIMAL(10,2),
-                    cancellation_reason TEXT, restaurant_compensation DECIMAL(10,2),
-                    restaurant_penalty DECIMAL(10,2), kpt_duration DECIMAL(10,2),
-                    rider_wait_time DECIMAL(10,2), order_ready_marked VARCHAR(50)
-                );
-            """))
-
-        # TRUNCATE sạch trước khi nạp
-        with engine.begin() as conn:
-            for table in ['fact_orders','dim_time','dim_customer_orders','dim_restaurant']:
-                conn.execute(text(f"TRUNCATE TABLE {SCHEMA_NAME}.{table} CASCADE"))
-                print(f"🧹 Truncated {table}")
-
-        # LOAD DIM
-        dim_restaurant.to_sql('dim_restaurant', engine, schema=SCHEMA_NAME, if_exists='append', index=False)
-        dim_customer_orders.to_sql('dim_customer_orders', engine, schema=SCHEMA_NAME, if_exists='append', index=False)
-        dim_time[['order_placed_at','date','time','day','month','year','weekday']].to_sql(
-            'dim_time', engine, schema=SCHEMA_NAME, if_exists='append', index=False
-        )
-
-        # LOAD FACT
-        fact_orders.to_sql('fact_orders', engine, schema=SCHEMA_NAME, if_exists='append', index=False)
-
-        print("\n✅ Loaded all tables successfully!")
-
-    except Exception as e:
-        print(f"❌ Load error: {e}")
-        return
+    with timer.stage("staging"):
+        files = fingerprint(paths, read_workers)
+        digest = combined_digest(files)
+        high_water = fact_orders['order_placed_at'].max()
+        stager = StagingWriter(SOURCE_NAME, staging)
+        stage_frames(stager, dim_restaurant, dim_customer_orders, fact_orders, order_items)
+        stager.finish(file_hash=digest, incremental=False, high_water=high_water, rows=len(fact_orders), files=files)
+
+    # 3️⃣ LOAD
+    with timer.stage("load"):
+        try:
+            print("\n[LOAD] Writing to PostgreSQL...")
+            record(rows_in=len(fact_orders))
+
+            engine = get_engine()
+            ensure_tables(engine)
+
+            # dim_time chỉ cần phủ đủ các ngày có đơn, partition cho các tháng có đơn
+            # (transaction ngắn riêng, trước transaction nạp)
+            ensure_calendar(fact_orders['order_placed_at'])
+            ensure_partitions('fact_orders', fact_orders['order_placed_at'])
+
+            # truncate + dim + fact + watermark: một transaction
+            with pooled_connection() as conn:
+                truncate_tables(conn)
+
+                # LOAD DIM
+                load_restaurants(conn, dim_restaurant, stored_hashes(conn, 'dim_restaurant', 'restaurant_id'),
+                                 delete_missing=True)
+                copy_dataframe(dim_customer_orders, 'dim_customer_orders', schema=SCHEMA_NAME, conn=conn)
+
+                # LOAD FACT
+                copy_dataframe(fact_orders, 'fact_orders', schema=SCHEMA_NAME, conn=conn)
+                copy_dataframe(order_items, 'fact_order_items', schema=SCHEMA_NAME, conn=conn)
+
+                record_ingested(conn, SOURCE_NAME, files, replace=True)
+                set_watermark(conn, SOURCE_NAME, high_water, digest, len(fact_orders))
+                clear_checkpoints(conn, SOURCE_NAME)
+                conn.commit()
+
+            print("\n✅ Loaded all tables successfully!")
+
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
+
+    with timer.stage("refresh"):
+        refresh_order_marts()
+
+    print("\n🎯 ETL for Orders completed successfully!\n")
+    return timer.summary()
+
+
+# ==========================================================
+# ETL: ORDERS - STREAMING THEO CHUNK
+# ==========================================================
+
+def main_streaming(chunk_rows=None, incremental=False, staging=DEFAULT_STAGING_MODE, swap_partitions=False,
+                   input_path=None, read_workers=DEFAULT_READ_WORKERS, csv_engine=DEFAULT_CSV_ENGINE,
+                   pipeline_depth=DEFAULT_PIPELINE_DEPTH, transform_workers=DEFAULT_TRANSFORM_WORKERS):
+    mode = "incremental" if incremental else "partition swap" if swap_partitions else "full reload"
+    size = f"{chunk_rows} rows/chunk" if chunk_rows else "whole file"
+    if pipeline_depth:
+        size += f", pipelined: depth {pipeline_depth}, {transform_workers} transform workers"
+    print(f"🚀 Starting ETL: Transaction Source (Orders, {mode}, {size})")
+    timer = StageTimer("orders")
+
+    with timer.stage("extract"):
+        try:
+            paths = resolve_inputs(input_path or INPUT_FILE)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            raise
+
+        try:
+            engine = get_engine()
+            ensure_tables(engine)
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
+
+        files = fingerprint(paths, read_workers)
+        digest = combined_digest(files)
+        high_water = None
+        if incremental or swap_partitions:
+            high_water, last_hash = get_watermark(SOURCE_NAME)
+        if incremental:
+            if digest == last_hash:
+                print(f"⏭️  {describe(paths)} unchanged since last load, skipping")
+                return timer.summary()
+            # file đã nạp ở lần trước (cùng kích thước + sha256) không đọc lại
+            files = pending_files(SOURCE_NAME, files)
+            if not files:
+                return timer.summary()
+            print(f"🔖 Watermark: order_placed_at >= {high_water}")
+
+        # nạp lại toàn bộ commit từng chunk -> chạy lại sau lỗi tiếp tục từ batch chưa commit.
+        # (incremental commit một lần cuối, partition swap chỉ thay tháng ở bước cuối: lỗi giữa chừng
+        # không để lại dữ liệu dở, chạy lại từ đầu)
+        checkpoint = None
+        resuming = False
+        if not incremental and not swap_partitions:
+            checkpoint = Checkpoint(SOURCE_NAME, run_key(digest, chunk_rows))
+            resuming = checkpoint.resume()
+
+        # đọc lười: từng chunk (hoặc từng file) được đọc khi vòng lặp bên dưới cần tới
+        reader = iter_source_chunks([f["path"] for f in files], READ_OPTIONS, chunk_rows,
+                                    engine=csv_engine, workers=read_workers)
+
+    stager = StagingWriter(SOURCE_NAME, staging)
+    validator = Validator(SOURCE_NAME, run_key=checkpoint.key if checkpoint is not None else None)
+
+    # >= watermark: các đơn cùng phút với watermark được upsert lại, không bị mất
+    since = pd.Timestamp(high_water) if incremental and high_water else None
+    max_seen = since
+    total_rows = 0
+    loaded_dates = set()
+    run_restaurants = None
+    with pooled_connection() as conn:
+        swap = PartitionSwap(conn, 'fact_orders') if swap_partitions else None
+        try:
+            # partition swap: giữ nguyên các tháng khác, dim chỉ upsert; nạp lại toàn bộ: TRUNCATE commit
+            # cùng batch đầu tiên (load_chunk)
+            truncate = checkpoint is not None and not resuming
+            restaurant_hashes = stored_hashes(conn, 'dim_restaurant', 'restaurant_id')
+            # pipeline_depth > 0: đọc + transform chunk sau trong thread riêng trong lúc chunk này đang nạp;
+            # thread này (writer) giữ connection, staging và các trạng thái của cả lần chạy
+            chunks = Pipeline(timer.iterate("extract", reader, rows=len),
+                              lambda chunk: prepare_chunk(timer, validator, chunk, since),
+                              depth=pipeline_depth, workers=transform_workers)
+            with chunks:
+                for i, (rows, frames) in enumerate(chunks):
+                    fact_orders = frames['fact_orders']
+                    with timer.stage("transform"):
+                        run_restaurants = merge_restaurants(run_restaurants, frames['dim_restaurant'])
+
+                    with timer.stage("staging"):
+                        stage_frames(stager, frames['dim_restaurant'], frames['dim_customer_orders'], fact_orders,
+                                     frames['fact_order_items'])
+
+                    # batch đã commit ở lần chạy dở trước: vẫn transform (dim của cả lần chạy, watermark,
+                    # staging, quarantine cần mọi chunk) nhưng không nạp lại
+                    loaded = checkpoint is not None and checkpoint.done(i)
+                    if not loaded:
+                        with timer.stage("load"):
+                            record(rows_in=len(fact_orders))
+                            load_chunk(conn, frames, incremental, swap, truncate)
+                            truncate = False
+
+                            # batch + checkpoint của nó commit cùng nhau;
+                            # incremental: commit một lần cuối cùng để watermark không vượt qua chunk chưa nạp
+                            if checkpoint is not None:
+                                checkpoint.mark(conn, i, len(fact_orders))
+                            if not incremental:
+                                conn.commit()
+
+                    if len(fact_orders):
+                        chunk_max = fact_orders['order_placed_at'].max()
+                        max_seen = chunk_max if max_seen is None else max(max_seen, chunk_max)
+                    total_rows += len(fact_orders)
+                    loaded_dates |= order_dates(fact_orders)
+                    print(f"📦 Chunk {i + 1}: {rows} rows -> {len(fact_orders)} fact rows"
+                          f"{' (already loaded)' if loaded else ''}")
+
+            # nạp lại tháng cũ không được kéo watermark lùi lại
+            if swap is not None:
+                max_seen = latest(high_water, max_seen)
+
+            with timer.stage("staging"):
+                stager.finish(file_hash=digest, incremental=incremental, swap_partitions=swap_partitions,
+                              high_water=max_seen, rows=total_rows, files=files)
+            with timer.stage("validate"):
+                validator.finish()
+
+            with timer.stage("load"):
+                # không có batch nào -> vẫn làm rỗng bảng như bản nạp lại toàn bộ
+                if truncate:
+                    truncate_tables(conn)
+                if swap is not None:
+                    loaded_dates = month_dates(swap.finish(before_swap=drop_swapped_out_items))
+                load_restaurants(conn, run_restaurants, restaurant_hashes,
+                                 delete_missing=not incremental and not swap_partitions)
+                record_ingested(conn, SOURCE_NAME, files, replace=not incremental and not swap_partitions)
+                set_watermark(conn, SOURCE_NAME, max_seen, digest, total_rows)
+                clear_checkpoints(conn, SOURCE_NAME)
+                conn.commit()
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
+
+    # full reload tính lại toàn bộ mart, incremental chỉ các ngày vừa nạp, swap mọi ngày của các tháng đã thay
+    with timer.stage("refresh"):
+        refresh_order_marts(loaded_dates if incremental or swap_partitions else None)
+
+    print(f"\n✅ Loaded {total_rows} fact rows ({mode})")
+    print("\n🎯 ETL for Orders completed successfully!\n")
+    return timer.summary()
+
+
+# ==========================================================
+# ETL: ORDERS - NẠP LẠI TỪ STAGING PARQUET
+# ==========================================================
+
+def main_from_staging():
+    print("🚀 Starting ETL: Transaction Source (Orders, from staging)")
+    timer = StageTimer("orders")
+
+    with timer.stage("extract"):
+        manifest = read_manifest(SOURCE_NAME)
+        incremental = manifest["incremental"]
+        swap_partitions = manifest.get("swap_partitions", False)
+        print(f"[EXTRACT] Using staging written at {manifest['written_at']}")
+
+    with timer.stage("load"):
+        try:
+            engine = get_engine()
+            ensure_tables(engine)
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
+
+    # batch = part staging; cùng bộ staging -> chạy lại tiếp tục từ part chưa commit
+    checkpoint = None
+    resuming = False
+    if not incremental and not swap_partitions:
+        checkpoint = Checkpoint(SOURCE_NAME, run_key(manifest["file_hash"], manifest["written_at"], "staging"))
+        resuming = checkpoint.resume()
+
+    # mỗi part staging tương ứng một chunk của lần chạy gốc, nạp theo cùng cách với main_streaming
+    total_rows = 0
+    loaded_dates = set()
+    run_restaurants = None
+    with pooled_connection() as conn:
+        swap = PartitionSwap(conn, 'fact_orders') if swap_partitions else None
+        try:
+            truncate = checkpoint is not None and not resuming
+            restaurant_hashes = stored_hashes(conn, 'dim_restaurant', 'restaurant_id')
+            for i, frames in enumerate(timer.iterate("extract", iter_staged_parts(SOURCE_NAME, manifest))):
+                run_restaurants = merge_restaurants(run_restaurants, frames['dim_restaurant'])
+                if checkpoint is None or not checkpoint.done(i):
+                    with timer.stage("load"):
+                        record(rows_in=len(frames['fact_orders']))
+                        load_chunk(conn, frames, incremental, swap, truncate)
+                        truncate = False
+                        if checkpoint is not None:
+                            checkpoint.mark(conn, i, len(frames['fact_orders']))
+                        if not incremental:
+                            conn.commit()
+                total_rows += len(frames['fact_orders'])
+                loaded_dates |= order_dates(frames['fact_orders'])
+
+            with timer.stage("load"):
+                # không có batch nào -> vẫn làm rỗng bảng như bản nạp lại toàn bộ
+                if truncate:
+                    truncate_tables(conn)
+                if swap is not None:
+                    loaded_dates = month_dates(swap.finish(before_swap=drop_swapped_out_items))
+                load_restaurants(conn, run_restaurants, restaurant_hashes,
+                                 delete_missing=not incremental and not swap_partitions)
+                record_ingested(conn, SOURCE_NAME, manifest.get("files", []),
+                                replace=not incremental and not swap_partitions)
+                set_watermark(conn, SOURCE_NAME, manifest["high_water"], manifest["file_hash"], manifest["rows"])
+                clear_checkpoints(conn, SOURCE_NAME)
+                conn.commit()
+        except Exception as e:
+            print(f"❌ Load error: {e}")
+            raise
+
+    with timer.stage("refresh"):
+        refresh_order_marts(loaded_dates if incremental or swap_partitions else None)
 
+    print(f"\n✅ Loaded {total_rows} fact rows from staging")
     print("\n🎯 ETL for Orders completed successfully!\n")
+    return timer.summary()
 
 
 if __name__ == "__main__":
-    main()
+    main(**parse_job_args("ETL: order history -> dim_restaurant, dim_customer_orders, dim_time, fact_orders, fact_order_items", streaming=True))
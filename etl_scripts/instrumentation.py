@@ -0,0 +1,167 @@
+# etl_scripts/instrumentation.py
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource   # không có trên Windows -> không đo được RSS / CPU của process con
+except ImportError:
+    resource = None
+
+PROFILE_DIR = "../logs/profiles"
+
+# stage cần profile: "load" (mọi job) hoặc "orders.load". Đặt qua biến môi trường để
+# process con của orchestrator cũng thấy (main_etl.py --profile-stage / --trace-memory-stage).
+PROFILE_ENV = "FDW_PROFILE_STAGE"
+TRACE_MEMORY_ENV = "FDW_TRACE_MEMORY_STAGE"
+TRACE_MEMORY_TOP = 25
+
+COUNTERS = ("rows_in", "rows_out", "bytes_read", "bytes_written")
+
+# stage đang mở của thread hiện tại -> record() ở bulk_loader/staging cộng vào đúng stage
+_local = threading.local()
+# chế độ pipeline: thread reader / transform / writer cùng cộng vào một dict số đo
+_stats_lock = threading.Lock()
+
+
+def cpu_seconds():
+    # CPU của process + các process con đã kết thúc (vd. pool chấm sentiment)
+    total = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        total += children.ru_utime + children.ru_stime
+    return total
+
+
+def peak_rss_mb():
+    # đỉnh RSS của process từ lúc khởi động (Linux: KB, macOS: byte)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def record(**amounts):
+    # cộng rows_in/rows_out/bytes_read/bytes_written vào stage đang mở (không có stage nào -> bỏ qua)
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        with _stats_lock:
+            for key, value in amounts.items():
+                stats[key] += int(value)
+
+
+@contextmanager
+def span(name):
+    # stage con của stage đang mở, vd. "transform.sentiment"; gọi được từ module không giữ StageTimer
+    timer = getattr(_local, "timer", None)
+    if timer is None:
+        yield None
+        return
+    with timer.stage(f"{_local.name}.{name}") as stats:
+        yield stats
+
+
+def _new_stats():
+    stats = {"wall": 0.0, "cpu": 0.0, "peak_rss_mb": None, "calls": 0}
+    stats.update(dict.fromkeys(COUNTERS, 0))
+    return stats
+
+
+def _selected(env_name, job_name, stage_name):
+    wanted = os.environ.get(env_name)
+    return wanted in (stage_name, f"{job_name}.{stage_name}") if wanted else False
+
+
+# --- Đo extract / transform / load của một job: wall, CPU, đỉnh RSS, số dòng, số byte ---
+class StageTimer:
+    def __init__(self, job_name):
+        self.job_name = job_name
+        self.stages = {}
+        self.started_at = datetime.now()
+        self.profiles = {}
+
+    @contextmanager
+    def stage(self, name):
+        # cộng dồn: chế độ streaming đi qua mỗi stage một lần cho từng chunk.
+        # Chế độ pipeline: các stage chạy chồng nhau trong nhiều thread -> tổng wall của các stage > wall của job
+        with _stats_lock:
+            stats = self.stages.setdefault(name, _new_stats())
+        outer = (getattr(_local, "timer", None), getattr(_local, "name", None), getattr(_local, "stats", None))
+        _local.timer, _local.name, _local.stats = self, name, stats
+        profiler = self._start_profile(name)
+        tracing = self._start_trace(name)
+        start, cpu_start = time.perf_counter(), cpu_seconds()
+        try:
+            yield stats
+        finally:
+            wall, cpu, peak = time.perf_counter() - start, cpu_seconds() - cpu_start, peak_rss_mb()
+            with _stats_lock:
+                stats["wall"] += wall
+                stats["cpu"] += cpu
+                stats["calls"] += 1
+                if peak is not None:
+                    stats["peak_rss_mb"] = max(stats["peak_rss_mb"] or 0.0, peak)
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self._profile_path(name, "prof"))
+            if tracing:
+                self._dump_trace(name)
+            _local.timer, _local.name, _local.stats = outer
+
+    def iterate(self, name, iterable, rows=None):
+        # tính thời gian lấy từng phần tử (vd. đọc chunk tiếp theo từ read_csv) vào stage `name`;
+        # rows(item) -> số dòng của phần tử, cộng vào rows_out của stage
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                if rows is not None:
+                    record(rows_out=rows(item))
+            yield item
+
+    # --- cProfile / tracemalloc cho stage được chọn ---
+    def _profile_path(self, name, ext):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = self.started_at.strftime("%Y%m%dT%H%M%S")
+        return os.path.join(PROFILE_DIR, f"{self.job_name}_{name}_{stamp}.{ext}")
+
+    def _start_profile(self, name):
+        if not _selected(PROFILE_ENV, self.job_name, name):
+            return None
+        # một profiler cho cả stage, bật/tắt theo từng chunk; file .prof ghi lại sau mỗi lần (xem bằng snakeviz/pstats)
+        profiler = self.profiles.setdefault(name, cProfile.Profile())
+        profiler.enable()
+        return profiler
+
+    def _start_trace(self, name):
+        if tracemalloc.is_tracing() or not _selected(TRACE_MEMORY_ENV, self.job_name, name):
+            return False
+        tracemalloc.start()
+        return True
+
+    def _dump_trace(self, name):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        path = self._profile_path(name, "tracemalloc.txt")
+        # chunk sau ghi nối tiếp -> thấy được bộ nhớ của từng lần đi qua stage
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"# {self.job_name}.{name} pass {self.stages[name]['calls']}: "
+                    f"current {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB\n")
+            for stat in snapshot.statistics("lineno")[:TRACE_MEMORY_TOP]:
+                f.write(f"{stat}\n")
+            f.write("\n")
+
+    def summary(self):
+        for name in self.profiles:
+            print(f"🔬 cProfile for {self.job_name}.{name} -> {self._profile_path(name, 'prof')}")
+        # trả về chính dict đang đo: job bỏ qua sớm gọi summary() ngay trong stage, số đo chốt khi stage đóng
+        return self.stages
@@ -0,0 +1,71 @@
+# etl_scripts/job_args.py
+import argparse
+from pipeline import DEFAULT_PIPELINE_DEPTH, DEFAULT_TRANSFORM_WORKERS
+
+# Lựa chọn dòng lệnh nằm ở đây (không ở staging.py / source_files.py) để dựng parser không phải import
+# pandas / pyarrow: main_etl.py --help và bước chọn job chạy chỉ với thư viện chuẩn.
+
+# full: ghi đủ dữ liệu Parquet (có thể nạp lại bằng --from-staging)
+# preview: chỉ ghi PREVIEW_ROWS dòng đầu mỗi bảng ra CSV để xem nhanh
+# off: không ghi gì
+STAGING_MODES = ("full", "preview", "off")
+DEFAULT_STAGING_MODE = "full"
+
+# c: pandas, đọc từng chunk được; pyarrow: parser đa luồng của Arrow, đọc trọn file rồi cắt chunk
+CSV_ENGINES = ("c", "pyarrow")
+DEFAULT_CSV_ENGINE = "c"
+# số file đọc / băm cùng lúc (cũng là số file tối đa nằm trong RAM chờ transform)
+DEFAULT_READ_WORKERS = 4
+
+
+# --- Tham số dòng lệnh dùng chung cho các job ETL ---
+def build_parser(description, streaming=False):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="chỉ nạp dòng mới hơn watermark trong dw.etl_watermark (upsert, không TRUNCATE)"
+    )
+    parser.add_argument(
+        "--staging", choices=STAGING_MODES, default=DEFAULT_STAGING_MODE,
+        help="full: Parquet đầy đủ (dùng cho --from-staging), preview: chỉ CSV mẫu, off: không ghi"
+    )
+    parser.add_argument(
+        "--from-staging", action="store_true",
+        help="bỏ qua extract/transform, nạp lại từ staging Parquet của lần chạy trước"
+    )
+    if streaming:
+        parser.add_argument(
+            "--chunk-rows", type=int, default=None,
+            help="đọc/biến đổi/nạp theo từng chunk N dòng (mặc định: đọc cả file)"
+        )
+        parser.add_argument(
+            "--swap-partitions", action="store_true",
+            help="nạp lại trọn các tháng có trong file: COPY vào bảng staging rồi ATTACH thay partition cũ"
+        )
+        parser.add_argument(
+            "--input", dest="input_path", default=None, metavar="PATH",
+            help="file, thư mục hoặc glob nguồn (.csv / .csv.gz / .csv.zst); mặc định: INPUT_FILE của job"
+        )
+        parser.add_argument(
+            "--read-workers", type=int, default=DEFAULT_READ_WORKERS,
+            help="số file đọc / băm song song khi nguồn có nhiều file"
+        )
+        parser.add_argument(
+            "--csv-engine", choices=CSV_ENGINES, default=DEFAULT_CSV_ENGINE,
+            help="c: pandas (đọc theo chunk), pyarrow: parser đa luồng của Arrow, đọc trọn từng file"
+        )
+        parser.add_argument(
+            "--pipeline-depth", type=int, default=DEFAULT_PIPELINE_DEPTH,
+            help="N > 0: đọc + transform chunk sau trong thread riêng trong lúc chunk trước đang nạp, "
+                 "tối đa N chunk chờ nạp (0: tuần tự)"
+        )
+        parser.add_argument(
+            "--transform-workers", type=int, default=DEFAULT_TRANSFORM_WORKERS,
+            help="số thread transform khi --pipeline-depth > 0 (> 1: khoá mới của key map cấp theo thứ tự "
+                 "transform xong, không theo thứ tự file)"
+        )
+    return parser
+
+
+def parse_job_args(description, streaming=False, argv=None):
+    return vars(build_parser(description, streaming=streaming).parse_args(argv))
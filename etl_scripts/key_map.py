@@ -0,0 +1,122 @@
+# etl_scripts/key_map.py
+import threading
+import pandas as pd
+from db_connection import pooled_connection
+from watermark import WATERMARK_TABLE, ensure_watermark_table
+
+SCHEMA_NAME = "dw"
+KEY_MAP_TABLE = f"{SCHEMA_NAME}.etl_key_map"
+
+# natural key (chuỗi từ nguồn) -> surrogate key BIGINT, đánh số 1, 2, 3... riêng cho từng entity.
+# Bảng chỉ được thêm dòng, không bao giờ xoá -> cùng natural key luôn nhận lại cùng khoá qua mọi lần chạy,
+# kể cả khi dim/fact bị TRUNCATE để nạp lại.
+KEY_MAP_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {KEY_MAP_TABLE} (
+        entity VARCHAR(50) NOT NULL,
+        natural_key TEXT NOT NULL,
+        sk BIGINT NOT NULL,
+        created_at TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (entity, natural_key),
+        UNIQUE (entity, sk)
+    );
+"""
+
+# bảng đã được tạo trong process này chưa (các job chạy song song cùng tạo -> khoá)
+_ready = False
+
+
+def ensure_key_map(conn):
+    global _ready
+    if _ready:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (KEY_MAP_TABLE,))
+        cur.execute(KEY_MAP_DDL)
+    conn.commit()
+    _ready = True
+
+
+# =====================================================
+# LOOKUP CÓ CACHE
+# =====================================================
+class KeyMap:
+    # mỗi natural key chỉ hỏi DB một lần trong process; khoá mới chỉ cấp cho natural key chưa từng gặp
+    def __init__(self, entity, max_entries=5_000_000):
+        self.entity = entity
+        self.max_entries = max_entries
+        self.cache = {}
+        self.assigned = 0
+        # chế độ pipeline nhiều thread transform: mỗi lúc một thread tra / cấp khoá
+        self._lock = threading.Lock()
+
+    def __call__(self, values):
+        # Series natural key -> Series Int64 surrogate key (NaN -> <NA>), cùng index
+        codes, uniques = pd.factorize(values)
+        keys = [str(u) for u in uniques]
+        with self._lock:
+            todo = [k for k in keys if k not in self.cache]
+            if todo:
+                if len(self.cache) + len(todo) > self.max_entries:
+                    self.cache.clear()
+                    todo = keys
+                self.cache.update(self._resolve(todo))
+            sks = pd.array([self.cache[k] for k in keys], dtype="Int64")
+        return pd.Series(sks.take(codes, allow_fill=True), index=values.index, name=values.name)
+
+    def _fetch(self, cur, keys):
+        cur.execute(
+            f"SELECT natural_key, sk FROM {KEY_MAP_TABLE} WHERE entity = %s AND natural_key = ANY(%s)",
+            (self.entity, keys),
+        )
+        return dict(cur.fetchall())
+
+    def _resolve(self, keys):
+        # transaction riêng, commit ngay: khoá đã cấp vẫn giữ nguyên dù lần nạp sau đó lỗi
+        with pooled_connection() as conn:
+            ensure_key_map(conn)
+            with conn.cursor() as cur:
+                found = self._fetch(cur, keys)
+                missing = [k for k in keys if k not in found]
+                if missing:
+                    # một process cấp khoá cho entity tại một thời điểm -> số liên tục, không trùng
+                    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{KEY_MAP_TABLE}:{self.entity}",))
+                    found.update(self._fetch(cur, missing))
+                    missing = [k for k in missing if k not in found]
+                if missing:
+                    cur.execute(f"SELECT COALESCE(MAX(sk), 0) FROM {KEY_MAP_TABLE} WHERE entity = %s", (self.entity,))
+                    last = cur.fetchone()[0]
+                    # đánh số theo thứ tự xuất hiện trong nguồn
+                    cur.execute(
+                        f"INSERT INTO {KEY_MAP_TABLE} (entity, natural_key, sk) "
+                        f"SELECT %s, k, %s + n FROM unnest(%s::text[]) WITH ORDINALITY AS u(k, n)",
+                        (self.entity, last, missing),
+                    )
+                    found.update(zip(missing, range(last + 1, last + 1 + len(missing))))
+            conn.commit()
+
+        if missing:
+            self.assigned += len(missing)
+            print(f"🔑 Assigned {len(missing)} new {self.entity} keys ({len(keys) - len(missing)} already mapped)")
+        return found
+
+
+# =====================================================
+# BẢNG CŨ DÙNG KHOÁ CHUỖI
+# =====================================================
+def drop_string_keyed(conn, source, key_table, key_column, tables):
+    # bảng tạo trước khi có key map ('CLK_U1', 'REV_x', ... kiểu VARCHAR) -> xoá để tạo lại với BIGINT
+    # và xoá watermark của nguồn: lần chạy này (kể cả --incremental) nạp lại toàn bộ
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s AND column_name = %s
+        """, (SCHEMA_NAME, key_table, key_column))
+        row = cur.fetchone()
+        if row is None or row[0] == "bigint":
+            return False
+        for table_name in tables:
+            cur.execute(f"DROP TABLE IF EXISTS {SCHEMA_NAME}.{table_name} CASCADE")
+        ensure_watermark_table(conn)
+        cur.execute(f"DELETE FROM {WATERMARK_TABLE} WHERE source = %s", (source,))
+    print(f"🧹 Dropped {', '.join(tables)} ({key_table}.{key_column} was {row[0]}); {source} will be reloaded in full")
+    return True
@@ -1,15 +1,83 @@
-from customer_etl import main as customer_main
-from etl_event_script import main as event_main
-from etl_reviews import main as reviews_main
-from etl_transaction import main as transaction_main
-
-def main():
-    print(" Starting all ETL jobs...\n")
-    customer_main()
-    transaction_main()
-    event_main()
-    reviews_main()
+import argparse
+import os
+import sys
+from datetime import datetime
+# chỉ thư viện chuẩn ở process cha: module job (pandas, pyarrow, TextBlob...) import trong process con khi job chạy,
+# engine / pool tạo ở lần dùng đầu (db_connection) -> --help hay chạy một job không trả chi phí của job khác
+from orchestrator import JOBS, JOB_NAMES, run_jobs, print_report
+from job_args import STAGING_MODES, DEFAULT_STAGING_MODE, CSV_ENGINES
+from instrumentation import PROFILE_ENV, TRACE_MEMORY_ENV
+from run_stats import new_run_id, record_run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FoodFast ETL jobs",
+                                     epilog=f"jobs: {', '.join(JOB_NAMES)} (vd. python main_etl.py orders events)")
+    parser.add_argument("job", nargs="*", metavar="JOB", help="chỉ chạy các job này (mặc định: tất cả)")
+    parser.add_argument("--jobs", nargs="+", choices=JOB_NAMES, default=None, help="như JOB (giữ cho lịch chạy cũ)")
+    parser.add_argument("--workers", type=int, default=None, help="số process chạy song song")
+    parser.add_argument("--incremental", action="store_true", help="nạp incremental theo watermark")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="streaming theo chunk cho orders/events")
+    parser.add_argument("--sentiment-workers", type=int, default=None, help="số process chấm sentiment cho reviews")
+    parser.add_argument("--staging", choices=STAGING_MODES, default=DEFAULT_STAGING_MODE,
+                        help="full: Parquet đầy đủ, preview: chỉ CSV mẫu, off: không ghi staging")
+    parser.add_argument("--from-staging", action="store_true", help="nạp lại từ staging Parquet, bỏ qua extract/transform")
+    parser.add_argument("--swap-partitions", action="store_true",
+                        help="orders/events: thay trọn các tháng có trong file bằng partition swap")
+    parser.add_argument("--input", action="append", default=[], metavar="JOB=PATH",
+                        help="orders/events: file, thư mục hoặc glob nguồn thay cho file mặc định (lặp lại cho mỗi job)")
+    parser.add_argument("--read-workers", type=int, default=None, help="orders/events: số file đọc song song")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES, default=None, help="orders/events: parser CSV")
+    parser.add_argument("--pipeline-depth", type=int, default=None,
+                        help="orders/events: đọc + transform chunk sau trong lúc chunk trước đang nạp (N chunk chờ)")
+    parser.add_argument("--transform-workers", type=int, default=None,
+                        help="orders/events: số thread transform khi --pipeline-depth > 0")
+    parser.add_argument("--profile-stage", default=None, metavar="[JOB.]STAGE",
+                        help="cProfile một stage (vd. load, reviews.transform) -> ../logs/profiles/*.prof")
+    parser.add_argument("--trace-memory-stage", default=None, metavar="[JOB.]STAGE",
+                        help="tracemalloc một stage -> top dòng cấp phát trong ../logs/profiles/")
+    args = parser.parse_args(argv)
+    # choices cho positional nargs="*" báo lỗi khi để trống -> kiểm tra tay
+    unknown = [name for name in args.job if name not in JOB_NAMES]
+    if unknown:
+        parser.error(f"unknown job {', '.join(unknown)} (choose from {', '.join(JOB_NAMES)})")
+    selected = list(dict.fromkeys(args.job + (args.jobs or []))) or None
+    inputs = dict(spec.split("=", 1) for spec in args.input if "=" in spec)
+    input_jobs = [job["name"] for job in JOBS if "input_path" in job["options"]]
+    if len(inputs) != len(args.input) or not set(inputs) <= set(input_jobs):
+        parser.error(f"--input expects JOB=PATH with JOB in {', '.join(input_jobs)}")
+
+    # process con của orchestrator đọc lựa chọn profile từ biến môi trường
+    if args.profile_stage:
+        os.environ[PROFILE_ENV] = args.profile_stage
+    if args.trace_memory_stage:
+        os.environ[TRACE_MEMORY_ENV] = args.trace_memory_stage
+
+    started_at = datetime.now()
+    run_id = new_run_id(started_at)
+    print(f" Starting all ETL jobs... (run {run_id})\n")
+    options = {
+        "incremental": args.incremental,
+        "chunk_rows": args.chunk_rows,
+        "sentiment_workers": args.sentiment_workers,
+        "staging": args.staging,
+        "from_staging": args.from_staging,
+        "swap_partitions": args.swap_partitions,
+        "input_path": inputs or None,
+        "read_workers": args.read_workers,
+        "csv_engine": args.csv_engine,
+        "pipeline_depth": args.pipeline_depth,
+        "transform_workers": args.transform_workers,
+    }
+    results = run_jobs(selected=selected, max_workers=args.workers, options=options)
+    print_report(results)
+    record_run(run_id, started_at, results, options)
+
+    failed = [name for name, r in results.items() if r["status"] != "ok"]
+    if failed:
+        print(f"\n ETL finished with failures: {', '.join(failed)}")
+        return 1
     print("\n All ETL jobs finished successfully!")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
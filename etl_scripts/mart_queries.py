@@ -0,0 +1,212 @@
+# etl_scripts/mart_queries.py
+import io
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from db_connection import get_engine
+from watermark import DATA_VERSION_TABLE
+
+# Truy vấn mart cho dashboard: mỗi hàm một view của dw_mart (sqlfile/views.sql), tham số lọc rõ ràng,
+# kết quả là Arrow Table (output="arrow") hoặc DataFrame cột Arrow (output="pandas", mặc định).
+# Kết quả cache trong RAM theo (câu SQL, tham số): hết hạn sau DEFAULT_TTL_SECONDS, giữ tối đa
+# DEFAULT_MAX_ENTRIES (LRU), và bỏ khi một lần nạp ETL commit dữ liệu mới (tổng phiên bản trong
+# dw.etl_data_version đổi, xem watermark.bump_data_version). Phiên bản chỉ được hỏi lại sau mỗi
+# VERSION_CHECK_SECONDS -> sau khi ETL commit, kết quả cũ còn được trả tối đa chừng ấy giây
+# (QueryCache(version_check_seconds=0): hỏi mỗi lần gọi, không bao giờ cũ).
+#
+#   from mart_queries import top_restaurants
+#   top_restaurants(limit=20, city="Delhi NCR")
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 128
+# phiên bản dữ liệu hỏi lại DB tối đa một lần mỗi khoảng này (dashboard refresh liên tục không thêm query);
+# cũng là thời gian tối đa cache còn trả kết quả cũ sau khi ETL commit
+VERSION_CHECK_SECONDS = 5
+
+OUTPUTS = ("pandas", "arrow")
+
+# kiểu Arrow của từng cột kết quả: COPY ra CSV rồi parse thẳng sang Arrow theo kiểu này,
+# không qua tuple / object Python của từng dòng
+REVENUE_DAILY_SCHEMA = {"order_date": pa.date32(), "orders": pa.int64(), "revenue": pa.float64(),
+                        "aov": pa.float64()}
+REVENUE_BY_AREA_SCHEMA = {"city": pa.string(), "subzone": pa.string(), "orders": pa.int64(),
+                          "revenue": pa.float64()}
+TOP_RESTAURANTS_SCHEMA = {"restaurant_id": pa.string(), "restaurant_name": pa.string(), "city": pa.string(),
+                          "subzone": pa.string(), "orders": pa.int64(), "revenue": pa.float64()}
+ORDER_STATUS_SCHEMA = {"order_status": pa.string(), "orders": pa.int64(), "pct": pa.float64()}
+EVENT_FUNNEL_SCHEMA = {"event_name": pa.string(), "event_date": pa.date32(), "events": pa.int64(),
+                       "amount": pa.float64()}
+REVIEWS_SUMMARY_SCHEMA = {"score": pa.int64(), "reviews": pa.int64(), "avg_sentiment": pa.float64()}
+
+TOP_RESTAURANT_ORDERS = ("revenue", "orders")
+
+
+# =====================================================
+# CACHE TTL + LRU THEO PHIÊN BẢN DỮ LIỆU
+# =====================================================
+class QueryCache:
+    # key -> (phiên bản dữ liệu, hết hạn lúc, Arrow Table). Arrow Table bất biến -> trả thẳng cho nhiều
+    # người gọi; DataFrame tạo mới mỗi lần nên người gọi sửa cũng không đụng cache
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 version_check_seconds=VERSION_CHECK_SECONDS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._version_checked = 0.0
+        self._lock = threading.Lock()
+
+    def version(self):
+        # tổng phiên bản của mọi nguồn; bảng chưa có (chưa lần nạp nào) -> 0
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked < self.version_check_seconds:
+                return self._version
+        try:
+            with get_engine().connect() as conn:
+                version = conn.execute(text(f"SELECT COALESCE(SUM(version), 0) FROM {DATA_VERSION_TABLE}")).scalar()
+        except ProgrammingError:
+            version = 0
+        with self._lock:
+            self._version, self._version_checked = int(version), now
+        return self._version
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, version, table):
+        with self._lock:
+            self.entries[key] = (version, time.monotonic() + self.ttl, table)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "version": self._version}
+
+
+CACHE = QueryCache()
+
+
+# =====================================================
+# CHẠY TRUY VẤN -> ARROW
+# =====================================================
+def _fetch_arrow(cur, sql, schema):
+    # COPY (SELECT ...) TO STDOUT CSV, Arrow parse cả khối theo schema
+    buffer = io.BytesIO()
+    cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+    # ô trống không có dấu nháy = NULL, "" = chuỗi rỗng (quy ước CSV của PostgreSQL)
+    return pa_csv.read_csv(pa.BufferReader(buffer.getvalue()), convert_options=pa_csv.ConvertOptions(
+        column_types=schema, strings_can_be_null=True, quoted_strings_can_be_null=False,
+    ))
+
+
+def _cache_key(sql, params):
+    # list (vd. event_names) -> tuple để làm key được
+    return sql, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+
+
+def run_query(sql, params, schema, output="pandas", cache=CACHE):
+    if output not in OUTPUTS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUTS)}, got {output!r}")
+    # tra cache trước khi lấy connection: cache hit không chiếm / không phải chờ connection của pool
+    key = _cache_key(sql, params)
+    version = cache.version() if cache is not None else None
+    table = cache.get(key, version) if cache is not None else None
+    if table is None:
+        conn = get_engine().raw_connection()
+        try:
+            with conn.cursor() as cur:
+                # ghép tham số bằng psycopg2 (escape đúng kiểu) -> câu SQL hoàn chỉnh cho COPY
+                table = _fetch_arrow(cur, cur.mogrify(sql, params).decode(), schema)
+            conn.rollback()
+        finally:
+            conn.close()
+        if cache is not None:
+            cache.put(key, version, table)
+    if output == "arrow":
+        return table
+    # cột Arrow trong pandas: không bung chuỗi / ngày thành object Python từng ô
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+# =====================================================
+# TRUY VẤN CỦA DASHBOARD
+# =====================================================
+def revenue_daily(start=None, end=None, output="pandas"):
+    # doanh thu theo ngày trong [start, end] (None = không chặn phía đó)
+    return run_query("""
+        SELECT order_date, orders, revenue, aov FROM dw_mart.v_revenue_daily
+        WHERE (%(start)s::date IS NULL OR order_date >= %(start)s::date)
+          AND (%(end)s::date IS NULL OR order_date <= %(end)s::date)
+        ORDER BY order_date
+    """, {"start": start, "end": end}, REVENUE_DAILY_SCHEMA, output)
+
+
+def revenue_by_area(city=None, limit=None, output="pandas"):
+    # doanh thu theo city/subzone, giảm dần; city=None -> mọi thành phố; limit=None -> mọi khu vực
+    return run_query("""
+        SELECT city, subzone, orders, revenue FROM dw_mart.v_revenue_by_area
+        WHERE %(city)s::text IS NULL OR city = %(city)s::text
+        ORDER BY revenue DESC NULLS LAST, city, subzone
+        LIMIT %(limit)s
+    """, {"city": city, "limit": limit}, REVENUE_BY_AREA_SCHEMA, output)
+
+
+def top_restaurants(limit=20, city=None, order_by="revenue", output="pandas"):
+    # top nhà hàng theo doanh thu hoặc số đơn
+    if order_by not in TOP_RESTAURANT_ORDERS:
+        raise ValueError(f"order_by must be one of {', '.join(TOP_RESTAURANT_ORDERS)}, got {order_by!r}")
+    return run_query(f"""
+        SELECT restaurant_id, restaurant_name, city, subzone, orders, revenue FROM dw_mart.v_top_restaurants
+        WHERE %(city)s::text IS NULL OR city = %(city)s::text
+        ORDER BY {order_by} DESC NULLS LAST, restaurant_id
+        LIMIT %(limit)s
+    """, {"city": city, "limit": limit}, TOP_RESTAURANTS_SCHEMA, output)
+
+
+def order_status_ratio(output="pandas"):
+    return run_query("""
+        SELECT order_status, orders, pct FROM dw_mart.v_order_status_ratio ORDER BY orders DESC, order_status
+    """, {}, ORDER_STATUS_SCHEMA, output)
+
+
+def event_funnel(start=None, end=None, event_names=None, output="pandas"):
+    # số event + tổng amount theo ngày và loại event; event_names=None -> mọi loại
+    return run_query("""
+        SELECT event_name, event_date, events, amount FROM dw_mart.v_event_funnel
+        WHERE (%(start)s::date IS NULL OR event_date >= %(start)s::date)
+          AND (%(end)s::date IS NULL OR event_date <= %(end)s::date)
+          AND (%(names)s::text[] IS NULL OR event_name = ANY(%(names)s::text[]))
+        ORDER BY event_date, event_name
+    """, {"start": start, "end": end, "names": list(event_names) if event_names is not None else None},
+        EVENT_FUNNEL_SCHEMA, output)
+
+
+def reviews_summary(output="pandas"):
+    return run_query("""
+        SELECT score, reviews, avg_sentiment FROM dw_mart.v_reviews_summary ORDER BY score
+    """, {}, REVIEWS_SUMMARY_SCHEMA, output)
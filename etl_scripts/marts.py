@@ -0,0 +1,262 @@
+# etl_scripts/marts.py
+import time
+import pandas as pd
+from db_connection import pooled_connection
+from bulk_loader import copy_dataframe
+from watermark import bump_data_version
+
+MART_SCHEMA = "dw_mart"
+
+# Mart đọc thẳng từ fact_orders + dim_restaurant (không qua v_orders_base) -> không cần chạy views.sql trước.
+# Giữ đồng bộ với phần MARTS trong sqlfile/views.sql.
+MART_DDL = f"""
+    CREATE SCHEMA IF NOT EXISTS {MART_SCHEMA};
+
+    -- doanh thu theo ngày: bảng thường để làm mới từng order_date
+    CREATE TABLE IF NOT EXISTS {MART_SCHEMA}.mart_revenue_daily (
+        order_date DATE PRIMARY KEY,
+        orders BIGINT NOT NULL,
+        revenue NUMERIC,
+        aov NUMERIC
+    );
+
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {MART_SCHEMA}.mv_revenue_by_area AS
+    SELECT r.city, r.subzone, COUNT(*) AS orders, SUM(f.total) AS revenue
+    FROM dw.fact_orders f
+    JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+    GROUP BY r.city, r.subzone;
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_revenue_by_area ON {MART_SCHEMA}.mv_revenue_by_area(city, subzone);
+    CREATE INDEX IF NOT EXISTS ix_mv_revenue_by_area_revenue ON {MART_SCHEMA}.mv_revenue_by_area(revenue DESC);
+
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {MART_SCHEMA}.mv_top_restaurants AS
+    SELECT r.restaurant_id, r.restaurant_name, r.city, r.subzone, COUNT(*) AS orders, SUM(f.total) AS revenue
+    FROM dw.fact_orders f
+    JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+    GROUP BY r.restaurant_id, r.restaurant_name, r.city, r.subzone;
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_top_restaurants ON {MART_SCHEMA}.mv_top_restaurants(restaurant_id);
+    CREATE INDEX IF NOT EXISTS ix_mv_top_restaurants_revenue ON {MART_SCHEMA}.mv_top_restaurants(revenue DESC);
+
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {MART_SCHEMA}.mv_order_status_ratio AS
+    SELECT f.order_status, COUNT(*) AS orders,
+           ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 2) AS pct
+    FROM dw.fact_orders f
+    JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+    GROUP BY f.order_status;
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_order_status_ratio ON {MART_SCHEMA}.mv_order_status_ratio(order_status);
+"""
+
+# materialized view có unique index -> REFRESH CONCURRENTLY, dashboard vẫn đọc được trong lúc làm mới
+CONCURRENT_MARTS = ["mv_revenue_by_area", "mv_top_restaurants", "mv_order_status_ratio"]
+
+REVENUE_DAILY_SELECT = """
+    SELECT f.order_placed_at::date AS order_date, COUNT(*), SUM(f.total), AVG(f.total)
+    FROM dw.fact_orders f
+    JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+"""
+
+
+# Rollup theo ngày cho events / reviews: job events / reviews cập nhật trong cùng transaction với batch fact
+# -> v_event_funnel / v_reviews_summary đọc rollup, không quét fact. Giữ đồng bộ với sqlfile/views.sql.
+# event_date / review_date NULL: dòng không có thời gian (time_key / time NULL) vẫn được đếm như view cũ.
+EVENT_ROLLUP_DDL = f"""
+    CREATE SCHEMA IF NOT EXISTS {MART_SCHEMA};
+    CREATE TABLE IF NOT EXISTS {MART_SCHEMA}.mart_events_daily (
+        event_date DATE,
+        event_name VARCHAR(100),
+        outcome VARCHAR(100),
+        events BIGINT NOT NULL,
+        amount_sum NUMERIC(18,2) NOT NULL,
+        amount_count BIGINT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_mart_events_daily_date ON {MART_SCHEMA}.mart_events_daily(event_date);
+"""
+
+REVIEW_ROLLUP_DDL = f"""
+    CREATE SCHEMA IF NOT EXISTS {MART_SCHEMA};
+    CREATE TABLE IF NOT EXISTS {MART_SCHEMA}.mart_reviews_daily (
+        review_date DATE,
+        score INT,
+        reviews BIGINT NOT NULL,
+        sentiment_sum DOUBLE PRECISION,
+        sentiment_count BIGINT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_mart_reviews_daily_date ON {MART_SCHEMA}.mart_reviews_daily(review_date);
+"""
+
+EVENTS_DAILY_TABLE = f"{MART_SCHEMA}.mart_events_daily"
+EVENTS_DAILY_KEYS = ["event_date", "event_name", "outcome"]
+# time_key YYYYMMDDHHMM -> ngày
+EVENTS_DAILY_SELECT = """
+    SELECT to_date((time_key / 10000)::text, 'YYYYMMDD') AS event_date, event_name, outcome,
+           COUNT(*), COALESCE(SUM(amount), 0), COUNT(amount)
+    FROM dw.fact_app_events
+"""
+
+REVIEWS_DAILY_TABLE = f"{MART_SCHEMA}.mart_reviews_daily"
+REVIEWS_DAILY_SELECT = """
+    SELECT review_date, score, COUNT(*), SUM(sentiment_score), COUNT(sentiment_score)
+    FROM dw.fact_reviews
+"""
+
+
+def _create(conn, ddl, table):
+    # orders / events / reviews chạy song song cùng tạo schema dw_mart -> khoá tới hết transaction;
+    # True nếu bảng vừa được tạo
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (MART_SCHEMA,))
+        cur.execute("SELECT to_regclass(%s) IS NULL", (table,))
+        created = cur.fetchone()[0]
+        cur.execute(ddl)
+    return created
+
+
+def ensure_marts(conn):
+    _create(conn, MART_DDL, f"{MART_SCHEMA}.mart_revenue_daily")
+
+
+def ensure_event_rollup(conn):
+    # rollup mới tạo trên fact đã có dữ liệu -> tính đủ một lần, sau đó chỉ cộng từng batch
+    if _create(conn, EVENT_ROLLUP_DDL, EVENTS_DAILY_TABLE):
+        refresh_event_rollup(conn)
+
+
+def ensure_review_rollup(conn):
+    if _create(conn, REVIEW_ROLLUP_DDL, REVIEWS_DAILY_TABLE):
+        refresh_review_rollup(conn)
+
+
+def _refresh_revenue_daily(cur, order_dates):
+    table = f"{MART_SCHEMA}.mart_revenue_daily"
+    if order_dates is not None:
+        # mart mới tạo còn rỗng -> phải tính đủ một lần, không chỉ các ngày vừa nạp
+        cur.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {table})")
+        if cur.fetchone()[0]:
+            order_dates = None
+    if order_dates is None:
+        cur.execute(f"TRUNCATE TABLE {table}")
+        cur.execute(f"INSERT INTO {table} {REVENUE_DAILY_SELECT} GROUP BY 1")
+        return "full"
+
+    # chỉ tính lại các ngày vừa nạp; khoảng min..max để dùng được index trên order_placed_at
+    dates = sorted(order_dates)
+    cur.execute(f"DELETE FROM {table} WHERE order_date = ANY(%s)", (dates,))
+    cur.execute(
+        f"INSERT INTO {table} {REVENUE_DAILY_SELECT} "
+        f"WHERE f.order_placed_at >= %s AND f.order_placed_at < %s::date + 1 "
+        f"AND f.order_placed_at::date = ANY(%s) GROUP BY 1",
+        (dates[0], dates[-1], dates),
+    )
+    return f"{len(dates)} dates"
+
+
+def refresh_order_marts(order_dates=None):
+    # order_dates=None: tính lại toàn bộ (full reload); ngược lại chỉ các order_date bị ảnh hưởng
+    if order_dates is not None and not len(order_dates):
+        print("⏭️  No new orders, marts unchanged")
+        return {}
+
+    timings = {}
+    with pooled_connection() as conn:
+        ensure_marts(conn)
+        conn.commit()
+
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            scope = _refresh_revenue_daily(cur, order_dates)
+        conn.commit()
+        timings["mart_revenue_daily"] = time.perf_counter() - start
+        print(f"🔄 Refreshed {MART_SCHEMA}.mart_revenue_daily ({scope}) in {timings['mart_revenue_daily']:.2f}s")
+
+        for name in CONCURRENT_MARTS:
+            start = time.perf_counter()
+            with conn.cursor() as cur:
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {MART_SCHEMA}.{name}")
+            conn.commit()
+            timings[name] = time.perf_counter() - start
+            print(f"🔄 Refreshed {MART_SCHEMA}.{name} (concurrently) in {timings[name]:.2f}s")
+
+        # mart đổi sau khi watermark của orders đã commit -> báo cho cache phía đọc một lần nữa
+        bump_data_version(conn, MART_SCHEMA)
+        conn.commit()
+    return timings
+
+
+# =====================================================
+# ROLLUP EVENTS / REVIEWS
+# =====================================================
+def refresh_event_rollup(conn, event_dates=None):
+    # tính lại từ fact: event_dates=None -> toàn bộ (full reload); ngược lại chỉ các ngày đó (vd. tháng vừa swap)
+    if event_dates is not None and not len(event_dates):
+        return
+    with conn.cursor() as cur:
+        if event_dates is None:
+            cur.execute(f"TRUNCATE TABLE {EVENTS_DAILY_TABLE}")
+            cur.execute(f"INSERT INTO {EVENTS_DAILY_TABLE} {EVENTS_DAILY_SELECT} GROUP BY 1, 2, 3")
+            scope = "full"
+        else:
+            dates = sorted(event_dates)
+            day_keys = [d.year * 10_000 + d.month * 100 + d.day for d in dates]
+            cur.execute(f"DELETE FROM {EVENTS_DAILY_TABLE} WHERE event_date = ANY(%s)", (dates,))
+            # khoảng time_key min..max -> chỉ quét các partition tháng liên quan
+            cur.execute(
+                f"INSERT INTO {EVENTS_DAILY_TABLE} {EVENTS_DAILY_SELECT} "
+                f"WHERE time_key >= %s AND time_key < %s AND time_key / 10000 = ANY(%s) GROUP BY 1, 2, 3",
+                (day_keys[0] * 10_000, (day_keys[-1] + 1) * 10_000, day_keys),
+            )
+            scope = f"{len(dates)} dates"
+    print(f"🔄 Refreshed {EVENTS_DAILY_TABLE} ({scope})")
+
+
+def add_event_rollup(conn, fact_events):
+    # batch chỉ thêm dòng vào fact (full reload sau truncate / incremental sau watermark) ->
+    # cộng tổng của batch vào rollup, không quét lại fact
+    if fact_events.empty:
+        return
+    delta = (fact_events.assign(event_day=fact_events['time_key'] // 10_000)
+             .groupby(['event_day', 'event_name', 'outcome'], dropna=False, observed=True, sort=False)
+             .agg(events=('amount', 'size'), amount_sum=('amount', 'sum'), amount_count=('amount', 'count'))
+             .reset_index())
+    delta.insert(0, 'event_date', pd.to_datetime(delta.pop('event_day').astype('Int64').astype(str),
+                                                 format='%Y%m%d', errors='coerce').dt.date)
+    # tổng float của các số 2 chữ số thập phân -> làm tròn lại cho khớp SUM(DECIMAL)
+    delta['amount_sum'] = delta['amount_sum'].round(2)
+
+    tmp_table = "tmp_rollup_events"
+    # khoá có thể NULL -> so bằng IS NOT DISTINCT FROM, không dùng ON CONFLICT được
+    match = " AND ".join(f"r.{c} IS NOT DISTINCT FROM d.{c}" for c in EVENTS_DAILY_KEYS)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {tmp_table}")
+        cur.execute(f"CREATE TEMP TABLE {tmp_table} ON COMMIT DROP AS "
+                    f"SELECT * FROM {EVENTS_DAILY_TABLE} WITH NO DATA")
+    copy_dataframe(delta, tmp_table, schema="pg_temp", conn=conn)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {EVENTS_DAILY_TABLE} r SET
+                events = r.events + d.events,
+                amount_sum = r.amount_sum + d.amount_sum,
+                amount_count = r.amount_count + d.amount_count
+            FROM {tmp_table} d WHERE {match}
+        """)
+        cur.execute(f"""
+            INSERT INTO {EVENTS_DAILY_TABLE}
+            SELECT * FROM {tmp_table} d
+            WHERE NOT EXISTS (SELECT 1 FROM {EVENTS_DAILY_TABLE} r WHERE {match})
+        """)
+
+
+def refresh_review_rollup(conn, review_dates=None):
+    # review_dates=None: tính lại toàn bộ; ngược lại chỉ các ngày vừa nạp / vừa xoá (None = review không có time)
+    with conn.cursor() as cur:
+        if review_dates is None:
+            cur.execute(f"TRUNCATE TABLE {REVIEWS_DAILY_TABLE}")
+            cur.execute(f"INSERT INTO {REVIEWS_DAILY_TABLE} {REVIEWS_DAILY_SELECT} GROUP BY 1, 2")
+            scope = "full"
+        else:
+            dates = sorted(d for d in review_dates if d is not None)
+            where = "(review_date = ANY(%s) OR (%s AND review_date IS NULL))"
+            params = (dates, len(dates) < len(review_dates))
+            cur.execute(f"DELETE FROM {REVIEWS_DAILY_TABLE} WHERE {where}", params)
+            cur.execute(f"INSERT INTO {REVIEWS_DAILY_TABLE} {REVIEWS_DAILY_SELECT} WHERE {where} GROUP BY 1, 2",
+                        params)
+            scope = f"{len(review_dates)} dates"
+    print(f"🔄 Refreshed {REVIEWS_DAILY_TABLE} ({scope})")
@@ -0,0 +1,203 @@
+# etl_scripts/orchestrator.py
+import importlib
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from db_connection import pool_metrics
+from instrumentation import cpu_seconds, peak_rss_mb
+
+# =====================================================
+# KHAI BÁO JOB + BẢNG ĐỌC/GHI
+# =====================================================
+# Job B phụ thuộc job A khi B đọc một bảng mà A ghi (hoặc khai báo "after").
+# Hai job cùng ghi một bảng trong "writes" không chạy cùng lúc (thứ tự tuỳ job nào sẵn sàng trước).
+# "shared": bảng dùng chung mà job chỉ ghi trong transaction ngắn riêng có khoá, không trong transaction nạp
+# (dim_time: time_dim.ensure_calendar khoá, upsert ngày còn thiếu rồi commit ngay) -> chạy song song được.
+# "options": các tham số dòng lệnh mà main() của job nhận.
+# Giá trị option là dict -> theo từng job ({tên job: giá trị}), vd. input_path.
+JOBS = [
+    {
+        "name": "customers",
+        "module": "customer_etl",
+        "reads": [],
+        "writes": ["dw.dim_customer"],
+        "options": ["incremental", "staging", "from_staging"],
+    },
+    {
+        "name": "orders",
+        "module": "etl_transaction",
+        "reads": [],
+        "writes": ["dw.dim_restaurant", "dw.dim_customer_orders", "dw.fact_orders", "dw.fact_order_items"],
+        "shared": ["dw.dim_time"],
+        "options": ["incremental", "chunk_rows", "staging", "from_staging", "swap_partitions",
+                    "input_path", "read_workers", "csv_engine", "pipeline_depth", "transform_workers"],
+    },
+    {
+        "name": "events",
+        "module": "etl_event_script",
+        "reads": [],
+        "writes": ["dw.dim_user", "dw.fact_app_events"],
+        "shared": ["dw.dim_time"],
+        "options": ["incremental", "chunk_rows", "staging", "from_staging", "swap_partitions",
+                    "input_path", "read_workers", "csv_engine", "pipeline_depth", "transform_workers"],
+    },
+    {
+        "name": "reviews",
+        "module": "etl_reviews",
+        "reads": [],
+        "writes": ["dw.dim_reviewer", "dw.fact_reviews"],
+        "options": ["incremental", "sentiment_workers", "staging", "from_staging"],
+    },
+]
+
+JOB_NAMES = [job["name"] for job in JOBS]
+
+
+def job_dependencies(jobs):
+    deps = {}
+    for job in jobs:
+        reads = set(job["reads"])
+        deps[job["name"]] = {
+            other["name"] for other in jobs
+            if other is not job and (reads & (set(other["writes"]) | set(other.get("shared", [])))
+                                     or other["name"] in job.get("after", []))
+        }
+    return deps
+
+
+def job_conflicts(jobs):
+    # ghi trùng bảng (ngoài "shared") -> không chạy song song, nhưng không ép thứ tự như dependency
+    conflicts = {}
+    for job in jobs:
+        writes = set(job["writes"])
+        conflicts[job["name"]] = {other["name"] for other in jobs if other is not job and writes & set(other["writes"])}
+    return conflicts
+
+
+# =====================================================
+# CHẠY MỘT JOB TRONG PROCESS CON
+# =====================================================
+def _run_job(module_name, kwargs):
+    # mỗi process import module riêng -> engine/connection riêng, không dùng chung qua fork
+    start, cpu_start = time.perf_counter(), cpu_seconds()
+    try:
+        stages = importlib.import_module(module_name).main(**kwargs) or {}
+        result = {"status": "ok", "seconds": time.perf_counter() - start, "stages": stages}
+    except Exception as e:
+        result = {
+            "status": "failed",
+            "seconds": time.perf_counter() - start,
+            "stages": {},
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+        }
+    result["cpu_seconds"] = cpu_seconds() - cpu_start
+    # đỉnh RSS của process worker (worker được dùng lại -> có thể gồm job chạy trước trên cùng process)
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["pool"] = pool_metrics()
+    return result
+
+
+def run_jobs(selected=None, max_workers=None, options=None):
+    options = options or {}
+    jobs = [job for job in JOBS if selected is None or job["name"] in selected]
+    deps = job_dependencies(jobs)
+    conflicts = job_conflicts(jobs)
+    results = {}
+    pending = {job["name"]: job for job in jobs}
+    running = {}
+    started = {}
+
+    workers = max_workers or len(jobs) or 1
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            # job có dependency lỗi -> bỏ qua, không chạy
+            for name in list(pending):
+                failed = [d for d in deps[name] if d in results and results[d]["status"] != "ok"]
+                if failed:
+                    results[name] = {"status": "skipped", "seconds": 0.0, "stages": {},
+                                     "error": f"dependency failed: {', '.join(sorted(failed))}"}
+                    del pending[name]
+
+            for name in list(pending):
+                ready = all(results.get(d, {}).get("status") == "ok" for d in deps[name])
+                # job ghi trùng bảng đang chạy -> đợi nó xong
+                if ready and not conflicts[name] & set(running.values()):
+                    job = pending.pop(name)
+                    kwargs = {k: v.get(name) if isinstance(v, dict) else v
+                              for k, v in options.items() if k in job["options"]}
+                    kwargs = {k: v for k, v in kwargs.items() if v is not None}
+                    print(f"▶️  Submitting job {name} ({job['module']})")
+                    try:
+                        future = pool.submit(_run_job, job["module"], kwargs)
+                    except BrokenProcessPool:
+                        # process con của job trước chết hẳn -> pool cũ không dùng được nữa, tạo pool mới
+                        pool.shutdown(wait=False)
+                        pool = ProcessPoolExecutor(max_workers=workers)
+                        future = pool.submit(_run_job, job["module"], kwargs)
+                    running[future] = name
+                    started[name] = time.perf_counter()
+
+            if not running:
+                # còn job chờ nhưng không job nào chạy được -> phụ thuộc vòng
+                for name in list(pending):
+                    results[name] = {"status": "skipped", "seconds": 0.0, "stages": {},
+                                     "error": "dependency cycle"}
+                    del pending[name]
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except BrokenProcessPool as e:
+                    # process con bị kill (OOM, segfault...): _run_job không kịp trả kết quả -> job lỗi,
+                    # job phụ thuộc bị bỏ qua ở vòng sau
+                    results[name] = {
+                        "status": "failed",
+                        "seconds": time.perf_counter() - started[name],
+                        "stages": {},
+                        "error": f"{type(e).__name__}: {e}",
+                        "traceback": traceback.format_exc(),
+                    }
+                status = results[name]["status"]
+                icon = "✅" if status == "ok" else "❌"
+                print(f"{icon} Job {name} {status} in {results[name]['seconds']:.2f}s")
+                if status != "ok":
+                    print(results[name]["traceback"])
+    finally:
+        pool.shutdown()
+
+    return results
+
+
+def print_report(results):
+    stage_names = ["extract", "transform", "staging", "load", "refresh"]
+    print("\n📊 ETL run report")
+    print(f"{'job':<12}{'status':<10}{'total':>9}" + "".join(f"{s:>11}" for s in stage_names))
+    for name, result in results.items():
+        stages = result["stages"]
+        cells = "".join(f"{stages[s]['wall']:>10.2f}s" if s in stages else f"{'-':>11}" for s in stage_names)
+        print(f"{name:<12}{result['status']:<10}{result['seconds']:>8.2f}s{cells}")
+        if result["status"] != "ok":
+            print(f"    ↳ {result['error']}")
+
+    print("\n⏱️  Stage metrics")
+    print(f"{'job':<12}{'stage':<22}{'wall':>9}{'cpu':>9}{'rss MB':>9}{'rows in':>10}{'rows out':>10}"
+          f"{'MB read':>9}{'MB written':>11}")
+    for name, result in results.items():
+        for stage, stats in result["stages"].items():
+            rss = f"{stats['peak_rss_mb']:>9.0f}" if stats["peak_rss_mb"] is not None else f"{'-':>9}"
+            print(f"{name:<12}{stage:<22}{stats['wall']:>8.2f}s{stats['cpu']:>8.2f}s{rss}"
+                  f"{stats['rows_in']:>10}{stats['rows_out']:>10}"
+                  f"{stats['bytes_read'] / 2**20:>9.1f}{stats['bytes_written'] / 2**20:>11.1f}")
+
+    print("\n🔌 Connection pool")
+    print(f"{'job':<12}{'engine':>8}{'copy':>6}{'peak':>6}{'wait':>10}{'max wait':>10}{'timeouts':>10}")
+    for name, result in results.items():
+        pool = result.get("pool")
+        if pool:
+            print(f"{name:<12}{pool['engine_checkouts']:>8}{pool['pg_checkouts']:>6}{pool['pg_peak_in_use']:>6}"
+                  f"{pool['pg_wait_seconds']:>9.3f}s{pool['pg_max_wait_seconds']:>9.3f}s{pool['pg_timeouts']:>10}")
@@ -0,0 +1,248 @@
+# etl_scripts/partitions.py
+import re
+import pandas as pd
+from bulk_loader import copy_dataframe
+from db_connection import pooled_connection
+
+SCHEMA_NAME = "dw"
+
+# fact phân vùng RANGE theo tháng: cột khoá + kiểu khoá (timestamp hoặc time_key YYYYMMDDHHMM)
+# default=True: có partition DEFAULT cho dòng khoá NULL nạp từ trước (nay timestamp hỏng bị loại ở bước validate)
+PARTITIONED_FACTS = {
+    "fact_orders": {"column": "order_placed_at", "kind": "timestamp", "default": False},
+    "fact_app_events": {"column": "time_key", "kind": "time_key", "default": True},
+}
+
+SWAP_SUFFIX = "_swap"
+
+# (bảng, tháng) đã chắc chắn có partition trong process này -> không hỏi lại catalog mỗi chunk
+_known = set()
+
+
+# =====================================================
+# THÁNG <-> PARTITION
+# =====================================================
+def month_keys(table_name, values):
+    # Series khoá phân vùng -> Series Int64 YYYYMM (NULL -> <NA>)
+    values = pd.Series(values)
+    if PARTITIONED_FACTS[table_name]["kind"] == "time_key":
+        return values.astype("Int64") // 1_000_000
+    ts = pd.to_datetime(values)
+    return (ts.dt.year * 100 + ts.dt.month).astype("Int64")
+
+
+def _month(yyyymm):
+    return pd.Period(year=int(yyyymm) // 100, month=int(yyyymm) % 100, freq="M")
+
+
+def months_of(table_name, values):
+    return [_month(m) for m in sorted(month_keys(table_name, values).dropna().unique())]
+
+
+def partition_name(table_name, month):
+    return f"{table_name}_p{month.year:04d}_{month.month:02d}"
+
+
+def _bounds(table_name, month):
+    # [đầu tháng, đầu tháng sau) theo kiểu của cột khoá
+    def bound(m):
+        if PARTITIONED_FACTS[table_name]["kind"] == "time_key":
+            return str(m.year * 100_000_000 + m.month * 1_000_000)
+        return f"'{m.start_time:%Y-%m-%d}'"
+    return bound(month), bound(month + 1)
+
+
+def month_dates(months):
+    # mọi ngày của các tháng (vd. để làm mới mart sau khi thay trọn tháng)
+    return {d.date() for m in months for d in pd.date_range(m.start_time, m.end_time.normalize(), freq="D")}
+
+
+def _create_partitions(cur, table_name, months):
+    created = 0
+    parent = f"{SCHEMA_NAME}.{table_name}"
+    for month in months:
+        name = partition_name(table_name, month)
+        cur.execute("SELECT to_regclass(%s)", (f"{SCHEMA_NAME}.{name}",))
+        if cur.fetchone()[0] is not None:
+            continue
+        lo, hi = _bounds(table_name, month)
+        # CREATE + ATTACH thay vì CREATE ... PARTITION OF: ATTACH chỉ cần SHARE UPDATE EXCLUSIVE trên bảng cha,
+        # không phải chờ transaction đang COPY / upsert vào fact (index, FK được tạo theo bảng cha khi attach)
+        cur.execute(f"CREATE TABLE {SCHEMA_NAME}.{name} (LIKE {parent} INCLUDING DEFAULTS)")
+        cur.execute(f"ALTER TABLE {parent} ATTACH PARTITION {SCHEMA_NAME}.{name} FOR VALUES FROM ({lo}) TO ({hi})")
+        created += 1
+        print(f"🗂️  Created partition {SCHEMA_NAME}.{name}")
+    return created
+
+
+def ensure_partitions(table_name, values):
+    # tạo partition cho các tháng mới gặp trong `values` (cột khoá phân vùng), trong transaction ngắn riêng.
+    # Gọi trước khi batch ghi gì trên kết nối nạp: attach sao chép FK sang partition mới nên cần khoá
+    # SHARE ROW EXCLUSIVE trên dim_time + các dim được tham chiếu, transaction nạp chỉ được giữ khoá đọc FK trên đó
+    months = [m for m in months_of(table_name, values) if (table_name, m) not in _known]
+    if not months:
+        return 0
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            created = _create_partitions(cur, table_name, months)
+        conn.commit()
+    _known.update((table_name, m) for m in months)
+    return created
+
+
+# =====================================================
+# TẠO BẢNG PHÂN VÙNG (+ CHUYỂN BẢNG CŨ)
+# =====================================================
+def ensure_partitioned(conn, table_name, ddl):
+    # ddl: CREATE TABLE IF NOT EXISTS ... PARTITION BY RANGE (...) + index của bảng fact.
+    # Bảng cũ là heap thường -> đổi tên, tạo bảng phân vùng, chép dữ liệu sang theo tháng rồi xoá bảng cũ.
+    spec = PARTITIONED_FACTS[table_name]
+    legacy = f"{table_name}_legacy"
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relname = %s
+        """, (SCHEMA_NAME, table_name))
+        row = cur.fetchone()
+        converting = row is not None and row[0] == "r"
+        if converting:
+            # index của bảng cũ đổi tên theo -> bảng mới tạo được index cùng tên
+            cur.execute("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass",
+                        (f"{SCHEMA_NAME}.{table_name}",))
+            for (index_name,) in cur.fetchall():
+                short_name = index_name.split(".")[-1]
+                cur.execute(f"ALTER INDEX {SCHEMA_NAME}.{short_name} RENAME TO {short_name}_legacy")
+            cur.execute(f"ALTER TABLE {SCHEMA_NAME}.{table_name} RENAME TO {legacy}")
+
+        cur.execute(ddl)
+        if spec["default"]:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.{table_name}_default "
+                        f"PARTITION OF {SCHEMA_NAME}.{table_name} DEFAULT")
+
+        if converting:
+            column = spec["column"]
+            expr = f"{column} / 1000000" if spec["kind"] == "time_key" else f"to_char({column}, 'YYYYMM')::int"
+            cur.execute(f"SELECT DISTINCT {expr} FROM {SCHEMA_NAME}.{legacy} WHERE {column} IS NOT NULL")
+            months = sorted(_month(m) for (m,) in cur.fetchall())
+            _create_partitions(cur, table_name, months)
+
+            # chỉ chép các cột có ở cả hai bảng (bảng cũ có thể thiếu cột mới)
+            cur.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = %s AND table_name = %s
+                  AND column_name IN (SELECT column_name FROM information_schema.columns
+                                      WHERE table_schema = %s AND table_name = %s)
+                ORDER BY ordinal_position
+            """, (SCHEMA_NAME, table_name, SCHEMA_NAME, legacy))
+            columns = ", ".join(f'"{c}"' for (c,) in cur.fetchall())
+            cur.execute(f"INSERT INTO {SCHEMA_NAME}.{table_name} ({columns}) "
+                        f"SELECT {columns} FROM {SCHEMA_NAME}.{legacy}")
+            rows = cur.rowcount
+            cur.execute(f"DROP TABLE {SCHEMA_NAME}.{legacy} CASCADE")
+            print(f"🗂️  Converted {SCHEMA_NAME}.{table_name} to monthly partitions "
+                  f"({len(months)} months, {rows} rows); re-run sqlfile/views.sql for views on it")
+    return converting
+
+
+# =====================================================
+# NẠP LẠI TRỌN THÁNG BẰNG PARTITION SWAP
+# =====================================================
+class PartitionSwap:
+    # COPY từng tháng vào bảng staging tách rời -> dựng index/khoá -> DETACH partition cũ + ATTACH bảng mới.
+    # Các tháng không có trong dữ liệu nạp không bị đụng tới; mỗi tháng thay trong một transaction ngắn.
+    def __init__(self, conn, table_name):
+        self.conn = conn
+        self.table_name = table_name
+        self.column = PARTITIONED_FACTS[table_name]["column"]
+        self.staged = {}
+        self.skipped = 0
+
+    def _stage_name(self, month):
+        return partition_name(self.table_name, month) + SWAP_SUFFIX
+
+    def write(self, df):
+        months = month_keys(self.table_name, df[self.column])
+        # dòng không có khoá không thuộc tháng nào -> không thay được theo tháng
+        self.skipped += int(months.isna().sum())
+        for yyyymm, part in df.groupby(months, sort=True):
+            month = _month(yyyymm)
+            if month not in self.staged:
+                self._create_stage(month)
+                self.staged[month] = 0
+            copy_dataframe(part, self._stage_name(month), schema=SCHEMA_NAME, conn=self.conn)
+            self.staged[month] += len(part)
+
+    def _create_stage(self, month):
+        stage = self._stage_name(month)
+        lo, hi = _bounds(self.table_name, month)
+        with self.conn.cursor() as cur:
+            # lần chạy trước dừng giữa chừng có thể còn bảng staging cũ
+            cur.execute(f"DROP TABLE IF EXISTS {SCHEMA_NAME}.{stage}")
+            cur.execute(f"CREATE TABLE {SCHEMA_NAME}.{stage} (LIKE {SCHEMA_NAME}.{self.table_name} INCLUDING DEFAULTS)")
+            # CHECK trùng biên partition -> ATTACH không phải quét lại bảng
+            cur.execute(f"ALTER TABLE {SCHEMA_NAME}.{stage} ADD CONSTRAINT {stage}_bounds "
+                        f"CHECK ({self.column} IS NOT NULL AND {self.column} >= {lo} AND {self.column} < {hi})")
+
+    def _build_indexes(self, cur, stage):
+        # PK/UNIQUE/FK + index giống bảng cha -> ATTACH nhận luôn, không dựng lại hay kiểm tra FK lần nữa
+        parent = f"{SCHEMA_NAME}.{self.table_name}"
+        cur.execute("""
+            SELECT contype, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')
+            ORDER BY contype DESC, conname
+        """, (parent,))
+        for i, (contype, definition) in enumerate(cur.fetchall()):
+            name = f"{stage}_pkey" if contype == "p" else f"{stage}_{contype}{i}"
+            cur.execute(f"ALTER TABLE {SCHEMA_NAME}.{stage} ADD CONSTRAINT {name} {definition}")
+
+        cur.execute("""
+            SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+            WHERE i.indrelid = %s::regclass
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid)
+            ORDER BY i.indexrelid
+        """, (parent,))
+        for i, (definition,) in enumerate(cur.fetchall()):
+            unique = "UNIQUE " if definition.startswith("CREATE UNIQUE") else ""
+            method = re.search(r" USING .*$", definition).group(0)
+            cur.execute(f"CREATE {unique}INDEX {stage}_ix{i} ON {SCHEMA_NAME}.{stage}{method}")
+
+    def finish(self, before_swap=None):
+        # before_swap(cur, old_partition_or_None, stage): dọn dữ liệu phụ thuộc trước khi tháng cũ bị thay
+        if self.skipped:
+            print(f"⚠️  {self.skipped} rows without {self.column} skipped (partition swap replaces whole months)")
+        with self.conn.cursor() as cur:
+            for month in sorted(self.staged):
+                self._build_indexes(cur, self._stage_name(month))
+        self.conn.commit()
+
+        for month in sorted(self.staged):
+            self._swap(month, before_swap)
+            self.conn.commit()
+        return sorted(self.staged)
+
+    def _swap(self, month, before_swap):
+        parent = f"{SCHEMA_NAME}.{self.table_name}"
+        name = partition_name(self.table_name, month)
+        stage = self._stage_name(month)
+        lo, hi = _bounds(self.table_name, month)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (f"{SCHEMA_NAME}.{name}",))
+            exists = cur.fetchone()[0] is not None
+            if before_swap:
+                before_swap(cur, f"{SCHEMA_NAME}.{name}" if exists else None, f"{SCHEMA_NAME}.{stage}")
+            if exists:
+                cur.execute(f"ALTER TABLE {parent} DETACH PARTITION {SCHEMA_NAME}.{name}")
+                cur.execute(f"DROP TABLE {SCHEMA_NAME}.{name}")
+            cur.execute(f"ALTER TABLE {SCHEMA_NAME}.{stage} RENAME TO {name}")
+            cur.execute(f"ALTER TABLE {parent} ATTACH PARTITION {SCHEMA_NAME}.{name} FOR VALUES FROM ({lo}) TO ({hi})")
+            cur.execute(f"ALTER TABLE {SCHEMA_NAME}.{name} DROP CONSTRAINT {stage}_bounds")
+
+            # index mang tên bảng staging -> đổi theo tên partition để lần swap sau tạo lại được
+            cur.execute("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass",
+                        (f"{SCHEMA_NAME}.{name}",))
+            for (index_name,) in cur.fetchall():
+                short_name = index_name.split(".")[-1]
+                if short_name.startswith(stage):
+                    cur.execute(f"ALTER INDEX {SCHEMA_NAME}.{short_name} RENAME TO {name}{short_name[len(stage):]}")
+        _known.add((self.table_name, month))
+        print(f"🔀 Swapped in {SCHEMA_NAME}.{name} ({self.staged[month]} rows)")
@@ -0,0 +1,87 @@
+# etl_scripts/pipeline.py
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# số chunk đã đọc / đang transform được phép chờ writer; 0 = chạy tuần tự trong thread gọi như trước
+DEFAULT_PIPELINE_DEPTH = 0
+DEFAULT_TRANSFORM_WORKERS = 1
+
+_END = object()
+
+
+# =====================================================
+# READER -> TRANSFORM -> WRITER CHẠY CHỒNG NHAU
+# =====================================================
+class Pipeline:
+    # Thread reader lấy từng phần tử của `items` (đọc chunk) và giao cho pool `workers` thread chạy
+    # `transform`; thread gọi (writer, giữ connection nạp) nhận kết quả theo đúng thứ tự đọc.
+    # Queue giới hạn `depth` chunk: writer chậm -> reader/transform đứng chờ, RAM tối đa ~depth + 2 chunk.
+    # Khi writer nạp chunk N thì chunk N+1 đang transform và chunk N+2 đang đọc.
+    # transform chỉ được đụng trạng thái dùng chung có khoá (KeyMap, TimestampParser, Validator, StageTimer);
+    # trạng thái của cả lần chạy (dim gộp, staging, connection) ở lại phía writer.
+    def __init__(self, items, transform, depth=DEFAULT_PIPELINE_DEPTH, workers=DEFAULT_TRANSFORM_WORKERS):
+        self.items = items
+        self.transform = transform
+        self.depth = depth
+        self.workers = max(workers, 1)
+        self._stop = threading.Event()
+        self._queue = None
+        self._pool = None
+        self._reader = None
+
+    def __enter__(self):
+        if self.depth:
+            self._queue = queue.Queue(maxsize=self.depth)
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transform")
+            self._reader = threading.Thread(target=self._read, name="reader", daemon=True)
+            self._reader.start()
+        return self
+
+    def __iter__(self):
+        if not self.depth:
+            yield from map(self.transform, self.items)
+            return
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item.result()
+
+    def __exit__(self, *exc):
+        if not self.depth:
+            return
+        # writer dừng (xong hoặc lỗi): reader thoát ở lần put sau, chunk chưa transform bị huỷ
+        self._stop.set()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(item, BaseException) and item is not _END:
+                item.cancel()
+        self._reader.join()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _put(self, item):
+        # chờ chỗ trống (backpressure); False khi writer đã dừng
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read(self):
+        try:
+            for item in self.items:
+                if not self._put(self._pool.submit(self.transform, item)):
+                    return
+        except BaseException as e:
+            # lỗi đọc -> writer raise lại sau khi đã nạp các chunk đọc được trước đó
+            self._put(e)
+            return
+        self._put(_END)
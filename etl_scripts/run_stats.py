@@ -0,0 +1,96 @@
+# etl_scripts/run_stats.py
+import json
+import os
+from datetime import datetime
+from db_connection import pooled_connection
+
+RUN_LOG_PATH = "../logs/etl_runs.jsonl"
+RUN_STATS_TABLE = "dw.etl_run_stats"
+
+# một dòng cho mỗi (lần chạy, job, stage); stage 'total' = cả job đo từ orchestrator
+RUN_STATS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {RUN_STATS_TABLE} (
+        run_id VARCHAR(40) NOT NULL,
+        job VARCHAR(50) NOT NULL,
+        stage VARCHAR(50) NOT NULL,
+        status VARCHAR(20),
+        started_at TIMESTAMP,
+        wall_seconds DOUBLE PRECISION,
+        cpu_seconds DOUBLE PRECISION,
+        peak_rss_mb DOUBLE PRECISION,
+        rows_in BIGINT,
+        rows_out BIGINT,
+        bytes_read BIGINT,
+        bytes_written BIGINT,
+        calls INT,
+        PRIMARY KEY (run_id, job, stage)
+    );
+    CREATE INDEX IF NOT EXISTS ix_etl_run_stats_job_stage ON {RUN_STATS_TABLE}(job, stage, started_at);
+"""
+
+STAT_COLUMNS = ["wall_seconds", "cpu_seconds", "peak_rss_mb", "rows_in", "rows_out", "bytes_read", "bytes_written", "calls"]
+
+
+def new_run_id(started_at=None):
+    started_at = started_at or datetime.now()
+    return f"{started_at:%Y%m%dT%H%M%S}-{os.getpid()}"
+
+
+def stage_rows(run_id, started_at, results):
+    # results của orchestrator -> các dòng phẳng (job, stage, số đo), dùng chung cho JSONL và bảng
+    rows = []
+    for job, result in results.items():
+        base = {"run_id": run_id, "job": job, "status": result["status"], "started_at": started_at.isoformat()}
+        rows.append({**base, "stage": "total", "wall_seconds": result["seconds"],
+                     "cpu_seconds": result.get("cpu_seconds"), "peak_rss_mb": result.get("peak_rss_mb")})
+        for stage, stats in result["stages"].items():
+            rows.append({**base, "stage": stage, "wall_seconds": stats["wall"], "cpu_seconds": stats["cpu"],
+                         "peak_rss_mb": stats["peak_rss_mb"], "rows_in": stats["rows_in"],
+                         "rows_out": stats["rows_out"], "bytes_read": stats["bytes_read"],
+                         "bytes_written": stats["bytes_written"], "calls": stats["calls"]})
+    return rows
+
+
+def write_run_log(run_id, started_at, results, options=None, path=RUN_LOG_PATH):
+    # JSON lines: một record cho mỗi job, nối thêm vào file -> so sánh được giữa các lần chạy
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for job, result in results.items():
+            record = {
+                "run_id": run_id,
+                "started_at": started_at.isoformat(),
+                "job": job,
+                "status": result["status"],
+                "seconds": result["seconds"],
+                "cpu_seconds": result.get("cpu_seconds"),
+                "peak_rss_mb": result.get("peak_rss_mb"),
+                "stages": result["stages"],
+                "options": options or {},
+                "error": result.get("error"),
+            }
+            f.write(json.dumps(record, default=str) + "\n")
+    print(f"📝 Run log appended to {path} (run {run_id})")
+
+
+def save_run_stats(run_id, started_at, results):
+    rows = stage_rows(run_id, started_at, results)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(RUN_STATS_DDL)
+            columns = ["run_id", "job", "stage", "status", "started_at"] + STAT_COLUMNS
+            cur.executemany(
+                f"INSERT INTO {RUN_STATS_TABLE} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))})",
+                [[row.get(c) for c in columns] for row in rows],
+            )
+        conn.commit()
+    print(f"📝 Saved {len(rows)} stage rows to {RUN_STATS_TABLE}")
+
+
+def record_run(run_id, started_at, results, options=None):
+    # file log luôn ghi trước; DB lỗi (vd. chính lần chạy hỏng vì DB) không làm hỏng báo cáo
+    write_run_log(run_id, started_at, results, options)
+    try:
+        save_run_stats(run_id, started_at, results)
+    except Exception as e:
+        print(f"⚠️  Could not save run stats to {RUN_STATS_TABLE}: {e}")
@@ -0,0 +1,115 @@
+# etl_scripts/sentiment.py
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+import numpy as np
+import pandas as pd
+
+# Cache điểm sentiment trên đĩa, khoá = sha1(text) + phiên bản TextBlob
+CACHE_PATH = "../staging_data/sentiment_cache.sqlite"
+MODEL_VERSION = f"textblob-{version('textblob')}"
+
+# Chia text cần chấm thành batch cho process pool
+BATCH_SIZE = 2000
+# Ít text hơn ngưỡng này thì chấm luôn trong process hiện tại (tránh chi phí spawn)
+MIN_PARALLEL_TEXTS = 5000
+
+SQLITE_MAX_VARS = 900
+
+
+def get_sentiment(text_input):
+    # TextBlob (kéo theo NLTK) chỉ import khi thật sự chấm: lần chạy có đủ điểm trong cache không trả chi phí này
+    from textblob import TextBlob
+    try:
+        return TextBlob(text_input).sentiment.polarity
+    except Exception:
+        return 0
+
+
+def _score_batch(texts):
+    return [get_sentiment(t) for t in texts]
+
+
+def _text_key(text_input):
+    return hashlib.sha1(text_input.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+# --- Cache SQLite ---
+def _open_cache(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sentiment_cache (
+            text_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            polarity REAL NOT NULL,
+            PRIMARY KEY (text_hash, model)
+        )
+    """)
+    return conn
+
+
+def _cache_lookup(conn, keys):
+    found = {}
+    for start in range(0, len(keys), SQLITE_MAX_VARS):
+        batch = keys[start:start + SQLITE_MAX_VARS]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(
+            f"SELECT text_hash, polarity FROM sentiment_cache WHERE model = ? AND text_hash IN ({placeholders})",
+            [MODEL_VERSION, *batch],
+        )
+        found.update(rows)
+    return found
+
+
+def _cache_store(conn, keys, scores):
+    conn.executemany(
+        "INSERT OR REPLACE INTO sentiment_cache (text_hash, model, polarity) VALUES (?, ?, ?)",
+        [(k, MODEL_VERSION, float(s)) for k, s in zip(keys, scores)],
+    )
+    conn.commit()
+
+
+# --- Chấm sentiment cho cả Series ---
+def score_sentiments(texts, workers=None, cache_path=CACHE_PATH):
+    # 1) khử trùng lặp: mỗi Summary khác nhau chỉ chấm một lần
+    codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+    uniques = [str(u) for u in uniques]
+    scores = np.zeros(len(uniques), dtype="float64")
+    keys = [_text_key(u) for u in uniques]
+
+    # 2) lấy điểm đã có trong cache
+    conn = _open_cache(cache_path) if cache_path else None
+    try:
+        cached = _cache_lookup(conn, keys) if conn else {}
+        missing = []
+        for i, key in enumerate(keys):
+            if key in cached:
+                scores[i] = cached[key]
+            else:
+                missing.append(i)
+
+        # 3) chấm phần còn lại, song song theo batch nếu đủ lớn
+        start = time.time()
+        todo = [uniques[i] for i in missing]
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        if workers > 1 and len(todo) >= MIN_PARALLEL_TEXTS:
+            batches = [todo[i:i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                new_scores = [s for batch in pool.map(_score_batch, batches) for s in batch]
+        else:
+            new_scores = _score_batch(todo)
+        scores[missing] = new_scores
+
+        if conn and missing:
+            _cache_store(conn, [keys[i] for i in missing], new_scores)
+    finally:
+        if conn:
+            conn.close()
+
+    print(f"🧠 Sentiment: {len(texts)} texts, {len(uniques)} unique, "
+          f"{len(uniques) - len(missing)} cached, {len(missing)} scored in {time.time() - start:.2f}s")
+    return pd.Series(scores[codes], index=texts.index, name="sentiment_score")
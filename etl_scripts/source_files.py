@@ -0,0 +1,203 @@
+# etl_scripts/source_files.py
+import glob
+import hashlib
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from pandas.api.types import union_categoricals
+from db_connection import pooled_connection
+from instrumentation import record
+from watermark import file_sha256
+from job_args import DEFAULT_CSV_ENGINE, DEFAULT_READ_WORKERS
+
+SCHEMA_NAME = "dw"
+SOURCE_FILES_TABLE = f"{SCHEMA_NAME}.etl_source_files"
+
+# nguồn là một file, một thư mục (mọi file khớp SOURCE_PATTERNS) hoặc glob, vd. '../source_data/events/*.csv.gz'
+SOURCE_PATTERNS = ("*.csv", "*.csv.gz", "*.csv.zst")
+# giải nén bằng Arrow (đã là dependency cho staging) -> không cần gói zstandard
+COMPRESSION = {".gz": "gzip", ".zst": "zstd"}
+
+# file đã nạp của mỗi nguồn: --incremental bỏ qua file có cùng đường dẫn, kích thước và sha256
+SOURCE_FILES_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SOURCE_FILES_TABLE} (
+        source VARCHAR(100) NOT NULL,
+        path TEXT NOT NULL,
+        size_bytes BIGINT NOT NULL,
+        sha256 VARCHAR(64) NOT NULL,
+        ingested_at TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (source, path)
+    );
+"""
+
+
+# =====================================================
+# TÌM FILE + DẤU VÂN TAY
+# =====================================================
+def resolve_inputs(spec):
+    # file / thư mục / glob -> danh sách file theo tên (drop hằng ngày đặt tên theo ngày -> đúng thứ tự thời gian)
+    if os.path.isdir(spec):
+        paths = [p for pattern in SOURCE_PATTERNS for p in glob.glob(os.path.join(spec, pattern))]
+    else:
+        paths = glob.glob(spec)
+    if not paths:
+        raise FileNotFoundError(f"No source files match {spec}")
+    return sorted(os.path.normpath(p) for p in paths)
+
+
+def fingerprint(paths, workers=DEFAULT_READ_WORKERS):
+    # kích thước + sha256 của từng file (bytes trên đĩa: file nén băm bản nén), băm song song
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        digests = list(pool.map(file_sha256, paths))
+    return [{"path": p, "size": os.path.getsize(p), "sha256": d} for p, d in zip(paths, digests)]
+
+
+def combined_digest(files):
+    # file_hash của watermark cho cả bộ file; một file -> đúng sha256 của file đó như trước
+    if len(files) == 1:
+        return files[0]["sha256"]
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(f"{f['path']}\t{f['size']}\t{f['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+def describe(paths):
+    # cho các dòng print: một file -> đường dẫn như trước
+    if len(paths) == 1:
+        return paths[0]
+    return f"{len(paths)} files ({sum(os.path.getsize(p) for p in paths) / 2**20:.1f} MB)"
+
+
+# =====================================================
+# ĐỌC CSV (THƯỜNG / GZIP / ZSTD)
+# =====================================================
+def _open(path):
+    for ext, codec in COMPRESSION.items():
+        if path.endswith(ext):
+            return pa.input_stream(path, compression=codec)
+    return nullcontext(path)
+
+
+def _read_arrow(source, read_options):
+    # cột có dtype trong schema đọc nguyên văn dạng string (Arrow tự nhận timestamp sẽ đổi chữ,
+    # vd. '00:13:02.000000' -> '00:13:02'), rồi đổi sang category / Arrow string như engine c
+    dtypes = read_options["dtype"]
+    table = pa_csv.read_csv(source, convert_options=pa_csv.ConvertOptions(
+        include_columns=read_options["usecols"],
+        column_types={col: pa.string() for col in dtypes},
+        strings_can_be_null=True,
+    ))
+    # cột trống hoàn toàn: Arrow cho kiểu null, engine c cho float64 NaN
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table.to_pandas().astype(dtypes)
+
+
+def read_file(path, read_options, engine=DEFAULT_CSV_ENGINE):
+    # chạy được trong thread của pool -> không record() ở đây (stage đang mở là của thread gọi)
+    with _open(path) as source:
+        if engine == "pyarrow":
+            return _read_arrow(source, read_options)
+        return pd.read_csv(source, **read_options)
+
+
+def _read_chunks(path, read_options, chunk_rows):
+    with _open(path) as source, pd.read_csv(source, chunksize=chunk_rows, **read_options) as reader:
+        record(bytes_read=os.path.getsize(path))
+        yield from reader
+
+
+def _split(frame, chunk_rows):
+    if not chunk_rows or len(frame) <= chunk_rows:
+        yield frame
+        return
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows].copy()
+
+
+def iter_source_chunks(paths, read_options, chunk_rows=None, engine=DEFAULT_CSV_ENGINE, workers=DEFAULT_READ_WORKERS):
+    # DataFrame theo đúng thứ tự file.
+    # Một file + engine c: đọc tuần tự theo chunksize (RAM theo chunk, như trước).
+    # Còn lại: mỗi file đọc trọn trong thread pool, đọc trước tối đa `workers` file, cắt theo chunk_rows.
+    if engine == "c" and (len(paths) == 1 or workers <= 1):
+        for path in paths:
+            if chunk_rows:
+                yield from _read_chunks(path, read_options, chunk_rows)
+            else:
+                record(bytes_read=os.path.getsize(path))
+                yield read_file(path, read_options, engine)
+        return
+
+    remaining = iter(paths)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        pending = deque((p, pool.submit(read_file, p, read_options, engine))
+                        for p in itertools.islice(remaining, max(workers, 1)))
+        while pending:
+            path, future = pending.popleft()
+            frame = future.result()
+            record(bytes_read=os.path.getsize(path))
+            for nxt in itertools.islice(remaining, 1):
+                pending.append((nxt, pool.submit(read_file, nxt, read_options, engine)))
+            yield from _split(frame, chunk_rows)
+
+
+def concat_frames(frames):
+    # pd.concat bung cột category có danh sách khác nhau thành object -> hợp danh sách category trước
+    if len(frames) == 1:
+        return frames[0]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([f[col] for f in frames]).categories
+            frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_source(paths, read_options, engine=DEFAULT_CSV_ENGINE, workers=DEFAULT_READ_WORKERS):
+    return concat_frames(list(iter_source_chunks(paths, read_options, engine=engine, workers=workers)))
+
+
+# =====================================================
+# MANIFEST FILE ĐÃ NẠP
+# =====================================================
+def _ensure_table(cur):
+    # orders và events chạy song song cùng tạo bảng -> khoá tới hết transaction
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (SOURCE_FILES_TABLE,))
+    cur.execute(SOURCE_FILES_DDL)
+
+
+def pending_files(source, files):
+    # file chưa nạp hoặc đã đổi nội dung kể từ lần nạp trước
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            _ensure_table(cur)
+            cur.execute(f"SELECT path, size_bytes, sha256 FROM {SOURCE_FILES_TABLE} WHERE source = %s", (source,))
+            done = {path: (size, sha) for path, size, sha in cur.fetchall()}
+        conn.commit()
+    todo = [f for f in files if done.get(f["path"]) != (f["size"], f["sha256"])]
+    if len(todo) < len(files):
+        print(f"⏭️  {len(files) - len(todo)} of {len(files)} files already ingested, skipping them")
+    return todo
+
+
+def record_ingested(conn, source, files, replace=False):
+    # gọi trong cùng transaction với lần nạp: file chỉ được đánh dấu khi dữ liệu của nó đã commit.
+    # replace: nạp lại toàn bộ -> manifest chỉ còn các file của lần này
+    with conn.cursor() as cur:
+        _ensure_table(cur)
+        if replace:
+            cur.execute(f"DELETE FROM {SOURCE_FILES_TABLE} WHERE source = %s", (source,))
+        cur.executemany(f"""
+            INSERT INTO {SOURCE_FILES_TABLE} (source, path, size_bytes, sha256, ingested_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (source, path) DO UPDATE SET
+                size_bytes = EXCLUDED.size_bytes,
+                sha256 = EXCLUDED.sha256,
+                ingested_at = EXCLUDED.ingested_at
+        """, [(source, f["path"], f["size"], f["sha256"]) for f in files])
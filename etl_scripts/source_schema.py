@@ -0,0 +1,76 @@
+# etl_scripts/source_schema.py
+import numpy as np
+import pandas as pd
+
+# Kiểu cột khi đọc CSV nguồn. Mỗi job khai báo READ_SCHEMA = {cột nguồn: kiểu}; cột không có trong
+# schema không được đọc (usecols), cột khai báo NUMBER để read_csv tự suy ra int64/float64
+# (bước validate vẫn ép kiểu và đưa ô không phải số vào quarantine, xem validation.py).
+#   CATEGORY: chuỗi ít giá trị (trạng thái, thành phố, thang đo...) -> mỗi giá trị lưu một lần, dòng chỉ giữ mã
+#   STRING:   ID / chuỗi nhiều giá trị -> Arrow string, không phải một object Python cho mỗi ô
+CATEGORY = "category"
+STRING = pd.StringDtype("pyarrow")
+NUMBER = None
+
+
+def read_options(schema):
+    # -> kwargs cho pd.read_csv
+    return {
+        "usecols": list(schema),
+        "dtype": {col: dtype for col, dtype in schema.items() if dtype is not NUMBER},
+    }
+
+
+# =====================================================
+# BIẾN ĐỔI THEO CATEGORY
+# =====================================================
+def per_category(values, func):
+    # func (hàm vector trên Series chuỗi object) chạy trên danh sách category rồi trải lại theo mã
+    # từng dòng: vài chục giá trị thay vì cả triệu dòng. Cột không phải category -> func(values).
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return func(values)
+    # NaN (mã -1) là phần tử cuối của lookup -> lấy theo mã -1 ra đúng kết quả của NaN
+    lookup = func(pd.Series(list(values.cat.categories) + [np.nan], dtype=object))
+    codes = values.cat.codes.to_numpy()
+    if lookup.dtype != object:
+        return pd.Series(lookup.to_numpy()[codes], index=values.index, name=values.name)
+    # kết quả vẫn là chuỗi -> giữ dạng category (func có thể gộp nhiều category làm một, hoặc trả None);
+    # category xếp theo chuỗi để sort_values trên cột cho cùng thứ tự như cột object
+    new_codes, uniques = pd.factorize(lookup, sort=True)
+    return pd.Series(pd.Categorical.from_codes(new_codes[codes], uniques),
+                     index=values.index, name=values.name)
+
+
+def as_text(values):
+    # như .astype(str) của cột object (NaN -> 'nan') nhưng không bung category / Arrow string ra object
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        if not values.isna().any():
+            return values
+        if "nan" not in values.cat.categories:
+            values = values.cat.add_categories("nan")
+        return values.fillna("nan")
+    if isinstance(values.dtype, pd.StringDtype):
+        return values.fillna("nan")
+    return values.astype(str)
+
+
+# =====================================================
+# BÁO CÁO BỘ NHỚ
+# =====================================================
+def memory_mb(df):
+    # deep=True: tính cả chuỗi Python trong cột object (Arrow string / category tính theo buffer thật)
+    return df.memory_usage(deep=True, index=False).sum() / 2**20
+
+
+def memory_report(label, before, after):
+    # so sánh từng cột của cùng dữ liệu đọc theo hai cách (vd. object mặc định vs READ_SCHEMA)
+    print(f"🧮 {label}: {memory_mb(before):.1f} MB -> {memory_mb(after):.1f} MB")
+    before_cols = before.memory_usage(deep=True, index=False)
+    after_cols = after.memory_usage(deep=True, index=False)
+    for col in before.columns:
+        old = before_cols[col] / 2**20
+        if col not in after_cols:
+            print(f"   {col[:44]:<44} {str(before[col].dtype):>16} {old:>9.2f} MB -> (not read)")
+            continue
+        new = after_cols[col] / 2**20
+        print(f"   {col[:44]:<44} {str(before[col].dtype):>16} {old:>9.2f} MB -> "
+              f"{str(after[col].dtype):<16} {new:>9.2f} MB")
@@ -0,0 +1,133 @@
+# etl_scripts/staging.py
+import glob
+import json
+import os
+import shutil
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from instrumentation import record
+from job_args import STAGING_MODES, DEFAULT_STAGING_MODE
+
+STAGING_DIR = "../staging_data"
+
+# chế độ staging (full / preview / off) khai báo ở job_args.py cùng các lựa chọn dòng lệnh khác
+PREVIEW_ROWS = 1000
+
+COMPRESSION = "zstd"
+MANIFEST_FILE = "_manifest.json"
+
+# cột phụ khi ghi Parquet: thứ tự dòng gốc + partition theo ngày/tháng
+ROW_COLUMN = "_stage_row"
+PARTITION_FORMATS = {"day": ("stage_date", "%Y-%m-%d"), "month": ("stage_month", "%Y-%m")}
+
+
+def _partition_values(values, freq):
+    # cột epoch (vd. reviews.time) tính theo giây, còn lại parse như timestamp
+    if pd.api.types.is_numeric_dtype(values):
+        ts = pd.to_datetime(values, unit="s", errors="coerce")
+    else:
+        ts = pd.to_datetime(values, errors="coerce")
+    return ts.dt.strftime(PARTITION_FORMATS[freq][1]).fillna("unknown")
+
+
+# --- Ghi staging cho một job (mỗi lần write() là một part, theo thứ tự chunk) ---
+class StagingWriter:
+    def __init__(self, job_name, mode=DEFAULT_STAGING_MODE, staging_dir=STAGING_DIR):
+        if mode not in STAGING_MODES:
+            raise ValueError(f"Unknown staging mode {mode!r}, expected one of {STAGING_MODES}")
+        self.job_name = job_name
+        self.mode = mode
+        self.staging_dir = staging_dir
+        self.job_dir = os.path.join(staging_dir, job_name)
+        self.tables = {}
+
+        if mode == "full":
+            # staging cũ không còn khớp với lần chạy này
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+            os.makedirs(self.job_dir)
+        elif mode == "preview":
+            os.makedirs(staging_dir, exist_ok=True)
+
+    def write(self, table_name, df, partition_by=None, freq="day"):
+        info = self.tables.setdefault(table_name, {"parts": [], "partition_by": partition_by, "freq": freq})
+        part = len(info["parts"])
+        offset = sum(info["parts"])
+        info["parts"].append(len(df))
+
+        if self.mode == "preview":
+            if offset < PREVIEW_ROWS:
+                path = os.path.join(self.staging_dir, f"{table_name}_preview.csv")
+                preview = df.head(PREVIEW_ROWS - offset)
+                size = os.path.getsize(path) if part else 0
+                preview.to_csv(path, mode="w" if part == 0 else "a", header=part == 0, index=False)
+                record(rows_out=len(preview), bytes_written=os.path.getsize(path) - size)
+        elif self.mode == "full":
+            self._write_parquet(table_name, df, part, offset, partition_by, freq)
+            record(rows_out=len(df))
+
+    def _write_parquet(self, table_name, df, part, offset, partition_by, freq):
+        table_dir = os.path.join(self.job_dir, table_name)
+        frame = df.reset_index(drop=True)
+        frame[ROW_COLUMN] = range(offset, offset + len(frame))
+        file_name = f"part-{part:05d}.parquet"
+
+        if partition_by is None or frame.empty:
+            os.makedirs(table_dir, exist_ok=True)
+            path = os.path.join(table_dir, file_name)
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path, compression=COMPRESSION)
+            record(bytes_written=os.path.getsize(path))
+            return
+
+        # fact: thư mục kiểu Hive stage_date=YYYY-MM-DD/ (đọc được bằng pyarrow.dataset, Spark, DuckDB...)
+        key, _ = PARTITION_FORMATS[freq]
+        for value, group in frame.groupby(_partition_values(frame[partition_by], freq), sort=True):
+            part_dir = os.path.join(table_dir, f"{key}={value}")
+            os.makedirs(part_dir, exist_ok=True)
+            path = os.path.join(part_dir, file_name)
+            pq.write_table(pa.Table.from_pandas(group, preserve_index=False), path, compression=COMPRESSION)
+            record(bytes_written=os.path.getsize(path))
+
+    def finish(self, **meta):
+        # manifest chỉ được ghi khi mọi bảng đã staging xong -> --from-staging mới dùng được
+        if self.mode == "full":
+            manifest = {
+                "job": self.job_name,
+                "written_at": datetime.now().isoformat(timespec="seconds"),
+                "tables": self.tables,
+                **meta,
+            }
+            with open(os.path.join(self.job_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, default=str)
+            total = sum(sum(t["parts"]) for t in self.tables.values())
+            print(f"💾 Staged {total} rows ({len(self.tables)} tables, Parquet/{COMPRESSION}) to {self.job_dir}/")
+        elif self.mode == "preview":
+            print(f"💾 Exported preview samples ({PREVIEW_ROWS} rows/table) to {self.staging_dir}/")
+
+
+# --- Đọc lại staging ---
+def read_manifest(job_name, staging_dir=STAGING_DIR):
+    path = os.path.join(staging_dir, job_name, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No complete staging for {job_name} ({path}); run the job with --staging full first")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_staged_part(job_name, table_name, part, staging_dir=STAGING_DIR):
+    table_dir = os.path.join(staging_dir, job_name, table_name)
+    file_name = f"part-{part:05d}.parquet"
+    files = sorted(glob.glob(os.path.join(table_dir, file_name)) + glob.glob(os.path.join(table_dir, "*", file_name)))
+    frame = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
+    record(rows_out=len(frame), bytes_read=sum(os.path.getsize(f) for f in files))
+    return frame.sort_values(ROW_COLUMN).drop(columns=[ROW_COLUMN]).reset_index(drop=True)
+
+
+def iter_staged_parts(job_name, manifest, staging_dir=STAGING_DIR):
+    # mỗi phần tử: {table_name: DataFrame} của cùng một chunk, theo đúng thứ tự đã ghi
+    tables = manifest["tables"]
+    n_parts = max((len(t["parts"]) for t in tables.values()), default=0)
+    for part in range(n_parts):
+        yield {name: read_staged_part(job_name, name, part, staging_dir)
+               for name, info in tables.items() if part < len(info["parts"])}
@@ -0,0 +1,153 @@
+# etl_scripts/time_dim.py
+import threading
+import numpy as np
+import pandas as pd
+from db_connection import pooled_connection
+from bulk_loader import upsert_dataframe
+
+SCHEMA_NAME = "dw"
+
+# time_key = YYYYMMDDHHMM: ổn định giữa các lần chạy, tính thẳng từ timestamp không cần lookup
+MINUTES_PER_DAY = 24 * 60
+# chặn timestamp hỏng (vd. năm 1900) làm lịch phình ra hàng triệu dòng
+MAX_CALENDAR_DAYS = 366 * 30
+
+WEEKDAY_NAMES = np.array(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], dtype=object)
+# 1440 nhãn HH:MM dùng chung cho mọi ngày
+MINUTE_LABELS = np.array([f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)], dtype=object)
+
+DIM_TIME_COLUMNS = ['time_key', 'minute_start', 'date', 'time', 'hour', 'minute',
+                    'day', 'month', 'year', 'quarter', 'weekday', 'is_weekend']
+
+DIM_TIME_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.dim_time (
+        time_key BIGINT PRIMARY KEY,
+        minute_start TIMESTAMP NOT NULL,
+        date DATE NOT NULL,
+        time TIME NOT NULL,
+        hour INT, minute INT, day INT, month INT, year INT, quarter INT,
+        weekday VARCHAR(20),
+        is_weekend BOOLEAN
+    );
+    CREATE INDEX IF NOT EXISTS ix_dim_time_date ON {SCHEMA_NAME}.dim_time(date);
+"""
+
+# khoảng ngày đã có trong dim_time (cache trong process, tránh query lại mỗi chunk)
+_covered = None
+
+
+# =====================================================
+# PARSE TIMESTAMP CÓ CACHE
+# =====================================================
+class TimestampParser:
+    # mỗi chuỗi timestamp khác nhau chỉ parse một lần, kể cả qua nhiều chunk
+    def __init__(self, format=None, max_entries=1_000_000):
+        self.format = format
+        self.max_entries = max_entries
+        self.cache = {}
+        # chế độ pipeline: thread transform và writer dùng chung một parser
+        self._lock = threading.Lock()
+
+    def __call__(self, values):
+        codes, uniques = pd.factorize(values)
+        with self._lock:
+            todo = [u for u in uniques if u not in self.cache]
+            if todo:
+                if len(self.cache) + len(todo) > self.max_entries:
+                    self.cache.clear()
+                    todo = list(uniques)
+                parsed = pd.to_datetime(pd.Series(todo, dtype=object), format=self.format, errors='coerce')
+                self.cache.update(zip(todo, parsed))
+            lookup = pd.DatetimeIndex([self.cache[u] for u in uniques]) if len(uniques) else pd.DatetimeIndex([])
+        # code -1 = NaN ở input -> NaT
+        result = lookup.take(codes, allow_fill=True, fill_value=pd.NaT)
+        return pd.Series(result, index=values.index, name=values.name)
+
+
+def time_keys(ts):
+    # Series datetime -> Int64 YYYYMMDDHHMM (NaT -> <NA>); .dt.year là int32, phải nới ra trước khi nhân
+    year, month, day, hour, minute = (part.astype('Int64') for part in
+                                      (ts.dt.year, ts.dt.month, ts.dt.day, ts.dt.hour, ts.dt.minute))
+    return year * 100_000_000 + month * 1_000_000 + day * 10_000 + hour * 100 + minute
+
+
+# =====================================================
+# LỊCH THEO PHÚT
+# =====================================================
+def build_calendar(start_date, end_date):
+    # mọi phút từ 00:00 của start_date tới 23:59 của end_date, tính theo mảng (không tạo object từng dòng)
+    days = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq='D')
+    minutes = pd.date_range(days[0], periods=len(days) * MINUTES_PER_DAY, freq='min') if len(days) else pd.DatetimeIndex([])
+    dayofweek = np.repeat(days.dayofweek.to_numpy(), MINUTES_PER_DAY)
+    minute_of_day = np.tile(np.arange(MINUTES_PER_DAY), len(days))
+
+    return pd.DataFrame({
+        'time_key': time_keys(pd.Series(minutes)).to_numpy(),
+        'minute_start': minutes,
+        'date': np.repeat(days.strftime('%Y-%m-%d').to_numpy(dtype=object), MINUTES_PER_DAY),
+        'time': np.tile(MINUTE_LABELS, len(days)),
+        'hour': minute_of_day // 60,
+        'minute': minute_of_day % 60,
+        'day': np.repeat(days.day.to_numpy(), MINUTES_PER_DAY),
+        'month': np.repeat(days.month.to_numpy(), MINUTES_PER_DAY),
+        'year': np.repeat(days.year.to_numpy(), MINUTES_PER_DAY),
+        'quarter': np.repeat(days.quarter.to_numpy(), MINUTES_PER_DAY),
+        'weekday': WEEKDAY_NAMES[dayofweek],
+        'is_weekend': dayofweek >= 5,
+    }, columns=DIM_TIME_COLUMNS)
+
+
+def ensure_dim_time(conn):
+    # orders và events chạy song song cùng tạo / mở rộng dim_time -> khoá tới hết transaction
+    # (transaction ngắn: ensure_tables hoặc ensure_calendar, không bao giờ là transaction nạp fact)
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('dw.dim_time'))")
+        cur.execute(f"""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = 'dim_time' AND column_name = 'order_placed_at'
+        """, (SCHEMA_NAME,))
+        if cur.fetchone():
+            # dim_time kiểu cũ (mỗi timestamp một dòng, SERIAL) -> thay bằng lịch theo phút
+            cur.execute(f"DROP TABLE {SCHEMA_NAME}.dim_time CASCADE")
+            print("🧹 Dropped legacy dim_time (one row per timestamp)")
+        cur.execute(DIM_TIME_DDL)
+
+
+def ensure_calendar(timestamps):
+    # mở rộng dim_time để phủ mọi ngày trong `timestamps`; chỉ thêm ngày còn thiếu, không bao giờ xoá.
+    # Luôn trong transaction ngắn của riêng nó (khoá, upsert, commit), gọi trước khi batch ghi fact:
+    # transaction nạp fact chỉ giữ khoá đọc của FK trên dim_time, job song song không phải chờ nó commit
+    global _covered
+    ts = pd.Series(timestamps).dropna()
+    if ts.empty:
+        return 0
+    start, end = ts.min().normalize(), ts.max().normalize()
+    if _covered and _covered[0] <= start and end <= _covered[1]:
+        return 0
+
+    inserted = 0
+    with pooled_connection() as conn:
+        ensure_dim_time(conn)
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT min(date), max(date) FROM {SCHEMA_NAME}.dim_time")
+            lo, hi = cur.fetchone()
+
+        # giữ lịch liên tục: chỉ nối thêm về hai phía của khoảng đã có
+        if lo is None:
+            ranges = [(start, end)]
+        else:
+            lo, hi = pd.Timestamp(lo), pd.Timestamp(hi)
+            ranges = [(s, e) for s, e in [(start, lo - pd.Timedelta(days=1)), (hi + pd.Timedelta(days=1), end)] if s <= e]
+            start, end = min(start, lo), max(end, hi)
+        if (end - start).days + 1 > MAX_CALENDAR_DAYS:
+            raise ValueError(f"dim_time range {start.date()}..{end.date()} exceeds {MAX_CALENDAR_DAYS} days; check for bad timestamps")
+
+        for s, e in ranges:
+            calendar = build_calendar(s, e)
+            inserted += upsert_dataframe(calendar, 'dim_time', ['time_key'], schema=SCHEMA_NAME, conn=conn)
+        conn.commit()
+
+    _covered = (start, end)
+    if inserted:
+        print(f"📅 dim_time now covers {start.date()}..{end.date()} (+{inserted} minutes)")
+    return inserted
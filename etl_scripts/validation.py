@@ -0,0 +1,197 @@
+# etl_scripts/validation.py
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from db_connection import pooled_connection
+from bulk_loader import copy_dataframe
+from instrumentation import record
+
+SCHEMA_NAME = "dw"
+QUARANTINE_TABLE = "etl_quarantine"
+QUARANTINE_DIR = "../quarantine_data"
+QUARANTINE_COLUMN = "quarantine_reason"
+
+# tỉ lệ dòng lỗi tối đa của một bảng trong một lần chạy; vượt -> dừng trước khi nạp (nguồn hỏng hàng loạt,
+# không phải vài dòng bẩn)
+DEFAULT_MAX_INVALID = 0.05
+
+# dòng bị loại của mọi lần chạy (file Parquet trong QUARANTINE_DIR chỉ giữ lần chạy gần nhất)
+QUARANTINE_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.{QUARANTINE_TABLE} (
+        source VARCHAR(100) NOT NULL,
+        table_name VARCHAR(100) NOT NULL,
+        reason TEXT NOT NULL,
+        record JSONB,
+        quarantined_at TIMESTAMP DEFAULT now(),
+        run_key VARCHAR(64)
+    );
+    ALTER TABLE {SCHEMA_NAME}.{QUARANTINE_TABLE} ADD COLUMN IF NOT EXISTS run_key VARCHAR(64);
+"""
+
+# Luật của một bảng (khoá nào cũng tuỳ chọn), kiểm tra theo thứ tự này:
+#   "types":       {cột: "int" | "number"}  ép kiểu; ô có giá trị mà không phải số (hoặc không nguyên) -> lỗi
+#   "required":    [cột]                     NULL -> lỗi
+#   "ranges":      {cột: (min, max)}         None = không chặn phía đó; NULL bỏ qua
+#   "unique":      [cột]                     khoá trùng trong batch: giữ dòng cuối, các dòng trước -> lỗi
+#   "references":  {cột: tên dim}            giá trị phải có trong cột cùng tên của frame dim truyền vào check()
+#   "max_invalid": tỉ lệ                     mặc định DEFAULT_MAX_INVALID
+
+
+class DataQualityError(ValueError):
+    pass
+
+
+def _type_check(df, rules, problems):
+    # cột read_csv đã đọc ra số -> không cần ép lại; chỉ cột object (có ô không phải số) mới qua to_numeric
+    out = {}
+    for col, kind in rules.get("types", {}).items():
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values.dtype):
+            coerced = pd.to_numeric(values, errors='coerce')
+            problems.append((f"{col}: not a number", (values.notna() & coerced.isna()).to_numpy()))
+            values = coerced
+        if kind == "int":
+            problems.append((f"{col}: not an integer", (values.notna() & (values % 1 != 0)).to_numpy()))
+        out[col] = values
+    return out
+
+
+def _int_columns(df, rules):
+    # cột "int" sau khi đã loại dòng lỗi: không còn NULL -> int64, còn NULL -> Int64 (COPY ghi '12', không '12.0')
+    casts = {}
+    for col, kind in rules.get("types", {}).items():
+        if kind == "int":
+            casts[col] = "int64" if df[col].notna().all() else "Int64"
+    return df.astype(casts) if casts else df
+
+
+def find_problems(df, rules, dims=None):
+    # -> (frame đã ép kiểu, [(lý do, mask numpy)]); mọi luật tính trên cả cột, không lặp từng dòng
+    problems = []
+    typed = _type_check(df, rules, problems)
+    frame = df.assign(**typed) if typed else df
+
+    for col in rules.get("required", []):
+        problems.append((f"{col}: missing", frame[col].isna().to_numpy()))
+    for col, (low, high) in rules.get("ranges", {}).items():
+        values = frame[col]
+        outside = pd.Series(False, index=frame.index)
+        if low is not None:
+            outside |= values < low
+        if high is not None:
+            outside |= values > high
+        problems.append((f"{col}: outside [{low}, {high}]", (values.notna() & outside).to_numpy()))
+    for col, dim_name in rules.get("references", {}).items():
+        values = frame[col]
+        known = values.isin(dims[dim_name][col])
+        problems.append((f"{col}: not in {dim_name}", (values.notna() & ~known).to_numpy()))
+
+    # khoá trùng chỉ xét giữa các dòng đã hợp lệ: dòng cuối bị loại vì lý do khác thì dòng trước được giữ
+    key = rules.get("unique")
+    if key:
+        bad = _any(problems, len(frame))
+        duplicated = np.zeros(len(frame), dtype=bool)
+        duplicated[~bad] = frame[~bad].duplicated(subset=key, keep='last').to_numpy()
+        problems.append((f"duplicate {', '.join(key)}", duplicated))
+    return frame, problems
+
+
+def _any(problems, n):
+    bad = np.zeros(n, dtype=bool)
+    for _, mask in problems:
+        bad = bad | mask
+    return bad
+
+
+def _reasons(problems, bad):
+    # lý do của các dòng lỗi, nối bằng '; ' (chỉ tính trên các dòng lỗi)
+    reasons = pd.Series("", index=range(int(bad.sum())), dtype=object)
+    for label, mask in problems:
+        hit = mask[bad]
+        if hit.any():
+            reasons[hit] = reasons[hit] + ("; " + label)
+    return reasons.str[2:].to_numpy()
+
+
+# =====================================================
+# VALIDATOR CỦA MỘT LẦN CHẠY
+# =====================================================
+class Validator:
+    # check() mỗi batch giữa transform và load: trả về dòng sạch, giữ lại dòng lỗi kèm lý do;
+    # finish() ghi quarantine ra Parquet + dw.etl_quarantine. persist=False: chỉ đếm (benchmark, không DB).
+    # run_key (khoá checkpoint của lần nạp lại toàn bộ): lần chạy tiếp tục validate lại mọi chunk, kể cả batch
+    # đã commit -> dòng của lần thử trước cùng run_key được thay, không bị ghi trùng
+    def __init__(self, job_name, quarantine_dir=QUARANTINE_DIR, persist=True, run_key=None):
+        self.job_name = job_name
+        self.run_key = run_key
+        self._written = False
+        self.job_dir = os.path.join(quarantine_dir, job_name)
+        self.persist = persist
+        self.quarantined = {}
+        self.counts = {}
+        # chế độ pipeline: nhiều thread transform cùng check()
+        self._lock = threading.Lock()
+        if persist:
+            # file của lần chạy trước không còn khớp với lần này (lịch sử nằm trong bảng)
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def check(self, table_name, df, rules, dims=None):
+        record(rows_in=len(df))
+        frame, problems = find_problems(df, rules, dims)
+        bad = _any(problems, len(frame))
+        clean = _int_columns(frame[~bad], rules)
+        record(rows_out=len(clean))
+
+        rejected = None
+        if bad.any():
+            # ghi bản gốc của dòng lỗi (trước khi ép kiểu) để xem được giá trị hỏng
+            rejected = df[bad].assign(**{QUARANTINE_COLUMN: _reasons(problems, bad)})
+            top = rejected[QUARANTINE_COLUMN].str.split("; ").explode().value_counts().head(3)
+            print(f"🧪 {table_name}: {len(rejected)} of {len(df)} rows quarantined "
+                  f"({', '.join(f'{label} x{n}' for label, n in top.items())})")
+
+        with self._lock:
+            seen, invalid = self.counts.get(table_name, (0, 0))
+            seen, invalid = seen + len(df), invalid + int(bad.sum())
+            self.counts[table_name] = (seen, invalid)
+            if rejected is not None:
+                self.quarantined.setdefault(table_name, []).append(rejected)
+
+        max_invalid = rules.get("max_invalid", DEFAULT_MAX_INVALID)
+        if invalid > max_invalid * seen:
+            self.finish()
+            raise DataQualityError(f"{table_name}: {invalid} of {seen} rows failed validation "
+                                   f"(limit {max_invalid:.0%}), see {self.job_dir}")
+        return clean
+
+    def finish(self):
+        if not self.persist or not self.quarantined:
+            return
+        frames = {name: pd.concat(parts, ignore_index=True) for name, parts in self.quarantined.items()}
+        self.quarantined = {}
+        os.makedirs(self.job_dir, exist_ok=True)
+        for name, frame in frames.items():
+            # giá trị hỏng nằm lẫn kiểu trong cột object (vd. 'abc' và 12.5) -> ghi dạng chuỗi
+            text_cols = {c: "string" for c in frame.columns if frame[c].dtype == object}
+            frame.astype(text_cols).to_parquet(os.path.join(self.job_dir, f"{name}.parquet"), index=False)
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(QUARANTINE_DDL)
+                # lần ghi đầu của lần chạy này (finish() có thể được gọi lại khi dừng vì DataQualityError)
+                if self.run_key is not None and not self._written:
+                    cur.execute(f"DELETE FROM {SCHEMA_NAME}.{QUARANTINE_TABLE} WHERE source = %s AND run_key = %s",
+                                (self.job_name, self.run_key))
+            for name, frame in frames.items():
+                rows = frame.drop(columns=[QUARANTINE_COLUMN])
+                records = rows.to_json(orient="records", lines=True, date_format="iso").splitlines()
+                copy_dataframe(pd.DataFrame({"source": self.job_name, "table_name": name,
+                                             "reason": frame[QUARANTINE_COLUMN].to_numpy(), "record": records,
+                                             "run_key": self.run_key}),
+                               QUARANTINE_TABLE, schema=SCHEMA_NAME, conn=conn)
+            conn.commit()
+        self._written = True
+        total = sum(len(f) for f in frames.values())
+        print(f"🧪 Quarantined {total} rows -> {self.job_dir}, {SCHEMA_NAME}.{QUARANTINE_TABLE}")
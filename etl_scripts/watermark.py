@@ -0,0 +1,87 @@
+# etl_scripts/watermark.py
+import hashlib
+import pandas as pd
+from db_connection import pooled_connection
+
+WATERMARK_TABLE = "dw.etl_watermark"
+# số phiên bản dữ liệu của từng nguồn: tăng trong cùng transaction với lần nạp (set_watermark) hoặc lần làm mới
+# mart -> cache phía đọc (mart_queries.py) so tổng phiên bản để biết có dữ liệu mới đã commit
+DATA_VERSION_TABLE = "dw.etl_data_version"
+
+
+# --- Bảng lưu high-water mark cho từng nguồn ---
+def ensure_watermark_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+                source VARCHAR(100) PRIMARY KEY,
+                high_water VARCHAR(100),
+                file_hash VARCHAR(64),
+                rows_loaded BIGINT,
+                updated_at TIMESTAMP DEFAULT now()
+            )
+        """)
+
+
+def get_watermark(source):
+    # trả về (high_water, file_hash) của lần nạp thành công gần nhất, (None, None) nếu chưa có
+    with pooled_connection() as conn:
+        ensure_watermark_table(conn)
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT high_water, file_hash FROM {WATERMARK_TABLE} WHERE source = %s", (source,))
+            row = cur.fetchone()
+        conn.commit()
+    return row if row else (None, None)
+
+
+def set_watermark(conn, source, high_water, file_hash, rows_loaded):
+    # gọi trong cùng transaction với lần nạp để watermark chỉ tiến khi dữ liệu đã commit
+    ensure_watermark_table(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {WATERMARK_TABLE} (source, high_water, file_hash, rows_loaded, updated_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (source) DO UPDATE SET
+                high_water = EXCLUDED.high_water,
+                file_hash = EXCLUDED.file_hash,
+                rows_loaded = EXCLUDED.rows_loaded,
+                updated_at = EXCLUDED.updated_at
+        """, (source, None if high_water is None else str(high_water), file_hash, int(rows_loaded)))
+    bump_data_version(conn, source)
+    print(f"🔖 Watermark {source} -> {high_water}")
+
+
+def bump_data_version(conn, source):
+    # mỗi nguồn một dòng: orders và events commit song song không chờ khoá của nhau
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", (DATA_VERSION_TABLE,))
+        if cur.fetchone()[0] is None:
+            # lần đầu: các job cùng tạo bảng -> khoá tới hết transaction
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (DATA_VERSION_TABLE,))
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} (
+                    source VARCHAR(100) PRIMARY KEY,
+                    version BIGINT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT now()
+                )
+            """)
+        cur.execute(f"""
+            INSERT INTO {DATA_VERSION_TABLE} (source, version, updated_at) VALUES (%s, 1, now())
+            ON CONFLICT (source) DO UPDATE SET
+                version = {DATA_VERSION_TABLE}.version + 1,
+                updated_at = EXCLUDED.updated_at
+        """, (source,))
+
+
+def latest(*values):
+    # watermark chỉ tiến: mốc lớn nhất (bỏ None), chuỗi đọc từ etl_watermark được parse như timestamp
+    stamps = [pd.Timestamp(v) for v in values if v is not None]
+    return max(stamps) if stamps else None
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
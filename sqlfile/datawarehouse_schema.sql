@@ -2,8 +2,9 @@
 -- DIMENSIONS
 -- ==============================
 
+-- khoá surrogate BIGINT cấp từ dw.etl_key_map (ổn định qua các lần chạy)
 CREATE TABLE dw.dim_customer (
-    customer_id VARCHAR(50) PRIMARY KEY,
+    customer_id BIGINT PRIMARY KEY,
     age INT,
     gender VARCHAR(10),
     marital_status VARCHAR(20),
@@ -26,49 +27,73 @@ CREATE TABLE dw.dim_customer (
     bad_experience INT,
     more_offers_discount INT,
     max_wait_time VARCHAR(50),
-    influence_of_rating VARCHAR(50)
+    influence_of_rating VARCHAR(50),
+    row_hash BIGINT   -- hash các cột thuộc tính: ETL chỉ ghi dòng có hash đổi (etl_scripts/change_capture.py)
 );
 
+-- bản hiện tại của mỗi nhà hàng (FK của fact_orders)
 CREATE TABLE dw.dim_restaurant (
     restaurant_id VARCHAR(100) PRIMARY KEY,
     restaurant_name VARCHAR(200),
     subzone VARCHAR(100),
-    city VARCHAR(100)
+    city VARCHAR(100),
+    row_hash BIGINT
 );
 
+-- SCD2: mọi phiên bản của dim_restaurant, valid_to NULL = phiên bản hiện tại
+CREATE TABLE dw.dim_restaurant_history (
+    restaurant_id VARCHAR(100) NOT NULL,
+    restaurant_name VARCHAR(200),
+    subzone VARCHAR(100),
+    city VARCHAR(100),
+    row_hash BIGINT NOT NULL,
+    valid_from TIMESTAMP NOT NULL DEFAULT now(),
+    valid_to TIMESTAMP,
+    PRIMARY KEY (restaurant_id, valid_from)
+);
+CREATE UNIQUE INDEX ux_dim_restaurant_history_current ON dw.dim_restaurant_history(restaurant_id) WHERE valid_to IS NULL;
+
 CREATE TABLE dw.dim_customer_orders (
-    customer_id VARCHAR(100) PRIMARY KEY
+    customer_id BIGINT PRIMARY KEY,
+    source_customer_id VARCHAR(100)
 );
 
+-- lịch theo phút, time_key = YYYYMMDDHHMM (ETL chỉ nối thêm ngày, không truncate)
 CREATE TABLE dw.dim_time (
-    time_key SERIAL PRIMARY KEY,
-    order_placed_at TIMESTAMP,
-    date DATE,
-    time TIME,
+    time_key BIGINT PRIMARY KEY,
+    minute_start TIMESTAMP NOT NULL,
+    date DATE NOT NULL,
+    time TIME NOT NULL,
+    hour INT,
+    minute INT,
     day INT,
     month INT,
     year INT,
-    weekday VARCHAR(20)
+    quarter INT,
+    weekday VARCHAR(20),
+    is_weekend BOOLEAN
 );
 
 CREATE TABLE dw.dim_reviewer (
-    reviewer_id VARCHAR(50) PRIMARY KEY
+    reviewer_id BIGINT PRIMARY KEY,
+    user_id VARCHAR(50)
 );
 
 CREATE TABLE dw.dim_user (
-    user_sk VARCHAR(50) PRIMARY KEY,
-    user_id VARCHAR(50)
+    user_sk BIGINT PRIMARY KEY,
+    user_id VARCHAR(50) NOT NULL
 );
 
 -- ==============================
 -- FACTS
 -- ==============================
 
+-- phân vùng theo tháng của order_placed_at; ETL tạo partition fact_orders_pYYYY_MM khi nạp
 CREATE TABLE dw.fact_orders (
-    order_id VARCHAR(100) PRIMARY KEY,
+    order_id VARCHAR(100) NOT NULL,
     restaurant_id VARCHAR(50) REFERENCES dw.dim_restaurant(restaurant_id),
-    customer_id VARCHAR(100) REFERENCES dw.dim_customer_orders(customer_id),
-    order_placed_at TIMESTAMP,
+    customer_id BIGINT REFERENCES dw.dim_customer_orders(customer_id),
+    order_placed_at TIMESTAMP NOT NULL,
     order_status VARCHAR(50),
     delivery_type VARCHAR(50),
     distance TEXT,
@@ -87,27 +112,125 @@ CREATE TABLE dw.fact_orders (
     restaurant_penalty DECIMAL(10,2),
     kpt_duration DECIMAL(10,2),
     rider_wait_time DECIMAL(10,2),
-    order_ready_marked VARCHAR(50)
+    order_ready_marked VARCHAR(50),
+    time_key BIGINT REFERENCES dw.dim_time(time_key),
+    -- parse sẵn từ distance / items_in_order lúc ETL
+    distance_km NUMERIC,
+    items_count INT,
+    PRIMARY KEY (order_id, order_placed_at)
+) PARTITION BY RANGE (order_placed_at);
+
+-- bridge: mỗi món trong đơn một dòng (không FK: fact_orders phân vùng không có khoá riêng trên order_id)
+CREATE TABLE dw.fact_order_items (
+    order_id VARCHAR(100) NOT NULL,
+    line_no INT,
+    item_name TEXT,
+    quantity INT,
+    PRIMARY KEY (order_id, line_no)
 );
 
 CREATE TABLE dw.fact_reviews (
-    reviewer_id VARCHAR(50) REFERENCES dw.dim_reviewer(reviewer_id),
+    reviewer_id BIGINT REFERENCES dw.dim_reviewer(reviewer_id),
     score INT,
     time VARCHAR(50),
     summary TEXT,
-    sentiment_score FLOAT
+    sentiment_score FLOAT,
+    review_date DATE
 );
 
+-- phân vùng theo tháng của time_key (YYYYMMDDHHMM); dòng không parse được thời gian vào DEFAULT
 CREATE TABLE dw.fact_app_events (
-    user_sk VARCHAR(50) REFERENCES dw.dim_user(user_sk),
+    user_sk BIGINT REFERENCES dw.dim_user(user_sk),
     sessionid INTEGER,
     timestamp VARCHAR(50),
+    time_key BIGINT REFERENCES dw.dim_time(time_key),
     event_name VARCHAR(100),
     productid VARCHAR(100),
     amount DECIMAL(10,2),
     outcome VARCHAR(100)
-);
+) PARTITION BY RANGE (time_key);
+CREATE TABLE dw.fact_app_events_default PARTITION OF dw.fact_app_events DEFAULT;
 
 CREATE INDEX IF NOT EXISTS ix_orders_time ON dw.fact_orders(order_placed_at);
 CREATE INDEX IF NOT EXISTS ix_orders_restaurant ON dw.fact_orders(restaurant_id);
-CREATE INDEX IF NOT EXISTS ix_orders_customer ON dw.fact_orders(customer_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS ix_orders_customer ON dw.fact_orders(customer_id);
+
+CREATE INDEX IF NOT EXISTS ix_dim_time_date ON dw.dim_time(date);
+CREATE INDEX IF NOT EXISTS ix_fact_orders_time_key ON dw.fact_orders(time_key);
+-- event nạp theo thứ tự thời gian -> BRIN; review_date phủ đủ cột cho rollup theo ngày
+CREATE INDEX IF NOT EXISTS ix_fact_app_events_time_brin ON dw.fact_app_events USING brin (time_key);
+CREATE INDEX IF NOT EXISTS ix_fact_app_events_user_sk ON dw.fact_app_events(user_sk);
+CREATE INDEX IF NOT EXISTS ix_fact_reviews_date ON dw.fact_reviews(review_date) INCLUDE (score, sentiment_score);
+
+-- ==============================
+-- ETL METADATA
+-- ==============================
+
+CREATE TABLE IF NOT EXISTS dw.etl_watermark (
+    source VARCHAR(100) PRIMARY KEY,
+    high_water VARCHAR(100),
+    file_hash VARCHAR(64),
+    rows_loaded BIGINT,
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+-- natural key -> surrogate key, mỗi entity đánh số riêng; chỉ thêm, không xoá (etl_scripts/key_map.py)
+CREATE TABLE IF NOT EXISTS dw.etl_key_map (
+    entity VARCHAR(50) NOT NULL,
+    natural_key TEXT NOT NULL,
+    sk BIGINT NOT NULL,
+    created_at TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (entity, natural_key),
+    UNIQUE (entity, sk)
+);
+-- số đo từng stage của mỗi lần chạy main_etl.py (etl_scripts/run_stats.py); stage 'total' = cả job
+CREATE TABLE IF NOT EXISTS dw.etl_run_stats (
+    run_id VARCHAR(40) NOT NULL,
+    job VARCHAR(50) NOT NULL,
+    stage VARCHAR(50) NOT NULL,
+    status VARCHAR(20),
+    started_at TIMESTAMP,
+    wall_seconds DOUBLE PRECISION,
+    cpu_seconds DOUBLE PRECISION,
+    peak_rss_mb DOUBLE PRECISION,
+    rows_in BIGINT,
+    rows_out BIGINT,
+    bytes_read BIGINT,
+    bytes_written BIGINT,
+    calls INT,
+    PRIMARY KEY (run_id, job, stage)
+);
+CREATE INDEX IF NOT EXISTS ix_etl_run_stats_job_stage ON dw.etl_run_stats(job, stage, started_at);
+-- file nguồn đã nạp của orders/events (etl_scripts/source_files.py); --incremental bỏ qua file cùng kích thước + sha256
+CREATE TABLE IF NOT EXISTS dw.etl_source_files (
+    source VARCHAR(100) NOT NULL,
+    path TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    sha256 VARCHAR(64) NOT NULL,
+    ingested_at TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (source, path)
+);
+-- dòng không qua bước validate, kèm lý do (etl_scripts/validation.py); Parquet của lần chạy gần nhất ở quarantine_data/
+CREATE TABLE IF NOT EXISTS dw.etl_quarantine (
+    source VARCHAR(100) NOT NULL,
+    table_name VARCHAR(100) NOT NULL,
+    reason TEXT NOT NULL,
+    record JSONB,
+    quarantined_at TIMESTAMP DEFAULT now(),
+    run_key VARCHAR(64)   -- lần nạp lại toàn bộ có checkpoint: chạy lại / tiếp tục thay dòng của lần đó
+);
+-- batch đã commit của lần nạp lại toàn bộ đang dở (etl_scripts/checkpoint.py); xoá khi lần chạy xong
+CREATE TABLE IF NOT EXISTS dw.etl_checkpoint (
+    source VARCHAR(100) NOT NULL,
+    run_key VARCHAR(64) NOT NULL,
+    batch_no INT NOT NULL,
+    rows_loaded BIGINT,
+    loaded_at TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (source, run_key, batch_no)
+);
+-- phiên bản dữ liệu theo nguồn, tăng khi lần nạp / làm mới mart commit (etl_scripts/watermark.py); cache của mart_queries.py so tổng này
+CREATE TABLE IF NOT EXISTS dw.etl_data_version (
+    source VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT now()
+);
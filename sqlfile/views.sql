@@ -9,12 +9,9 @@ SELECT
   (f.order_placed_at)::date AS order_date,
   f.order_status,
   f.delivery_type,
-  -- distance/items_in_order đang là TEXT, parse nhẹ ra số để vẽ biểu đồ
-  NULLIF(regexp_replace(lower(f.distance), '[^0-9\.]', '', 'g'), '')::numeric AS distance_km,
-  CASE
-    WHEN f.items_in_order IS NULL THEN 0
-    ELSE (length(f.items_in_order) - length(replace(f.items_in_order, ' x ', ''))) / 3
-  END::int AS items_count,
+  -- distance_km / items_count đã được ETL parse từ distance / items_in_order
+  f.distance_km,
+  f.items_count,
   f.bill_subtotal,
   f.packaging_charges,
   f.restaurant_discount_promo,
@@ -29,35 +26,77 @@ SELECT
 FROM dw.fact_orders f
 JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id;
 
--- 2) Doanh thu theo ngày
+-- MARTS: bảng / materialized view do ETL (etl_scripts/marts.py) làm mới sau mỗi lần nạp orders.
+-- mart_revenue_daily làm mới theo order_date khi nạp incremental, các mv_* dùng REFRESH ... CONCURRENTLY.
+-- Giữ đồng bộ với MART_DDL trong etl_scripts/marts.py.
+CREATE TABLE IF NOT EXISTS dw_mart.mart_revenue_daily (
+  order_date DATE PRIMARY KEY,
+  orders     BIGINT NOT NULL,
+  revenue    NUMERIC,
+  aov        NUMERIC
+);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS dw_mart.mv_revenue_by_area AS
+SELECT r.city, r.subzone, COUNT(*) AS orders, SUM(f.total) AS revenue
+FROM dw.fact_orders f
+JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+GROUP BY r.city, r.subzone;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_revenue_by_area ON dw_mart.mv_revenue_by_area(city, subzone);
+CREATE INDEX IF NOT EXISTS ix_mv_revenue_by_area_revenue ON dw_mart.mv_revenue_by_area(revenue DESC);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS dw_mart.mv_top_restaurants AS
+SELECT r.restaurant_id, r.restaurant_name, r.city, r.subzone, COUNT(*) AS orders, SUM(f.total) AS revenue
+FROM dw.fact_orders f
+JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+GROUP BY r.restaurant_id, r.restaurant_name, r.city, r.subzone;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_top_restaurants ON dw_mart.mv_top_restaurants(restaurant_id);
+CREATE INDEX IF NOT EXISTS ix_mv_top_restaurants_revenue ON dw_mart.mv_top_restaurants(revenue DESC);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS dw_mart.mv_order_status_ratio AS
+SELECT f.order_status, COUNT(*) AS orders,
+       ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 2) AS pct
+FROM dw.fact_orders f
+JOIN dw.dim_restaurant r ON r.restaurant_id = f.restaurant_id
+GROUP BY f.order_status;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_order_status_ratio ON dw_mart.mv_order_status_ratio(order_status);
+
+-- ROLLUP theo ngày do job events / reviews cập nhật cùng transaction với mỗi batch fact.
+-- Giữ đồng bộ với EVENT_ROLLUP_DDL / REVIEW_ROLLUP_DDL trong etl_scripts/marts.py.
+CREATE TABLE IF NOT EXISTS dw_mart.mart_events_daily (
+  event_date   DATE,
+  event_name   VARCHAR(100),
+  outcome      VARCHAR(100),
+  events       BIGINT NOT NULL,
+  amount_sum   NUMERIC(18,2) NOT NULL,
+  amount_count BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_mart_events_daily_date ON dw_mart.mart_events_daily(event_date);
+
+CREATE TABLE IF NOT EXISTS dw_mart.mart_reviews_daily (
+  review_date     DATE,
+  score           INT,
+  reviews         BIGINT NOT NULL,
+  sentiment_sum   DOUBLE PRECISION,
+  sentiment_count BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_mart_reviews_daily_date ON dw_mart.mart_reviews_daily(review_date);
+
+-- 2) Doanh thu theo ngày (đọc từ mart)
 CREATE OR REPLACE VIEW dw_mart.v_revenue_daily AS
-SELECT
-  order_date,
-  COUNT(*)               AS orders,
-  SUM(total)             AS revenue,
-  AVG(total)             AS aov
-FROM dw_mart.v_orders_base
-GROUP BY order_date
+SELECT order_date, orders, revenue, aov
+FROM dw_mart.mart_revenue_daily
 ORDER BY order_date;
 
 -- 3) Doanh thu theo City/Subzone (map heatmap)
 CREATE OR REPLACE VIEW dw_mart.v_revenue_by_area AS
-SELECT
-  city, subzone,
-  COUNT(*)   AS orders,
-  SUM(total) AS revenue
-FROM dw_mart.v_orders_base
-GROUP BY city, subzone
+SELECT city, subzone, orders, revenue
+FROM dw_mart.mv_revenue_by_area
 ORDER BY revenue DESC;
 
 -- 4) Tỉ lệ trạng thái đơn hàng
 CREATE OR REPLACE VIEW dw_mart.v_order_status_ratio AS
-SELECT
-  order_status,
-  COUNT(*)                              AS orders,
-  ROUND(100.0 * COUNT(*)/SUM(COUNT(*)) OVER (), 2) AS pct
-FROM dw_mart.v_orders_base
-GROUP BY order_status
+SELECT order_status, orders, pct
+FROM dw_mart.mv_order_status_ratio
 ORDER BY orders DESC;
 
 -- 5) Phân phối distance & số món (đã chuẩn hoá để vẽ histogram)
@@ -70,36 +109,31 @@ SELECT
 FROM dw_mart.v_orders_base
 WHERE distance_km IS NOT NULL;
 
--- 6) Event funnel (app events)
+-- 6) Event funnel (app events) - đọc rollup theo ngày, không quét fact_app_events
 CREATE OR REPLACE VIEW dw_mart.v_event_funnel AS
 SELECT
   event_name,
-  (timestamp::date) AS event_date,
-  COUNT(*)          AS events
-FROM dw.fact_app_events
-GROUP BY event_name, (timestamp::date)
+  event_date,
+  SUM(events)::bigint AS events,
+  SUM(amount_sum)     AS amount
+FROM dw_mart.mart_events_daily
+GROUP BY event_name, event_date
 ORDER BY event_date, event_name;
 
--- 7) Reviews: điểm & sentiment
+-- 7) Reviews: điểm & sentiment (AVG = tổng / số dòng có sentiment, cộng từ rollup)
 CREATE OR REPLACE VIEW dw_mart.v_reviews_summary AS
 SELECT
   score,
-  COUNT(*)               AS reviews,
-  AVG(sentiment_score)   AS avg_sentiment
-FROM dw.fact_reviews
+  SUM(reviews)::bigint                                     AS reviews,
+  SUM(sentiment_sum) / NULLIF(SUM(sentiment_count), 0)     AS avg_sentiment
+FROM dw_mart.mart_reviews_daily
 GROUP BY score
 ORDER BY score;
 
 -- 8) Top nhà hàng theo doanh thu / số đơn
 CREATE OR REPLACE VIEW dw_mart.v_top_restaurants AS
-SELECT
-  restaurant_id,
-  restaurant_name,
-  city, subzone,
-  COUNT(*)   AS orders,
-  SUM(total) AS revenue
-FROM dw_mart.v_orders_base
-GROUP BY restaurant_id, restaurant_name, city, subzone
+SELECT restaurant_id, restaurant_name, city, subzone, orders, revenue
+FROM dw_mart.mv_top_restaurants
 ORDER BY revenue DESC;
 
 SELECT 'v_orders_base'        AS view, COUNT(*) FROM dw_mart.v_orders_base
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# các module ETL import nhau theo tên phẳng (chạy từ etl_scripts/) -> thêm thư mục đó vào sys.path
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "etl_scripts"))
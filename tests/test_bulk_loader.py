@@ -0,0 +1,32 @@
+# tests/test_bulk_loader.py
+import numpy as np
+import pandas as pd
+from bulk_loader import NULL_MARKER, _iter_csv_blocks, _prepare_frame
+
+
+def test_integral_float_becomes_nullable_int():
+    df = pd.DataFrame({"sessionid": [1.0, np.nan, 3.0], "amount": [1.5, np.nan, 2.0]})
+    out = _prepare_frame(df)
+    assert out["sessionid"].dtype == "Int64"
+    assert out["amount"].dtype == np.float64
+    # frame gốc không bị sửa
+    assert df["sessionid"].dtype == np.float64
+
+
+def test_frame_without_floats_returned_as_is():
+    df = pd.DataFrame({"id": [1, 2], "name": ["a", "b"]})
+    assert _prepare_frame(df) is df
+
+
+def test_all_null_and_huge_floats_stay_float():
+    df = pd.DataFrame({"empty": [np.nan, np.nan], "huge": [2.0 ** 53, 1.0]})
+    out = _prepare_frame(df)
+    assert out["empty"].dtype == np.float64
+    assert out["huge"].dtype == np.float64
+
+
+def test_csv_blocks_null_marker_and_empty_string():
+    df = _prepare_frame(pd.DataFrame({"n": [1.0, np.nan, 3.0], "text": ["a", "", None]}))
+    blocks = [buf.getvalue() for buf in _iter_csv_blocks(df, 2)]
+    # NULL -> \N, chuỗi rỗng giữ nguyên là ô trống; số nguyên không có '.0'
+    assert blocks == [f"1,a\n{NULL_MARKER},\n", f"3,{NULL_MARKER}\n"]
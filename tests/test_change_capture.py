@@ -0,0 +1,54 @@
+# tests/test_change_capture.py
+import numpy as np
+import pandas as pd
+import pytest
+from change_capture import HASH_COLUMN, row_hashes, split_changes
+
+
+def restaurants():
+    return pd.DataFrame({"restaurant_id": ["R1", "R2", "R3"],
+                         "name": ["Pho 24", "Bun Cha", None],
+                         "city": ["Hanoi", None, "Hue"]}, dtype=object)
+
+
+@pytest.mark.parametrize("dtype", ["category", "string", "string[pyarrow]"])
+def test_hashes_do_not_depend_on_dtype(dtype):
+    expected = list(row_hashes(restaurants(), ["name", "city"]))
+    assert list(row_hashes(restaurants().astype(dtype), ["name", "city"])) == expected
+
+
+def test_null_kinds_hash_alike():
+    df = pd.DataFrame({"name": ["a", "a", "a"], "city": [None, np.nan, pd.NA]}, dtype=object)
+    assert row_hashes(df, ["name", "city"]).nunique() == 1
+
+
+def test_hash_changes_with_value():
+    changed = restaurants()
+    changed.loc[1, "city"] = "Hanoi"
+    before, after = row_hashes(restaurants(), ["name", "city"]), row_hashes(changed, ["name", "city"])
+    assert list(before == after) == [True, False, True]
+    assert after.dtype == np.int64
+
+
+def test_split_changes_masks():
+    df = restaurants()
+    df[HASH_COLUMN] = row_hashes(df, ["name", "city"])
+    # R1 không đổi, R2 đổi, R3 mới, R9 đã biến mất; hash NULL (nạp trước khi có hash) -> coi là đổi
+    stored = pd.Series(pd.array([df[HASH_COLUMN][0], 1, 2], dtype="Int64"),
+                       index=pd.Index(["R1", "R2", "R9"], dtype=object))
+    new, changed, deleted = split_changes(df, "restaurant_id", stored)
+    assert list(new) == [False, False, True]
+    assert list(changed) == [False, True, False]
+    assert deleted == ["R9"]
+
+    stored[:] = pd.NA
+    _, changed, _ = split_changes(df, "restaurant_id", stored)
+    assert list(changed) == [True, True, False]
+
+
+def test_split_changes_empty_stored():
+    df = restaurants()
+    df[HASH_COLUMN] = row_hashes(df, ["name", "city"])
+    stored = pd.Series(pd.array([], dtype="Int64"), index=pd.Index([], dtype=object))
+    new, changed, deleted = split_changes(df, "restaurant_id", stored)
+    assert new.all() and not changed.any() and deleted == []
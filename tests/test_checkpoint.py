@@ -0,0 +1,76 @@
+# tests/test_checkpoint.py
+from contextlib import contextmanager
+
+import checkpoint
+from checkpoint import Checkpoint, run_key
+
+
+class FakeConnection:
+    # ghi lại câu lệnh; SELECT batch đã nạp trả về `rows`
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        self.commits += 1
+
+
+def use_connection(monkeypatch, conn):
+    @contextmanager
+    def pooled_connection():
+        yield conn
+
+    monkeypatch.setattr(checkpoint, "pooled_connection", pooled_connection)
+
+
+def test_run_key_depends_on_input_and_chunking():
+    assert run_key("abc", 1000) == run_key("abc", 1000)
+    assert run_key("abc", 1000) != run_key("abc", 2000)
+    assert run_key("abc", 1000) != run_key("abd", 1000)
+    assert len(run_key("abc", None)) == 64
+
+
+def test_fresh_run_has_nothing_done(monkeypatch):
+    conn = FakeConnection()
+    use_connection(monkeypatch, conn)
+    cp = Checkpoint("orders", "k1")
+    assert cp.resume() is False
+    assert not cp.done(0)
+    # checkpoint của input khác bị bỏ
+    assert ("DELETE FROM dw.etl_checkpoint WHERE source = %s AND run_key <> %s", ("orders", "k1")) in conn.statements
+    assert conn.commits == 1
+
+
+def test_resume_skips_committed_batches(monkeypatch):
+    use_connection(monkeypatch, FakeConnection(rows=[(0, 1000), (1, 1000), (3, None)]))
+    cp = Checkpoint("orders", "k1")
+    assert cp.resume() is True
+    assert [cp.done(n) for n in range(5)] == [True, True, False, True, False]
+
+
+def test_mark_records_batch_in_callers_transaction():
+    conn = FakeConnection()
+    cp = Checkpoint("events", "k2")
+    cp.mark(conn, 4, 250)
+    assert cp.done(4)
+    sql, params = conn.statements[-1]
+    assert sql.startswith("INSERT INTO dw.etl_checkpoint")
+    assert params == ("events", "k2", 4, 250)
+    # người gọi commit cùng batch
+    assert conn.commits == 0
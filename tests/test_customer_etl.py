@@ -0,0 +1,48 @@
+# tests/test_customer_etl.py
+import pandas as pd
+from customer_etl import customer_natural_keys
+
+
+def survey(**overrides):
+    rows = {
+        "age": ["36", "24"],
+        "gender": ["Male", "Female"],
+        "marital_status": ["Single", "Married"],
+        "occupation": ["Student", "Employee"],
+        "education": ["Graduate", "Post Graduate"],
+        "family_size": ["3", "4"],
+        "medium_used": ["Food delivery apps", "Walk-in"],
+    }
+    rows.update(overrides)
+    return pd.DataFrame(rows)
+
+
+def test_keys_do_not_depend_on_dtypes():
+    expected = list(customer_natural_keys(survey()))
+    numeric = survey(age=[36, 24], family_size=[3.0, 4.0])
+    categorical = survey().astype("category")
+    padded = survey(gender=[" Male", "Female "])
+    assert list(customer_natural_keys(numeric)) == expected
+    assert list(customer_natural_keys(categorical)) == expected
+    assert list(customer_natural_keys(padded)) == expected
+
+
+def test_answer_change_keeps_key():
+    # câu trả lời không thuộc khoá -> cùng người, change capture ghi đè
+    changed = survey(medium_used=["Walk-in", "Walk-in"])
+    assert list(customer_natural_keys(changed)) == list(customer_natural_keys(survey()))
+
+
+def test_profile_change_gives_new_key():
+    changed = survey(age=["37", "24"])
+    keys, original = customer_natural_keys(changed), customer_natural_keys(survey())
+    assert keys.iloc[0] != original.iloc[0]
+    assert keys.iloc[1] == original.iloc[1]
+
+
+def test_same_profile_numbered():
+    df = pd.concat([survey(), survey().iloc[[0]]], ignore_index=True)
+    keys = customer_natural_keys(df)
+    assert keys.iloc[0].endswith("#0")
+    assert keys.iloc[2] == keys.iloc[0][:-1] + "1"
+    assert keys.is_unique
@@ -0,0 +1,52 @@
+# tests/test_etl_event_script.py
+import pandas as pd
+import pytest
+import validation
+from etl_event_script import READ_SCHEMA, USER_KEYS, prepare_chunk
+from instrumentation import StageTimer
+from validation import Validator
+from watermark import latest
+
+
+def event_rows(timestamps):
+    return pd.DataFrame({
+        'UserID': [f"u{i}" for i in range(len(timestamps))], 'SessionID': range(len(timestamps)),
+        'Timestamp': timestamps, 'EventType': "page_view", 'ProductID': "prod_1", 'Amount': None,
+        'Outcome': None,
+    }).astype({col: dtype for col, dtype in READ_SCHEMA.items() if dtype is not None})
+
+
+@pytest.fixture
+def offline_keys(monkeypatch):
+    # khoá surrogate cấp tại chỗ thay cho dw.etl_key_map
+    monkeypatch.setattr(USER_KEYS, "cache", {})
+    monkeypatch.setattr(USER_KEYS, "_resolve",
+                        lambda keys: {k: i + 1 + len(USER_KEYS.cache) for i, k in enumerate(keys)})
+
+
+def test_incremental_skips_events_at_watermark(offline_keys, monkeypatch):
+    # event đúng bằng watermark đã nạp ở lần trước (> chứ không phải >=): không nạp trùng
+    monkeypatch.setattr(validation, "DEFAULT_MAX_INVALID", 1)
+    chunk = event_rows(["2024-07-01 00:13:01.000000", "2024-07-01 00:13:02.000000",
+                        "2024-07-01 00:13:03.000000", "not a time"])
+    validator = Validator("events", persist=False)
+    rows, dim_user, fact_events = prepare_chunk(StageTimer("events"), validator, chunk,
+                                                since=pd.Timestamp("2024-07-01 00:13:02"))
+    assert rows == 2
+    assert list(fact_events['timestamp']) == ["2024-07-01 00:13:03.000000"]
+    assert list(dim_user['user_id']) == ["u2", "u3"]
+    # thời gian hỏng vào quarantine, không bị lọc mất
+    assert validator.counts['fact_app_events'] == (2, 1)
+
+
+def test_full_load_keeps_every_event(offline_keys):
+    chunk = event_rows(["2024-07-01 00:13:01.000000", "2024-07-01 00:13:02.000000"])
+    rows, _, fact_events = prepare_chunk(StageTimer("events"), Validator("events", persist=False), chunk)
+    assert rows == 2
+    assert len(fact_events) == 2
+
+
+def test_latest_only_moves_forward():
+    assert latest(None, None) is None
+    assert latest("2024-07-01 00:13:02", None) == pd.Timestamp("2024-07-01 00:13:02")
+    assert latest("2024-07-02", pd.Timestamp("2024-07-01 23:59")) == pd.Timestamp("2024-07-02")
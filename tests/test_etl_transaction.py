@@ -0,0 +1,87 @@
+# tests/test_etl_transaction.py
+import numpy as np
+import pandas as pd
+import pytest
+import validation
+from etl_transaction import (CUSTOMER_ORDER_KEYS, READ_SCHEMA, parse_distance_km, prepare_chunk,
+                             transform_order_items)
+from instrumentation import StageTimer
+from validation import Validator
+
+
+def test_distance_keeps_numeric_text():
+    distance = pd.Series(["3km", "<1km", "10km", "2.5 km", ".5km"])
+    assert list(parse_distance_km(distance)) == ["3", "1", "10", "2.5", ".5"]
+
+
+def test_distance_without_number_is_null():
+    distance = pd.Series(["km", "", "1.2.3km", np.nan])
+    assert parse_distance_km(distance).isna().all()
+
+
+def test_order_items_one_row_per_item():
+    orders = pd.DataFrame({"order_id": ["A", "B"],
+                           "items_in_order": ["1 x Dish 20, 3 x Dish 12", "2 x Dish 18"]})
+    items = transform_order_items(orders)
+    assert items.to_dict("records") == [
+        {"order_id": "A", "line_no": 1, "item_name": "Dish 20", "quantity": 1},
+        {"order_id": "A", "line_no": 2, "item_name": "Dish 12", "quantity": 3},
+        {"order_id": "B", "line_no": 1, "item_name": "Dish 18", "quantity": 2},
+    ]
+
+
+def test_order_items_name_may_contain_comma():
+    orders = pd.DataFrame({"order_id": ["A"], "items_in_order": ["1 x Rice, Egg, 2 x Tea"]})
+    items = transform_order_items(orders)
+    assert list(items["item_name"]) == ["Rice, Egg", "Tea"]
+    assert list(items["quantity"]) == [1, 2]
+
+
+def test_order_items_duplicate_order_keeps_last():
+    # đơn lặp trong cùng batch: fact_orders giữ dòng cuối -> bridge cũng lấy món của dòng cuối
+    orders = pd.DataFrame({"order_id": ["A", "B", "A"],
+                           "items_in_order": ["1 x Old", "1 x Dish 1", "4 x New"]},
+                          index=[10, 11, 12])
+    items = transform_order_items(orders)
+    assert items[["order_id", "item_name", "quantity"]].values.tolist() == [["B", "Dish 1", 1], ["A", "New", 4]]
+    assert list(items["line_no"]) == [1, 1]
+
+
+# --- lọc theo watermark khi nạp incremental ---
+def order_rows(placed_at):
+    rows = []
+    for i, placed in enumerate(placed_at):
+        rows.append({
+            'Restaurant ID': '38', 'Restaurant name': 'Rest 39', 'Subzone': 'DLF', 'City': 'Delhi',
+            'Order ID': str(12000 + i), 'Order Placed At': placed, 'Order Status': 'Delivered',
+            'Delivery': 'Zomato Delivery', 'Distance': '3km', 'Items in order': '1 x Dish 20',
+            'Instructions': None, 'Discount construct': None, 'Bill subtotal': 293.0, 'Packaging charges': 26.0,
+            'Restaurant discount (Promo)': 0.0, 'Restaurant discount (Flat offs, Freebies & others)': 0.0,
+            'Gold discount': 0.0, 'Brand pack discount': 0.0, 'Total': 319.0,
+            'Cancellation / Rejection reason': None, 'Restaurant compensation (Cancellation)': None,
+            'Restaurant penalty (Rejection)': None, 'KPT duration (minutes)': 17.5,
+            'Rider wait time (minutes)': 6.71, 'Order Ready Marked': 'Correctly', 'Customer ID': f'c{i}',
+        })
+    return pd.DataFrame(rows).astype({col: dtype for col, dtype in READ_SCHEMA.items() if dtype is not None})
+
+
+@pytest.fixture
+def offline_keys(monkeypatch):
+    # khoá surrogate cấp tại chỗ thay cho dw.etl_key_map
+    monkeypatch.setattr(CUSTOMER_ORDER_KEYS, "cache", {})
+    monkeypatch.setattr(CUSTOMER_ORDER_KEYS, "_resolve",
+                        lambda keys: {k: i + 1 + len(CUSTOMER_ORDER_KEYS.cache) for i, k in enumerate(keys)})
+
+
+def test_incremental_keeps_orders_at_watermark(offline_keys, monkeypatch):
+    # đơn cùng phút với watermark vẫn được nạp lại (>=): phút đó có thể còn đơn chưa nạp
+    monkeypatch.setattr(validation, "DEFAULT_MAX_INVALID", 1)
+    chunk = order_rows(["11:59 PM, August 31 2024", "12:01 AM, September 01 2024",
+                        "12:02 AM, September 01 2024", "not a time"])
+    validator = Validator("orders", persist=False)
+    rows, frames = prepare_chunk(StageTimer("orders"), validator, chunk, since=pd.Timestamp("2024-09-01 00:01"))
+    assert rows == 3
+    assert list(frames['fact_orders']['order_id']) == ["12001", "12002"]
+    # thời gian hỏng không bị lọc mất, mà vào quarantine như khi nạp lại toàn bộ
+    rejected = pd.concat(validator.quarantined['fact_orders'])
+    assert list(rejected['order_id']) == ["12003"]
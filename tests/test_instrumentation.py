@@ -0,0 +1,66 @@
+# tests/test_instrumentation.py
+import threading
+
+from instrumentation import StageTimer, record, span
+
+
+def test_stage_accumulates_across_calls():
+    timer = StageTimer("orders")
+    for rows in (3, 4):
+        with timer.stage("load"):
+            record(rows_in=rows, rows_out=rows - 1, bytes_written=10)
+    stats = timer.summary()["load"]
+    assert stats["calls"] == 2
+    assert (stats["rows_in"], stats["rows_out"], stats["bytes_written"], stats["bytes_read"]) == (7, 5, 20, 0)
+    assert stats["wall"] >= 0 and stats["cpu"] >= 0
+
+
+def test_record_outside_stage_is_ignored():
+    timer = StageTimer("orders")
+    record(rows_in=5)
+    with timer.stage("load"):
+        pass
+    assert timer.stages["load"]["rows_in"] == 0
+
+
+def test_nested_stage_restores_outer():
+    timer = StageTimer("reviews")
+    with timer.stage("transform"):
+        record(rows_in=1)
+        with span("sentiment"):
+            record(rows_in=10)
+        record(rows_in=2)
+    assert timer.stages["transform"]["rows_in"] == 3
+    assert timer.stages["transform.sentiment"]["rows_in"] == 10
+
+
+def test_span_without_timer_is_noop():
+    with span("sentiment") as stats:
+        record(rows_in=1)
+    assert stats is None
+
+
+def test_iterate_counts_rows_per_item():
+    timer = StageTimer("events")
+    chunks = list(timer.iterate("extract", [[1, 2], [3]], rows=len))
+    assert chunks == [[1, 2], [3]]
+    # lần next() cuối (StopIteration) cũng được tính vào stage
+    assert timer.stages["extract"]["rows_out"] == 3
+    assert timer.stages["extract"]["calls"] == 3
+
+
+def test_threads_add_to_same_stage():
+    timer = StageTimer("events")
+
+    def work():
+        for _ in range(1000):
+            with timer.stage("transform"):
+                record(rows_out=1)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert timer.stages["transform"]["rows_out"] == 4000
+    assert timer.stages["transform"]["calls"] == 4000
@@ -0,0 +1,101 @@
+# tests/test_mart_queries.py
+import pyarrow as pa
+import pytest
+import mart_queries
+from mart_queries import QueryCache, run_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mart_queries.time, "monotonic", clock)
+    return clock
+
+
+def table(n):
+    return pa.table({"n": [n]})
+
+
+def test_hit_until_ttl_expires(clock):
+    cache = QueryCache(ttl=60)
+    cache.put("q", 1, table(1))
+    clock.now += 59
+    assert cache.get("q", 1) == table(1)
+    clock.now += 2
+    assert cache.get("q", 1) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "version": None}
+
+
+def test_version_change_invalidates(clock):
+    cache = QueryCache()
+    cache.put("q", 1, table(1))
+    assert cache.get("q", 2) is None
+    # dòng cũ đã bị bỏ, quay lại phiên bản cũ cũng không dùng lại
+    assert cache.get("q", 1) is None
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1, table(1))
+    cache.put("b", 1, table(2))
+    cache.get("a", 1)
+    cache.put("c", 1, table(3))
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("b", 1) is None
+
+
+def test_version_rechecked_after_interval(clock, monkeypatch):
+    versions = iter([1, 2])
+    queries = []
+
+    class Engine:
+        def connect(self):
+            return self
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, statement):
+            queries.append(statement)
+            return self
+
+        def scalar(self):
+            return next(versions)
+
+    monkeypatch.setattr(mart_queries, "get_engine", Engine)
+    cache = QueryCache(version_check_seconds=5)
+    assert cache.version() == 1
+    clock.now += 4
+    assert cache.version() == 1
+    clock.now += 2
+    assert cache.version() == 2
+    assert len(queries) == 2
+
+
+class StubCache(QueryCache):
+    def version(self):
+        return 7
+
+
+def test_cache_hit_does_not_take_connection(clock, monkeypatch):
+    cache = StubCache()
+    params = {"city": "Delhi NCR", "names": ["open", "order"]}
+    cache.put(mart_queries._cache_key("SELECT 1", params), 7, table(1))
+
+    def no_engine():
+        raise AssertionError("cache hit must not check out a connection")
+
+    monkeypatch.setattr(mart_queries, "get_engine", no_engine)
+    assert run_query("SELECT 1", dict(params), {}, output="arrow", cache=cache) == table(1)
+    assert cache.hits == 1
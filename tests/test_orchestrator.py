@@ -0,0 +1,41 @@
+# tests/test_orchestrator.py
+from orchestrator import JOBS, job_conflicts, job_dependencies
+
+
+def job(name, reads=(), writes=(), shared=(), after=()):
+    return {"name": name, "module": name, "reads": list(reads), "writes": list(writes),
+            "shared": list(shared), "after": list(after), "options": []}
+
+
+def test_reader_depends_on_writer():
+    jobs = [job("dims", writes=["dw.dim_a"]), job("facts", reads=["dw.dim_a"], writes=["dw.fact_a"])]
+    assert job_dependencies(jobs) == {"dims": set(), "facts": {"dims"}}
+
+
+def test_reader_depends_on_shared_writer():
+    jobs = [job("calendar", shared=["dw.dim_time"]), job("report", reads=["dw.dim_time"])]
+    assert job_dependencies(jobs)["report"] == {"calendar"}
+
+
+def test_after_adds_dependency():
+    jobs = [job("a"), job("b", after=["a"])]
+    assert job_dependencies(jobs) == {"a": set(), "b": {"a"}}
+
+
+def test_overlapping_writes_conflict_without_ordering():
+    jobs = [job("a", writes=["dw.t"]), job("b", writes=["dw.t", "dw.u"]), job("c", writes=["dw.v"])]
+    assert job_conflicts(jobs) == {"a": {"b"}, "b": {"a"}, "c": set()}
+    assert job_dependencies(jobs) == {"a": set(), "b": set(), "c": set()}
+
+
+def test_shared_tables_do_not_conflict():
+    jobs = [job("orders", writes=["dw.fact_orders"], shared=["dw.dim_time"]),
+            job("events", writes=["dw.fact_app_events"], shared=["dw.dim_time"])]
+    assert job_conflicts(jobs) == {"orders": set(), "events": set()}
+
+
+def test_declared_jobs_run_in_parallel():
+    # các job thật: không ghi trùng bảng, dim_time là bảng dùng chung
+    assert all(not deps for deps in job_dependencies(JOBS).values())
+    assert all(not names for names in job_conflicts(JOBS).values())
+    assert all("dw.dim_time" not in j["writes"] for j in JOBS)
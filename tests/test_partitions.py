@@ -0,0 +1,46 @@
+# tests/test_partitions.py
+import datetime
+
+import numpy as np
+import pandas as pd
+from partitions import _bounds, month_dates, month_keys, months_of, partition_name
+
+
+def test_month_keys_timestamp():
+    values = pd.Series(pd.to_datetime(["2024-09-10 23:38", "2024-10-01 00:00", None]))
+    keys = month_keys("fact_orders", values)
+    assert list(keys[:2]) == [202409, 202410]
+    assert keys.isna().iloc[2]
+
+
+def test_month_keys_time_key():
+    values = pd.Series([202407011000, 202412312359, np.nan])
+    keys = month_keys("fact_app_events", values)
+    assert list(keys[:2]) == [202407, 202412]
+    assert keys.isna().iloc[2]
+
+
+def test_months_of_sorted_unique():
+    values = [202412010000, 202407011000, None, 202407150000]
+    assert months_of("fact_app_events", values) == [pd.Period("2024-07", "M"), pd.Period("2024-12", "M")]
+
+
+def test_partition_name():
+    assert partition_name("fact_orders", pd.Period("2024-03", "M")) == "fact_orders_p2024_03"
+
+
+def test_bounds_timestamp_cross_year():
+    assert _bounds("fact_orders", pd.Period("2024-12", "M")) == ("'2024-12-01'", "'2025-01-01'")
+
+
+def test_bounds_time_key():
+    # [YYYYMM000000, tháng sau): phút cuối tháng 202407312359 < cận trên
+    assert _bounds("fact_app_events", pd.Period("2024-07", "M")) == ("202407000000", "202408000000")
+    assert _bounds("fact_app_events", pd.Period("2024-12", "M")) == ("202412000000", "202501000000")
+
+
+def test_month_dates_covers_whole_months():
+    dates = month_dates([pd.Period("2024-02", "M"), pd.Period("2024-04", "M")])
+    assert len(dates) == 29 + 30
+    assert min(dates) == datetime.date(2024, 2, 1)
+    assert max(dates) == datetime.date(2024, 4, 30)
@@ -0,0 +1,71 @@
+# tests/test_pipeline.py
+import random
+import threading
+import time
+
+import pytest
+from pipeline import Pipeline
+
+
+def slow_square(x):
+    # thời gian transform ngẫu nhiên -> kết quả xong lệch thứ tự, writer vẫn phải nhận đúng thứ tự đọc
+    time.sleep(random.uniform(0, 0.01))
+    return x * x
+
+
+@pytest.mark.parametrize("depth,workers", [(0, 1), (1, 1), (3, 4)])
+def test_results_in_read_order(depth, workers):
+    with Pipeline(range(20), slow_square, depth=depth, workers=workers) as chunks:
+        assert list(chunks) == [x * x for x in range(20)]
+
+
+def test_sequential_runs_in_caller_thread():
+    threads = []
+    with Pipeline(range(3), lambda x: threads.append(threading.current_thread()), depth=0) as chunks:
+        list(chunks)
+    assert threads == [threading.current_thread()] * 3
+
+
+def test_transform_error_raised_in_order():
+    def transform(x):
+        if x == 3:
+            raise ValueError("bad chunk 3")
+        return x
+
+    got = []
+    with pytest.raises(ValueError, match="bad chunk 3"):
+        with Pipeline(range(10), transform, depth=2, workers=2) as chunks:
+            for x in chunks:
+                got.append(x)
+    assert got == [0, 1, 2]
+
+
+def test_read_error_raised_after_earlier_chunks():
+    def items():
+        yield 1
+        yield 2
+        raise OSError("read failed")
+
+    got = []
+    with pytest.raises(OSError, match="read failed"):
+        with Pipeline(items(), lambda x: x, depth=2) as chunks:
+            for x in chunks:
+                got.append(x)
+    assert got == [1, 2]
+
+
+def test_writer_error_stops_reader():
+    read = []
+
+    def items():
+        for x in range(1000):
+            read.append(x)
+            yield x
+
+    with pytest.raises(RuntimeError):
+        with Pipeline(items(), lambda x: x, depth=2) as chunks:
+            for x in chunks:
+                if x == 1:
+                    raise RuntimeError("load failed")
+    # backpressure: reader chỉ đi trước writer tối đa vài chunk rồi dừng khi writer lỗi
+    assert len(read) < 10
@@ -0,0 +1,66 @@
+# tests/test_sentiment.py
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import sentiment
+from sentiment import get_sentiment, score_sentiments
+
+SUMMARIES = pd.Series(["Great taste", "terrible coffee", "Great taste", np.nan, "", "not as advertised"],
+                      index=[10, 11, 12, 13, 14, 15], name="Summary")
+
+
+def test_scores_match_apply(tmp_path):
+    expected = SUMMARIES.apply(get_sentiment).to_numpy(dtype="float64")
+    scores = score_sentiments(SUMMARIES, workers=1, cache_path=str(tmp_path / "cache.sqlite"))
+    assert np.array_equal(scores.to_numpy(), expected)
+    assert list(scores.index) == list(SUMMARIES.index)
+    assert scores.name == "sentiment_score"
+
+
+def test_parallel_scores_match_apply(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentiment, "MIN_PARALLEL_TEXTS", 2)
+    monkeypatch.setattr(sentiment, "BATCH_SIZE", 2)
+    expected = SUMMARIES.apply(get_sentiment).to_numpy(dtype="float64")
+    scores = score_sentiments(SUMMARIES, workers=2, cache_path=None)
+    assert np.array_equal(scores.to_numpy(), expected)
+
+
+def test_cache_miss_then_hit(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    cold = score_sentiments(SUMMARIES, workers=1, cache_path=path)
+    with sqlite3.connect(path) as conn:
+        # mỗi text khác nhau một dòng (NaN và '' là hai text)
+        assert conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0] == 5
+
+    def no_scoring(texts):
+        assert texts == [], "cached texts must not be scored again"
+        return []
+
+    monkeypatch.setattr(sentiment, "_score_batch", no_scoring)
+    warm = score_sentiments(SUMMARIES, workers=1, cache_path=path)
+    pd.testing.assert_series_equal(warm, cold)
+
+
+def test_cache_scores_only_new_texts(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    score_sentiments(SUMMARIES, workers=1, cache_path=path)
+    scored = []
+    real = sentiment._score_batch
+    monkeypatch.setattr(sentiment, "_score_batch", lambda texts: scored.extend(texts) or real(texts))
+    score_sentiments(pd.Series(["Great taste", "love it"]), workers=1, cache_path=path)
+    assert scored == ["love it"]
+
+
+def test_cache_keyed_by_model_version(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    score_sentiments(SUMMARIES, workers=1, cache_path=path)
+    monkeypatch.setattr(sentiment, "MODEL_VERSION", "textblob-other")
+    scored = []
+    monkeypatch.setattr(sentiment, "_score_batch", lambda texts: scored.extend(texts) or [0.0] * len(texts))
+    score_sentiments(pd.Series(["Great taste"]), workers=1, cache_path=path)
+    assert scored == ["Great taste"]
+
+
+def test_unscorable_text_is_zero():
+    assert get_sentiment(None) == 0
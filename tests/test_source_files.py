@@ -0,0 +1,66 @@
+# tests/test_source_files.py
+import gzip
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from source_files import combined_digest, concat_frames, iter_source_chunks, read_source, resolve_inputs
+from source_schema import CATEGORY, NUMBER, STRING, read_options
+
+OPTIONS = read_options({"event_name": CATEGORY, "userid": STRING, "amount": NUMBER})
+
+
+def csv(prefix, first_event="open"):
+    return f"event_name,userid,amount,extra\n{first_event},{prefix}1,,x\norder,{prefix}2,12.5,y\nopen,{prefix}3,3,z\n"
+
+
+def write_sources(tmp_path):
+    (tmp_path / "2024-07-01.csv").write_text(csv("u"))
+    with gzip.open(tmp_path / "2024-07-02.csv.gz", "wt") as f:
+        f.write(csv("g"))
+    with pa.output_stream(str(tmp_path / "2024-07-03.csv.zst"), compression="zstd") as f:
+        f.write(csv("z", "close").encode())
+    (tmp_path / "notes.txt").write_text("not a source")
+    return resolve_inputs(str(tmp_path))
+
+
+def test_resolve_directory_sorted_by_name(tmp_path):
+    paths = write_sources(tmp_path)
+    assert [p.rsplit("/", 1)[1] for p in paths] == ["2024-07-01.csv", "2024-07-02.csv.gz", "2024-07-03.csv.zst"]
+    with pytest.raises(FileNotFoundError):
+        resolve_inputs(str(tmp_path / "missing*.csv"))
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compressed_files_read_like_plain(tmp_path, engine, workers):
+    paths = write_sources(tmp_path)
+    df = read_source(paths, OPTIONS, engine=engine, workers=workers)
+    assert list(df["userid"]) == ["u1", "u2", "u3", "g1", "g2", "g3", "z1", "z2", "z3"]
+    assert list(df.columns) == ["event_name", "userid", "amount"]
+    assert df["userid"].dtype == STRING
+    # category của từng file được hợp lại, không bung ra object
+    assert isinstance(df["event_name"].dtype, pd.CategoricalDtype)
+    assert set(df["event_name"].cat.categories) == {"open", "order", "close"}
+    assert df["amount"].isna().sum() == 3
+
+
+@pytest.mark.parametrize("engine,workers", [("c", 1), ("pyarrow", 2)])
+def test_chunks_in_file_order(tmp_path, engine, workers):
+    paths = write_sources(tmp_path)
+    chunks = list(iter_source_chunks(paths, OPTIONS, chunk_rows=2, engine=engine, workers=workers))
+    assert [len(c) for c in chunks] == [2, 1, 2, 1, 2, 1]
+    assert [c["userid"].iloc[0] for c in chunks] == ["u1", "u3", "g1", "g3", "z1", "z3"]
+
+
+def test_concat_single_frame_untouched():
+    frame = pd.DataFrame({"a": [1]})
+    assert concat_frames([frame]) is frame
+
+
+def test_combined_digest():
+    one = [{"path": "a.csv", "size": 1, "sha256": "abc"}]
+    assert combined_digest(one) == "abc"
+    two = one + [{"path": "b.csv", "size": 2, "sha256": "def"}]
+    assert combined_digest(two) != combined_digest(list(reversed(two)))
+    assert len(combined_digest(two)) == 64
@@ -0,0 +1,63 @@
+# tests/test_source_schema.py
+import io
+
+import numpy as np
+import pandas as pd
+from source_schema import CATEGORY, NUMBER, STRING, as_text, per_category, read_options
+
+# read_csv đọc ô trống thành NaN
+STATUS = ["Delivered", np.nan, "Rejected", "Delivered"]
+
+
+def test_per_category_matches_object_column():
+    values = pd.Series(STATUS, dtype=object, name="status")
+    func = lambda s: s.str.lower()
+    result = per_category(values.astype("category"), func)
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert result.name == "status"
+    pd.testing.assert_series_equal(result.astype(object).fillna(np.nan), func(values))
+
+
+def test_per_category_numeric_result_and_nan():
+    values = pd.Series(STATUS, dtype="category", index=[7, 8, 9, 10])
+    result = per_category(values, lambda s: s.str.len())
+    assert list(result.index) == [7, 8, 9, 10]
+    assert result.iloc[[0, 2, 3]].tolist() == [9.0, 8.0, 9.0]
+    assert np.isnan(result.iloc[1])
+
+
+def test_per_category_merges_categories():
+    values = pd.Series(["<1km", "1km", None], dtype="category")
+    result = per_category(values, lambda s: s.str.replace("<", "", regex=False))
+    assert list(result.cat.categories) == ["1km"]
+    assert result.tolist()[:2] == ["1km", "1km"]
+    assert pd.isna(result.iloc[2])
+
+
+def test_per_category_plain_column_passthrough():
+    values = pd.Series(["a", "b"])
+    assert per_category(values, lambda s: s.str.upper()).tolist() == ["A", "B"]
+
+
+def test_as_text_like_astype_str():
+    expected = pd.Series(STATUS, dtype=object).astype(str).tolist()
+    assert expected[1] == "nan"
+    assert as_text(pd.Series(STATUS, dtype=object)).tolist() == expected
+    categorical = as_text(pd.Series(STATUS, dtype="category"))
+    assert isinstance(categorical.dtype, pd.CategoricalDtype)
+    assert categorical.astype(object).tolist() == expected
+    assert as_text(pd.Series(STATUS, dtype=STRING)).tolist() == expected
+
+
+def test_as_text_existing_nan_category():
+    values = pd.Series(["nan", None], dtype="category")
+    assert as_text(values).astype(object).tolist() == ["nan", "nan"]
+
+
+def test_read_options_typed_columns():
+    schema = {"id": STRING, "city": CATEGORY, "total": NUMBER}
+    df = pd.read_csv(io.StringIO("id,city,total,ignored\nA1,Delhi,10.5,x\nA2,,3,y\n"), **read_options(schema))
+    assert list(df.columns) == ["id", "city", "total"]
+    assert df["id"].dtype == STRING
+    assert isinstance(df["city"].dtype, pd.CategoricalDtype)
+    assert df["total"].dtype == np.float64
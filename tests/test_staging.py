@@ -0,0 +1,72 @@
+# tests/test_staging.py
+import os
+
+import pandas as pd
+import pytest
+from staging import MANIFEST_FILE, StagingWriter, iter_staged_parts, read_manifest, read_staged_part
+
+
+def events(times, names):
+    return pd.DataFrame({"timestamp": pd.to_datetime(times), "event_name": names})
+
+
+def test_round_trip_keeps_rows_and_order(tmp_path):
+    writer = StagingWriter("events", mode="full", staging_dir=str(tmp_path))
+    # mỗi part trải nhiều ngày -> nằm ở nhiều thư mục stage_date=..., đọc lại phải về đúng thứ tự ghi
+    first = events(["2024-07-02 10:00", "2024-07-01 09:00", "2024-07-02 08:00", None], ["a", "b", "c", "d"])
+    second = events(["2024-07-01 12:00"], ["e"])
+    writer.write("fact_app_events", first, partition_by="timestamp")
+    writer.write("fact_app_events", second, partition_by="timestamp")
+    writer.write("dim_user", pd.DataFrame({"user_id": ["u1", "u2"]}))
+    writer.finish(high_water="2024-07-02")
+
+    table_dir = tmp_path / "events" / "fact_app_events"
+    assert sorted(os.listdir(table_dir)) == ["stage_date=2024-07-01", "stage_date=2024-07-02", "stage_date=unknown"]
+    pd.testing.assert_frame_equal(read_staged_part("events", "fact_app_events", 0, str(tmp_path)), first)
+    pd.testing.assert_frame_equal(read_staged_part("events", "fact_app_events", 1, str(tmp_path)), second)
+
+    manifest = read_manifest("events", str(tmp_path))
+    assert manifest["tables"]["fact_app_events"]["parts"] == [4, 1]
+    assert manifest["high_water"] == "2024-07-02"
+    parts = list(iter_staged_parts("events", manifest, str(tmp_path)))
+    assert [sorted(p) for p in parts] == [["dim_user", "fact_app_events"], ["fact_app_events"]]
+    assert list(parts[0]["dim_user"]["user_id"]) == ["u1", "u2"]
+
+
+def test_categorical_columns_survive(tmp_path):
+    writer = StagingWriter("orders", mode="full", staging_dir=str(tmp_path))
+    df = pd.DataFrame({"city": pd.Categorical(["Delhi", None, "Delhi"]), "total": [1.5, 2.0, None]})
+    writer.write("fact_orders", df)
+    writer.finish()
+    pd.testing.assert_frame_equal(read_staged_part("orders", "fact_orders", 0, str(tmp_path)), df)
+
+
+def test_manifest_only_after_finish(tmp_path):
+    writer = StagingWriter("orders", mode="full", staging_dir=str(tmp_path))
+    writer.write("fact_orders", pd.DataFrame({"x": [1]}))
+    with pytest.raises(FileNotFoundError):
+        read_manifest("orders", str(tmp_path))
+    writer.finish()
+    assert (tmp_path / "orders" / MANIFEST_FILE).exists()
+
+
+def test_full_mode_clears_previous_run(tmp_path):
+    writer = StagingWriter("orders", mode="full", staging_dir=str(tmp_path))
+    writer.write("fact_orders", pd.DataFrame({"x": [1]}))
+    writer.finish()
+    StagingWriter("orders", mode="full", staging_dir=str(tmp_path))
+    assert os.listdir(tmp_path / "orders") == []
+
+
+def test_preview_caps_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr("staging.PREVIEW_ROWS", 3)
+    writer = StagingWriter("orders", mode="preview", staging_dir=str(tmp_path))
+    writer.write("fact_orders", pd.DataFrame({"x": [1, 2]}))
+    writer.write("fact_orders", pd.DataFrame({"x": [3, 4]}))
+    writer.write("fact_orders", pd.DataFrame({"x": [5]}))
+    assert list(pd.read_csv(tmp_path / "fact_orders_preview.csv")["x"]) == [1, 2, 3]
+
+
+def test_unknown_mode_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        StagingWriter("orders", mode="bogus", staging_dir=str(tmp_path))
@@ -0,0 +1,60 @@
+# tests/test_time_dim.py
+import numpy as np
+import pandas as pd
+import pytest
+from time_dim import TimestampParser, build_calendar, time_keys, MINUTES_PER_DAY
+
+ORDER_FORMAT = '%I:%M %p, %B %d %Y'
+
+
+def test_parser_matches_to_datetime():
+    values = pd.Series(["11:38 PM, September 10 2024", "01:05 AM, October 01 2024",
+                        "11:38 PM, September 10 2024"], index=[5, 6, 7], name="placed")
+    parsed = TimestampParser(ORDER_FORMAT)(values)
+    expected = pd.to_datetime(values, format=ORDER_FORMAT)
+    pd.testing.assert_series_equal(parsed, expected)
+
+
+def test_parser_missing_and_bad_values_are_nat():
+    values = pd.Series(["2024-07-01T10:00:00", None, np.nan, "not a time"])
+    parsed = TimestampParser('ISO8601')(values)
+    assert parsed.iloc[0] == pd.Timestamp("2024-07-01 10:00")
+    assert parsed.iloc[1:].isna().all()
+
+
+def test_parser_parses_each_value_once_across_chunks():
+    parser = TimestampParser('ISO8601')
+    parser(pd.Series(["2024-07-01T10:00:00", "2024-07-01T10:00:00"]))
+    assert len(parser.cache) == 1
+    second = parser(pd.Series(["2024-07-01T10:00:00", "2024-07-02T11:30:00"]))
+    assert len(parser.cache) == 2
+    assert list(second) == [pd.Timestamp("2024-07-01 10:00"), pd.Timestamp("2024-07-02 11:30")]
+
+
+def test_parser_cache_is_bounded():
+    parser = TimestampParser('ISO8601', max_entries=2)
+    parser(pd.Series(["2024-07-01T00:00:00", "2024-07-02T00:00:00"]))
+    parsed = parser(pd.Series(["2024-07-03T00:00:00", "2024-07-04T00:00:00"]))
+    assert len(parser.cache) <= 2
+    assert list(parsed.dt.day) == [3, 4]
+
+
+def test_parser_empty_input():
+    parsed = TimestampParser('ISO8601')(pd.Series([], dtype=object))
+    assert parsed.empty
+
+
+def test_time_keys():
+    ts = pd.Series(pd.to_datetime(["2024-09-10 23:38", None]))
+    keys = time_keys(ts)
+    assert keys.iloc[0] == 202409102338
+    assert keys.isna().iloc[1]
+
+
+@pytest.mark.parametrize("start, end, days", [("2024-02-28", "2024-03-01", 3), ("2024-07-01", "2024-07-01", 1)])
+def test_build_calendar_covers_every_minute(start, end, days):
+    calendar = build_calendar(start, end)
+    assert len(calendar) == days * MINUTES_PER_DAY
+    assert calendar['time_key'].is_unique
+    assert calendar['time_key'].iloc[0] == int(pd.Timestamp(start).strftime('%Y%m%d')) * 10_000
+    assert calendar['time'].iloc[-1] == "23:59"
@@ -0,0 +1,95 @@
+# tests/test_validation.py
+import numpy as np
+import pandas as pd
+import pytest
+from validation import DataQualityError, QUARANTINE_COLUMN, Validator
+
+RULES = {
+    "types": {"qty": "int", "price": "number"},
+    "required": ["order_id"],
+    "ranges": {"price": (0, 100)},
+    "unique": ["order_id"],
+    "references": {"shop_id": "dim_shop"},
+    "max_invalid": 1,
+}
+DIMS = {"dim_shop": pd.DataFrame({"shop_id": ["S1", "S2"]})}
+
+
+def orders(**columns):
+    rows = {"order_id": ["A", "B"], "qty": ["1", "2"], "price": ["9.5", "20"], "shop_id": ["S1", "S2"]}
+    rows.update(columns)
+    return pd.DataFrame(rows)
+
+
+def check(df, rules=RULES):
+    validator = Validator("test", persist=False)
+    clean = validator.check("orders", df, rules, dims=DIMS)
+    rejected = validator.quarantined.get("orders", [pd.DataFrame(columns=[QUARANTINE_COLUMN])])
+    return validator, clean, list(pd.concat(rejected)[QUARANTINE_COLUMN])
+
+
+def test_clean_rows_typed():
+    _, clean, reasons = check(orders())
+    assert reasons == []
+    assert clean["qty"].dtype == np.int64
+    assert list(clean["price"]) == [9.5, 20.0]
+
+
+@pytest.mark.parametrize("columns,reason", [
+    ({"qty": ["1", "abc"]}, "qty: not a number"),
+    ({"qty": ["1", "2.5"]}, "qty: not an integer"),
+    ({"price": ["9.5", "x"]}, "price: not a number"),
+    ({"order_id": ["A", None]}, "order_id: missing"),
+    ({"price": ["9.5", "-1"]}, "price: outside [0, 100]"),
+    ({"price": ["9.5", "101"]}, "price: outside [0, 100]"),
+    ({"shop_id": ["S1", "S9"]}, "shop_id: not in dim_shop"),
+    ({"order_id": ["A", "A"]}, "duplicate order_id"),
+])
+def test_one_bad_row_per_rule(columns, reason):
+    validator, clean, reasons = check(orders(**columns))
+    assert reasons == [reason]
+    assert len(clean) == 1
+    assert validator.counts["orders"] == (2, 1)
+
+
+def test_reasons_joined():
+    _, clean, reasons = check(orders(qty=["1", "2.5"], price=["9.5", "500"]))
+    assert reasons == ["qty: not an integer; price: outside [0, 100]"]
+
+
+def test_duplicate_keeps_last_valid_row():
+    # dòng cuối của khoá trùng bị loại vì giá -> dòng trước được giữ, không bị tính là trùng
+    df = orders(order_id=["A", "A"], price=["9.5", "500"])
+    _, clean, reasons = check(df)
+    assert reasons == ["price: outside [0, 100]"]
+    assert list(clean["price"]) == [9.5]
+
+
+def test_duplicate_keeps_last_row():
+    _, clean, reasons = check(orders(order_id=["A", "A"], qty=["1", "2"]))
+    assert reasons == ["duplicate order_id"]
+    assert list(clean["qty"]) == [2]
+
+
+def test_missing_int_becomes_nullable_int():
+    _, clean, reasons = check(orders(qty=["1", np.nan]))
+    assert reasons == []
+    assert clean["qty"].dtype == "Int64"
+    assert clean["qty"].isna().tolist() == [False, True]
+
+
+def test_numeric_columns_not_recoerced():
+    _, clean, _ = check(orders(qty=[1.0, 2.0], price=[9.5, 20.0]))
+    assert clean["qty"].dtype == np.int64
+
+
+def test_threshold_is_cumulative_across_checks():
+    rules = dict(RULES, max_invalid=0.05)
+    validator = Validator("test", persist=False)
+    # 1 / 20 = 5% -> chưa vượt
+    batch = pd.DataFrame({"order_id": [f"O{i}" for i in range(20)], "qty": ["1"] * 19 + ["x"],
+                          "price": ["1"] * 20, "shop_id": ["S1"] * 20})
+    assert len(validator.check("orders", batch, rules, dims=DIMS)) == 19
+    # thêm 1 dòng lỗi: 2 / 22 > 5%
+    with pytest.raises(DataQualityError, match="2 of 22 rows"):
+        validator.check("orders", orders(qty=["1", "x"], order_id=["P1", "P2"]), rules, dims=DIMS)